@@ -0,0 +1,111 @@
+"""Per-row cost of reading profiles through the ORM versus Core selects.
+
+Loads the same page of ``profiles`` rows into ``ProfileStruct`` instances
+three ways and reports CPU time and peak allocated memory per row:
+
+- ``orm``: ``select(Profile)`` into ORM instances (identity map, attribute
+  instrumentation), then ``msgspec.convert(..., from_attributes=True)``,
+  which is what ``to_schema`` does.
+- ``core-convert``: a Core select of the columns, ``msgspec.convert`` on
+  each row mapping.
+- ``core``: a Core select of the columns in field order, rows passed
+  positionally to the struct, as ``CrudService.select_items`` does.
+
+The driver and database cost the same for all three, so by default the
+rows come from an in-memory SQLite database; pass ``--url`` with a sync
+SQLAlchemy URL to measure against a real one::
+
+    python -m benchmarks.read_paths --rows 5000 --repeat 20
+"""
+
+import gc
+import time
+import tracemalloc
+from collections.abc import Callable
+
+import click
+import msgspec
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from src.profiles.models import Profile
+from src.profiles.schemas import ProfileStruct
+
+Reader = Callable[[Session, int], list[ProfileStruct]]
+
+_COLUMNS = [Profile.__table__.c[name] for name in ProfileStruct.__struct_fields__]
+
+
+def read_orm(session: Session, rows: int) -> list[ProfileStruct]:
+    profiles = session.scalars(select(Profile).order_by(Profile.id).limit(rows))
+    return [
+        msgspec.convert(profile, ProfileStruct, from_attributes=True)
+        for profile in profiles
+    ]
+
+
+def read_core_convert(session: Session, rows: int) -> list[ProfileStruct]:
+    result = session.execute(select(*_COLUMNS).order_by(Profile.id).limit(rows))
+    return [msgspec.convert(dict(row), ProfileStruct) for row in result.mappings()]
+
+
+def read_core(session: Session, rows: int) -> list[ProfileStruct]:
+    result = session.execute(select(*_COLUMNS).order_by(Profile.id).limit(rows))
+    return [ProfileStruct(*row) for row in result]
+
+
+READERS: dict[str, Reader] = {
+    "orm": read_orm,
+    "core-convert": read_core_convert,
+    "core": read_core,
+}
+
+
+def measure(engine, reader: Reader, rows: int, repeat: int) -> tuple[float, float]:
+    """Return CPU microseconds and peak allocated bytes per row."""
+    with Session(engine) as session:
+        reader(session, rows)  # warm the statement cache
+    cpu = 0.0
+    for _ in range(repeat):
+        with Session(engine) as session:
+            gc.collect()
+            start = time.process_time()
+            reader(session, rows)
+            cpu += time.process_time() - start
+    with Session(engine) as session:
+        gc.collect()
+        tracemalloc.start()
+        items = reader(session, rows)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(items) == rows, f"only {len(items)} rows in profiles"
+    return cpu / (repeat * rows) * 1e6, peak / rows
+
+
+@click.command()
+@click.option("--url", default="sqlite://", show_default=True, help="Sync SQLAlchemy URL.")
+@click.option("--rows", default=5000, show_default=True, help="Rows per read.")
+@click.option("--repeat", default=20, show_default=True, help="Timed reads per path.")
+def main(url: str, rows: int, repeat: int) -> None:
+    """Compare the ORM and Core read paths for profiles."""
+    engine = create_engine(url)
+    if url.startswith("sqlite"):
+        Profile.__table__.create(engine)
+        with engine.begin() as connection:
+            connection.execute(
+                insert(Profile.__table__),
+                [
+                    {"id": i, "full_name": f"Profile {i}", "email": f"p{i}@example.com"}
+                    for i in range(1, rows + 1)
+                ],
+            )
+    results = {name: measure(engine, reader, rows, repeat) for name, reader in READERS.items()}
+    orm_cpu, orm_bytes = results["orm"]
+    click.echo(f"{'path':<14}{'cpu us/row':>12}{'bytes/row':>12}{'vs orm':>10}")
+    for name, (cpu, peak) in results.items():
+        click.echo(f"{name:<14}{cpu:>12.2f}{peak:>12.0f}{orm_cpu / cpu:>9.1f}x")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ from advanced_alchemy.extensions.litestar import (
 )
 
 from config.base import settings
+from src.idempotency.models import IdempotencyRecord  # noqa
+from src.outbox.models import OutboxEvent  # noqa
 from src.profiles.models import Profile  # noqa
 
 alchemy_config = SQLAlchemyAsyncConfig(
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -14,6 +16,30 @@ class Settings(BaseSettings):
     client_secret: str | None = Field(default=None)
     key_id: str | None = Field(default=None)
     jwks_refresh_interval: int = Field(default=6 * 3600)
+    # Timeout for calls to Zitadel; shortened further by the request deadline.
+    http_timeout: float = Field(default=5.0, gt=0)
+    # Circuit breakers around introspection, JWKS and token calls.
+    breaker_failure_threshold: int = Field(default=5, ge=1)
+    breaker_recovery_timeout: float = Field(default=30.0, gt=0)
+    breaker_half_open_max_calls: int = Field(default=1, ge=1)
+    # While a breaker is open: "cache" serves cached JWKS / introspection
+    # results within their staleness bound, "fail" answers 503 at once.
+    idp_fallback: Literal["cache", "fail"] = Field(default="cache")
+    introspection_cache_size: int = Field(default=10_000, ge=0)
+    introspection_cache_staleness: int = Field(default=300, ge=0)
+    # Last good JWKS, loaded at startup so workers don't wait for the IdP.
+    # Set to an empty string to disable.
+    jwks_snapshot_path: str = Field(default="var/jwks.json")
+    # Cached keys older than this (seconds) are no longer trusted.
+    jwks_max_staleness: int = Field(default=24 * 3600, gt=0)
+    # Host-local cache of the JWKS and verified tokens shared by all workers.
+    auth_shared_cache_enabled: bool = Field(default=False)
+    auth_shared_cache_path: str = Field(default="/dev/shm/nyx-auth")
+    auth_shared_cache_slots: int = Field(default=4096, ge=1)
+    # Upper bound on how long a verified token is reused without re-checking.
+    auth_token_cache_ttl: int = Field(default=300, ge=1)
+    # Role required for /system endpoints that change runtime behaviour.
+    admin_role: str = Field(default="admin")
     jwt_secret: str = Field(default="secret")
     use_introspection: bool = Field(default=False)
 
@@ -0,0 +1,349 @@
+"""Resumable, keyset-batched backfills.
+
+A backfill walks a table in primary-key order and applies a statement to one
+key range at a time, each in its own short transaction together with a
+checkpoint row in ``backfill_checkpoints``. Locks are held for a single
+batch, WAL is written in small pieces, and an interrupted run continues from
+the last committed batch instead of starting over.
+
+Batches must be idempotent: in an autocommit connection (such as inside a
+revision's ``autocommit_block``) the batch and its checkpoint commit
+separately, so a crash between the two re-runs that batch.
+
+Define a backfill in an importable module, call :func:`migrate` from a
+revision's ``data_upgrades`` and either let it run during the deploy or pass
+``-x backfills=defer`` and run it online afterwards::
+
+    python -m migrations.backfill run mypackage.backfills:lowercase_emails
+    python -m migrations.backfill status
+"""
+
+import asyncio
+import logging
+import pkgutil
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+
+import click
+import msgspec
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    MetaData,
+    String,
+    Table,
+    column,
+    func,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_TABLE = "backfill_checkpoints"
+
+checkpoints = Table(
+    CHECKPOINT_TABLE,
+    MetaData(),
+    Column("name", String(100), primary_key=True),
+    Column("position", BigInteger, nullable=False),
+    Column("rows", BigInteger, nullable=False),
+    Column("batches", BigInteger, nullable=False),
+    Column("started_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+    Column("completed_at", DateTime(timezone=True), nullable=True),
+)
+
+BatchFn = Callable[[Connection, int, int], int]
+LagFn = Callable[[Connection], float]
+
+
+@dataclass(frozen=True)
+class Backfill:
+    """One backfill and how fast it may go.
+
+    ``apply`` is either SQL with ``:lower`` and ``:upper`` bind parameters,
+    to be applied to rows with ``lower < key <= upper``, or a callable
+    ``(connection, lower, upper) -> rows affected``. The checkpoint is
+    stored under ``name``, so renaming a backfill restarts it.
+
+    ``pause`` is slept between batches. When ``max_lag`` is set, batches
+    wait until every streaming replica is less than that many seconds
+    behind.
+    """
+
+    name: str
+    table: str
+    apply: str | BatchFn
+    key: str = "id"
+    batch_size: int = 1000
+    pause: float = 0.0
+    max_lag: float | None = None
+    lag_poll: float = 1.0
+
+
+class BackfillProgress(msgspec.Struct):
+    name: str
+    position: int = 0
+    rows: int = 0
+    batches: int = 0
+    started_at: datetime | None = None
+    updated_at: datetime | None = None
+    completed_at: datetime | None = None
+
+    @property
+    def completed(self) -> bool:
+        return self.completed_at is not None
+
+
+def replication_lag(connection: Connection) -> float:
+    """Seconds the slowest streaming replica is behind, 0 without replicas.
+
+    Only PostgreSQL reports replication lag; other databases always get 0.
+    """
+    if connection.dialect.name != "postgresql":
+        return 0.0
+    lag = connection.scalar(
+        text(
+            "SELECT coalesce(extract(epoch FROM max(replay_lag)), 0)"
+            " FROM pg_stat_replication"
+        )
+    )
+    return float(lag or 0)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _autocommit(connection: Connection) -> bool:
+    return connection.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+
+
+def _commit(connection: Connection) -> None:
+    # Alembic's autocommit_block owns a placeholder transaction that must not
+    # be committed from here; statements already commit on their own.
+    if connection.in_transaction() and not _autocommit(connection):
+        connection.commit()
+
+
+@contextmanager
+def _transaction(connection: Connection) -> Iterator[None]:
+    if _autocommit(connection):
+        yield
+        return
+    _commit(connection)
+    with connection.begin():
+        yield
+
+
+def load_progress(connection: Connection, name: str) -> BackfillProgress:
+    checkpoints.create(connection, checkfirst=True)
+    row = connection.execute(
+        select(checkpoints).where(checkpoints.c.name == name)
+    ).one_or_none()
+    _commit(connection)
+    if row is None:
+        return BackfillProgress(name=name)
+    return BackfillProgress(**row._asdict())
+
+
+def list_progress(connection: Connection) -> list[BackfillProgress]:
+    checkpoints.create(connection, checkfirst=True)
+    rows = connection.execute(select(checkpoints).order_by(checkpoints.c.name)).all()
+    _commit(connection)
+    return [BackfillProgress(**row._asdict()) for row in rows]
+
+
+def reset(connection: Connection, name: str) -> None:
+    """Forget a backfill's checkpoint so the next run starts from the beginning."""
+    with _transaction(connection):
+        checkpoints.create(connection, checkfirst=True)
+        connection.execute(checkpoints.delete().where(checkpoints.c.name == name))
+
+
+def _save(connection: Connection, progress: BackfillProgress) -> None:
+    values = msgspec.structs.asdict(progress)
+    updated = connection.execute(
+        checkpoints.update().where(checkpoints.c.name == progress.name).values(values)
+    )
+    if not updated.rowcount:
+        connection.execute(checkpoints.insert().values(values))
+
+
+def _next_upper(connection: Connection, backfill: Backfill, after: int) -> int | None:
+    key = column(backfill.key)
+    page = (
+        select(key)
+        .select_from(table(backfill.table, key))
+        .where(key > after)
+        .order_by(key)
+        .limit(backfill.batch_size)
+        .subquery()
+    )
+    return connection.scalar(select(func.max(page.c[backfill.key])))
+
+
+def _apply(connection: Connection, backfill: Backfill, lower: int, upper: int) -> int:
+    if callable(backfill.apply):
+        return backfill.apply(connection, lower, upper)
+    result = connection.execute(
+        text(backfill.apply), {"lower": lower, "upper": upper}
+    )
+    return max(result.rowcount, 0)
+
+
+def _wait_for_replicas(connection: Connection, backfill: Backfill, lag: LagFn) -> None:
+    if backfill.max_lag is None:
+        return
+    while (behind := lag(connection)) > backfill.max_lag:
+        _commit(connection)
+        logger.info(
+            "Backfill %s waiting: replicas %.1fs behind (max %.1fs)",
+            backfill.name,
+            behind,
+            backfill.max_lag,
+        )
+        time.sleep(backfill.lag_poll)
+    _commit(connection)
+
+
+def run_backfill(
+    connection: Connection,
+    backfill: Backfill,
+    *,
+    max_batches: int | None = None,
+    lag: LagFn = replication_lag,
+) -> BackfillProgress:
+    """Run ``backfill`` from its checkpoint until done or ``max_batches`` ran.
+
+    Returns the progress after the last committed batch. Rows inserted
+    behind the checkpoint after a batch has passed them are not visited, so
+    writers must already produce the new shape of the data by the time the
+    backfill starts.
+    """
+    progress = load_progress(connection, backfill.name)
+    if progress.completed:
+        return progress
+    if progress.started_at is None:
+        progress.started_at = _now()
+
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        _wait_for_replicas(connection, backfill, lag)
+        with _transaction(connection):
+            upper = _next_upper(connection, backfill, progress.position)
+            if upper is not None:
+                progress.rows += _apply(connection, backfill, progress.position, upper)
+                progress.position = upper
+                progress.batches += 1
+            else:
+                progress.completed_at = _now()
+            progress.updated_at = _now()
+            _save(connection, progress)
+        if upper is None:
+            logger.info(
+                "Backfill %s complete: %d rows in %d batches",
+                backfill.name,
+                progress.rows,
+                progress.batches,
+            )
+            break
+        batches += 1
+        logger.info(
+            "Backfill %s at %s=%d (%d rows)",
+            backfill.name,
+            backfill.key,
+            progress.position,
+            progress.rows,
+        )
+        if backfill.pause:
+            time.sleep(backfill.pause)
+    return progress
+
+
+def migrate(backfill: Backfill) -> BackfillProgress | None:
+    """Run ``backfill`` from a revision's ``data_upgrades``.
+
+    With ``-x backfills=defer`` nothing runs and the backfill is left to be
+    started online with ``python -m migrations.backfill run``.
+    """
+    from alembic import context, op
+
+    if context.get_x_argument(as_dictionary=True).get("backfills") == "defer":
+        logger.warning(
+            "Deferring backfill %s; run it with python -m migrations.backfill run",
+            backfill.name,
+        )
+        return None
+    return run_backfill(op.get_bind(), backfill)
+
+
+def _run(fn, *args, **kwargs):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from config.base import settings
+
+    async def run():
+        engine = create_async_engine(
+            settings.sqlalchemy_database_uri, poolclass=NullPool
+        )
+        try:
+            async with engine.connect() as connection:
+                return await connection.run_sync(fn, *args, **kwargs)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+@click.group()
+def cli() -> None:
+    """Run and inspect resumable backfills."""
+    logging.basicConfig(level=logging.INFO)
+
+
+@cli.command("run")
+@click.argument("target")
+@click.option("--batch-size", type=int, help="Override the backfill's batch size.")
+@click.option("--pause", type=float, help="Seconds to sleep between batches.")
+@click.option("--max-lag", type=float, help="Wait while replicas are further behind.")
+@click.option("--max-batches", type=int, help="Stop after this many batches.")
+def run_command(
+    target: str,
+    batch_size: int | None,
+    pause: float | None,
+    max_lag: float | None,
+    max_batches: int | None,
+) -> None:
+    """Run the backfill TARGET, given as ``module:attribute``."""
+    backfill: Backfill = pkgutil.resolve_name(target)
+    overrides = {"batch_size": batch_size, "pause": pause, "max_lag": max_lag}
+    backfill = replace(backfill, **{k: v for k, v in overrides.items() if v is not None})
+    progress = _run(run_backfill, backfill, max_batches=max_batches)
+    click.echo(msgspec.json.encode(progress))
+
+
+@cli.command("status")
+def status_command() -> None:
+    """Print the checkpoint of every backfill."""
+    for progress in _run(list_progress):
+        click.echo(msgspec.json.encode(progress))
+
+
+@cli.command("reset")
+@click.argument("name")
+def reset_command(name: str) -> None:
+    """Drop the checkpoint of backfill NAME."""
+    _run(reset, name)
+
+
+if __name__ == "__main__":
+    cli()
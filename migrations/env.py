@@ -1,4 +1,5 @@
 import asyncio
+import re
 from typing import TYPE_CHECKING, cast
 
 from alembic.autogenerate import rewriter
@@ -21,6 +22,16 @@ __all__ = ("do_run_migrations", "run_migrations_offline", "run_migrations_online
 config: "AlembicCommandConfig" = context.config  # type: ignore
 writer = rewriter.Rewriter()
 
+# Tables managed by migrations/backfill.py and migrations/partitioning.py
+# rather than by models; autogenerate must not try to drop them.
+UNMANAGED_TABLES = re.compile(
+    r"^(backfill_checkpoints|profiles_p(\d+|default)|profiles_(un)?partitioned)$"
+)
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    return not (type_ == "table" and reflected and UNMANAGED_TABLES.match(name or ""))
+
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
@@ -44,6 +55,7 @@ def run_migrations_offline() -> None:
         user_module_prefix=config.user_module_prefix,
         render_as_batch=config.render_as_batch,
         process_revision_directives=writer,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -61,6 +73,7 @@ def do_run_migrations(connection: "Connection") -> None:
         user_module_prefix=config.user_module_prefix,
         render_as_batch=config.render_as_batch,
         process_revision_directives=writer,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -0,0 +1,447 @@
+"""Online conversion of ``profiles`` into a declaratively partitioned table.
+
+The conversion never holds a long lock on ``profiles``:
+
+1. ``prepare`` creates ``profiles_partitioned`` (hash on ``id`` or monthly
+   range on ``created_at``) with the same columns and indexes, and installs
+   a trigger on ``profiles`` that mirrors every insert, update and delete
+   into it.
+2. ``copy_rows`` copies the existing rows over in ``id`` order as a
+   :mod:`migrations.backfill` job, so it is throttled, checkpointed and
+   resumable. Rows the trigger already wrote win over the copy.
+3. ``verify`` checks, without locking, that every row made it across.
+4. ``swap`` takes an ``ACCESS EXCLUSIVE`` lock for the duration of a few
+   renames: the old heap becomes ``profiles_unpartitioned`` and the
+   partitioned table takes over the ``profiles`` name, constraint and index
+   names, id sequence position and change-notification trigger.
+5. ``cleanup`` drops ``profiles_unpartitioned`` once you are happy.
+
+Every step runs on an autocommit connection and is safe to re-run, so it
+can be driven either by the ``partition_profiles`` Alembic revision during
+a deploy or ahead of it with ``python -m migrations.partitioning``.
+
+With hash partitioning the primary key stays ``(id)`` and id lookups prune
+to a single partition. A range-partitioned table must include
+``created_at`` in its primary key, so the key becomes ``(id, created_at)``;
+keyset scans bounded by ``created_at`` prune, id lookups visit every
+partition's index. Either way ``Profile`` and ``ProfileRepository`` need no
+changes: the table keeps its name and columns, and ``id`` is still filled in
+by the database. The one thing that does not carry over is the unique
+index on ``lower(email)``: without it the ``/profiles/by-email`` upserts
+answer 501.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from typing import Literal
+
+import click
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from migrations.backfill import Backfill, BackfillProgress, reset, run_backfill
+
+logger = logging.getLogger(__name__)
+
+SOURCE = "profiles"
+TARGET = "profiles_partitioned"
+RETIRED = "profiles_unpartitioned"
+SYNC_FUNCTION = "profiles_sync_partitioned"
+COLUMNS = "id, full_name, email, created_at, updated_at"
+
+
+@dataclass(frozen=True)
+class PartitionScheme:
+    """How to partition ``profiles``.
+
+    ``partitions`` is the number of hash partitions; ``months_ahead`` is how
+    many monthly range partitions to create past the current month.
+    """
+
+    kind: Literal["hash", "range"]
+    partitions: int = 16
+    months_ahead: int = 3
+
+    @property
+    def key(self) -> str:
+        return "id" if self.kind == "hash" else "id, created_at"
+
+
+def parse_scheme(value: str) -> PartitionScheme:
+    """Parse ``hash``, ``hash:<partitions>``, ``range`` or ``range:<months_ahead>``.
+
+    Raises:
+        ValueError: if ``value`` is not one of those forms.
+    """
+    kind, _, count = value.strip().lower().partition(":")
+    if kind not in ("hash", "range"):
+        raise ValueError(f"Unknown partitioning scheme {value!r}")
+    if not count:
+        return PartitionScheme(kind)
+    number = int(count)
+    if kind == "hash":
+        if number < 2:
+            raise ValueError("Hash partitioning needs at least 2 partitions")
+        return PartitionScheme(kind, partitions=number)
+    if number < 0:
+        raise ValueError("months_ahead must not be negative")
+    return PartitionScheme(kind, months_ahead=number)
+
+
+def is_partitioned(connection: Connection, table: str = SOURCE) -> bool:
+    return bool(
+        connection.scalar(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table"
+                " WHERE partrelid = to_regclass(:table))"
+            ),
+            {"table": table},
+        )
+    )
+
+
+def _exists(connection: Connection, relation: str) -> bool:
+    return (
+        connection.scalar(text("SELECT to_regclass(:name)"), {"name": relation})
+        is not None
+    )
+
+
+def create_statements(scheme: PartitionScheme) -> list[str]:
+    """DDL for the empty partitioned table, its hash partitions and indexes.
+
+    Range partitions depend on the data and are added by
+    :func:`add_range_partitions`.
+    """
+    by = "HASH (id)" if scheme.kind == "hash" else "RANGE (created_at)"
+    statements = [
+        f"CREATE SEQUENCE IF NOT EXISTS {TARGET}_id_seq AS bigint",
+        f"""
+        CREATE TABLE IF NOT EXISTS {TARGET} (
+            id bigint NOT NULL DEFAULT nextval('{TARGET}_id_seq'),
+            full_name varchar(100) NOT NULL,
+            email varchar(100),
+            created_at timestamptz NOT NULL,
+            updated_at timestamptz NOT NULL,
+            CONSTRAINT pk_{TARGET} PRIMARY KEY ({scheme.key})
+        ) PARTITION BY {by}
+        """,
+        f"ALTER SEQUENCE {TARGET}_id_seq OWNED BY {TARGET}.id",
+    ]
+    if scheme.kind == "hash":
+        statements += [
+            f"CREATE TABLE IF NOT EXISTS profiles_p{i} PARTITION OF {TARGET}"
+            f" FOR VALUES WITH (MODULUS {scheme.partitions}, REMAINDER {i})"
+            for i in range(scheme.partitions)
+        ]
+    else:
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS profiles_pdefault PARTITION OF {TARGET} DEFAULT"
+        )
+    # Indexes are created while the table is still empty: a partitioned
+    # parent cannot be indexed CONCURRENTLY later.
+    statements.append(
+        f"CREATE INDEX IF NOT EXISTS ix_{TARGET}_updated_at_id"
+        f" ON {TARGET} (updated_at, id)"
+    )
+    return statements
+
+
+def add_range_partitions(
+    connection: Connection, months_ahead: int, table: str = TARGET
+) -> list[str]:
+    """Create the missing monthly partitions up to ``months_ahead`` months out.
+
+    Starts at the month of the oldest row (or the current month for an empty
+    table). Run it regularly, e.g. from cron, so new rows never land in the
+    default partition. Returns the names of the partitions created.
+    """
+    start = connection.scalar(
+        text(
+            "SELECT date_trunc('month', coalesce(min(created_at), now()))"
+            f" FROM {SOURCE}"
+        )
+    )
+    months = connection.execute(
+        text(
+            "SELECT to_char(m, 'YYYYMM'), m, m + interval '1 month'"
+            " FROM generate_series(CAST(:start AS timestamptz),"
+            " date_trunc('month', now()) + make_interval(months => :ahead),"
+            " interval '1 month') AS m"
+        ),
+        {"start": start, "ahead": months_ahead},
+    ).all()
+    created = []
+    for suffix, lower, upper in months:
+        name = f"profiles_p{suffix}"
+        if _exists(connection, name):
+            continue
+        connection.execute(
+            text(
+                f"CREATE TABLE {name} PARTITION OF {table}"
+                f" FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+        created.append(name)
+    return created
+
+
+def sync_trigger_statements(scheme: PartitionScheme) -> list[str]:
+    """Trigger that keeps ``profiles_partitioned`` in step with ``profiles``.
+
+    An update is applied as delete-then-upsert so a row the copy wrote
+    concurrently is overwritten rather than raising a key violation.
+    ``created_at`` is assumed never to change, which range partitioning
+    relies on.
+    """
+    assignments = ", ".join(
+        f"{column} = EXCLUDED.{column}"
+        for column in ("full_name", "email", "created_at", "updated_at")
+    )
+    values = ", ".join(f"NEW.{column.strip()}" for column in COLUMNS.split(","))
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {SYNC_FUNCTION}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {TARGET} WHERE id = OLD.id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {TARGET} ({COLUMNS}) VALUES ({values})
+                ON CONFLICT ({scheme.key}) DO UPDATE SET {assignments};
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        f"DROP TRIGGER IF EXISTS {SYNC_FUNCTION} ON {SOURCE}",
+        f"""
+        CREATE TRIGGER {SYNC_FUNCTION}
+        AFTER INSERT OR UPDATE OR DELETE ON {SOURCE}
+        FOR EACH ROW EXECUTE FUNCTION {SYNC_FUNCTION}()
+        """,
+    ]
+
+
+def prepare(connection: Connection, scheme: PartitionScheme) -> None:
+    """Create the partitioned copy and start mirroring writes into it.
+
+    Raises:
+        RuntimeError: if ``profiles`` is already partitioned or relies on
+            ``uq_profiles_email_lower``.
+    """
+    if is_partitioned(connection):
+        raise RuntimeError(f"{SOURCE} is already partitioned")
+    if _exists(connection, "uq_profiles_email_lower"):
+        # Unique indexes on a partitioned table must include the partition
+        # key, so case-insensitive email uniqueness cannot be carried over.
+        raise RuntimeError(
+            f"{SOURCE} has a unique index on lower(email), which a partitioned"
+            " table cannot enforce; drop uq_profiles_email_lower first if you"
+            " can do without PUT /profiles/by-email"
+        )
+    for statement in create_statements(scheme):
+        connection.execute(text(statement))
+    if scheme.kind == "range":
+        add_range_partitions(connection, scheme.months_ahead)
+    for statement in sync_trigger_statements(scheme):
+        connection.execute(text(statement))
+    logger.info("Prepared %s (%s partitioning)", TARGET, scheme.kind)
+
+
+# Rows the sync trigger already wrote are newer than the copy, so a
+# conflicting row is left alone.
+COPY = Backfill(
+    name="partition_profiles",
+    table=SOURCE,
+    apply=(
+        f"INSERT INTO {TARGET} ({COLUMNS}) SELECT {COLUMNS} FROM {SOURCE}"
+        " WHERE id > :lower AND id <= :upper ON CONFLICT DO NOTHING"
+    ),
+    batch_size=5000,
+)
+
+
+def copy_rows(connection: Connection, **overrides) -> BackfillProgress:
+    """Copy the existing rows in ``id`` batches, resuming from the checkpoint.
+
+    ``overrides`` replace fields of :data:`COPY`, e.g. ``batch_size``,
+    ``pause`` or ``max_lag``.
+    """
+    return run_backfill(connection, replace(COPY, **overrides))
+
+
+def missing_rows(connection: Connection) -> int:
+    """Count rows of ``profiles`` that are not in the partitioned copy yet."""
+    return connection.scalar(
+        text(
+            f"SELECT count(*) FROM {SOURCE} AS s WHERE NOT EXISTS"
+            f" (SELECT 1 FROM {TARGET} AS t WHERE t.id = s.id)"
+        )
+    )
+
+
+def swap_statement(lock_timeout: str) -> str:
+    literal = "'" + lock_timeout.replace("'", "''") + "'"
+    return f"""
+DO $$
+DECLARE
+    old_sequence text := pg_get_serial_sequence('{SOURCE}', 'id');
+BEGIN
+    PERFORM set_config('lock_timeout', {literal}, true);
+    LOCK TABLE {SOURCE} IN ACCESS EXCLUSIVE MODE;
+
+    DROP TRIGGER {SYNC_FUNCTION} ON {SOURCE};
+    DROP TRIGGER IF EXISTS profiles_notify_change ON {SOURCE};
+    ALTER TABLE {SOURCE} RENAME TO {RETIRED};
+    ALTER TABLE {RETIRED} RENAME CONSTRAINT pk_profiles TO pk_{RETIRED};
+    ALTER INDEX IF EXISTS ix_profiles_updated_at_id
+        RENAME TO ix_{RETIRED}_updated_at_id;
+    IF old_sequence IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s RENAME TO {RETIRED}_id_seq', old_sequence);
+    END IF;
+
+    ALTER TABLE {TARGET} RENAME TO {SOURCE};
+    ALTER TABLE {SOURCE} RENAME CONSTRAINT pk_{TARGET} TO pk_profiles;
+    ALTER INDEX ix_{TARGET}_updated_at_id RENAME TO ix_profiles_updated_at_id;
+    ALTER SEQUENCE {TARGET}_id_seq RENAME TO profiles_id_seq;
+    PERFORM setval(
+        'profiles_id_seq', (SELECT coalesce(max(id), 0) + 1 FROM {SOURCE}), false
+    );
+    CREATE TRIGGER profiles_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON {SOURCE}
+    FOR EACH ROW EXECUTE FUNCTION notify_profile_change();
+END;
+$$
+"""
+
+
+def swap(connection: Connection, lock_timeout: str = "5s") -> None:
+    """Put the partitioned table in place of ``profiles``.
+
+    The renames run as one statement, so they either all apply or none do.
+    ``lock_timeout`` bounds how long writers queue behind the swap; if the
+    lock cannot be taken in time the swap fails and can simply be retried.
+
+    Raises:
+        RuntimeError: if the copy is incomplete or there is nothing to swap.
+    """
+    if is_partitioned(connection):
+        logger.info("%s is already partitioned; nothing to swap", SOURCE)
+        return
+    if not _exists(connection, TARGET):
+        raise RuntimeError(f"{TARGET} does not exist; run prepare first")
+    if missing := missing_rows(connection):
+        raise RuntimeError(f"{missing} rows have not been copied to {TARGET} yet")
+    # DO blocks take no bind parameters, so the timeout is inlined.
+    connection.execute(text(swap_statement(lock_timeout)))
+    logger.info("%s is now partitioned; the old heap is %s", SOURCE, RETIRED)
+
+
+def cleanup(connection: Connection) -> None:
+    """Drop the retired heap and the sync function after a successful swap."""
+    if not is_partitioned(connection):
+        raise RuntimeError(f"{SOURCE} is not partitioned; refusing to drop {RETIRED}")
+    connection.execute(text(f"DROP TABLE IF EXISTS {RETIRED}"))
+    connection.execute(text(f"DROP FUNCTION IF EXISTS {SYNC_FUNCTION}()"))
+
+
+def abort(connection: Connection) -> None:
+    """Undo ``prepare``: stop mirroring writes and drop the partitioned copy."""
+    if is_partitioned(connection):
+        raise RuntimeError(f"{SOURCE} has already been swapped; nothing to abort")
+    connection.execute(text(f"DROP TRIGGER IF EXISTS {SYNC_FUNCTION} ON {SOURCE}"))
+    connection.execute(text(f"DROP FUNCTION IF EXISTS {SYNC_FUNCTION}()"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {TARGET}"))
+    connection.execute(text(f"DROP SEQUENCE IF EXISTS {TARGET}_id_seq"))
+    reset(connection, COPY.name)
+
+
+def migrate(connection: Connection, scheme: PartitionScheme) -> None:
+    """Run prepare, copy and swap back to back; used by the Alembic revision."""
+    if is_partitioned(connection):
+        return
+    prepare(connection, scheme)
+    copy_rows(connection)
+    swap(connection)
+
+
+def _run(fn, *args, **kwargs):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from config.base import settings
+
+    async def run():
+        engine = create_async_engine(
+            settings.sqlalchemy_database_uri,
+            isolation_level="AUTOCOMMIT",
+            poolclass=NullPool,
+        )
+        try:
+            async with engine.connect() as connection:
+                return await connection.run_sync(fn, *args, **kwargs)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+@click.group()
+def cli() -> None:
+    """Convert ``profiles`` to a partitioned table without downtime."""
+    logging.basicConfig(level=logging.INFO)
+
+
+@cli.command("prepare")
+@click.option("--scheme", default="hash", show_default=True, help="hash[:N] or range[:M].")
+def prepare_command(scheme: str) -> None:
+    """Create the partitioned copy and start mirroring writes."""
+    _run(prepare, parse_scheme(scheme))
+
+
+@cli.command("copy")
+@click.option("--batch-size", default=COPY.batch_size, show_default=True, type=int)
+@click.option("--pause", default=0.05, show_default=True, type=float, help="Seconds between batches.")
+@click.option("--max-lag", type=float, help="Wait while replicas are further behind.")
+def copy_command(batch_size: int, pause: float, max_lag: float | None) -> None:
+    """Copy existing rows in id order, resuming from the last checkpoint."""
+    _run(copy_rows, batch_size=batch_size, pause=pause, max_lag=max_lag)
+
+
+@cli.command("verify")
+def verify_command() -> None:
+    """Report how many rows are still missing from the copy."""
+    click.echo(_run(missing_rows))
+
+
+@cli.command("swap")
+@click.option("--lock-timeout", default="5s", show_default=True)
+def swap_command(lock_timeout: str) -> None:
+    """Rename the partitioned copy into place."""
+    _run(swap, lock_timeout)
+
+
+@cli.command("extend")
+@click.option("--months-ahead", default=3, show_default=True, type=int)
+def extend_command(months_ahead: int) -> None:
+    """Add upcoming monthly partitions to a range-partitioned table."""
+    for name in _run(add_range_partitions, months_ahead, SOURCE):
+        click.echo(name)
+
+
+@cli.command("cleanup")
+def cleanup_command() -> None:
+    """Drop the old heap after a successful swap."""
+    _run(cleanup)
+
+
+@cli.command("abort")
+def abort_command() -> None:
+    """Drop the partitioned copy before it has been swapped in."""
+    _run(abort)
+
+
+if __name__ == "__main__":
+    cli()
@@ -56,7 +56,10 @@ def schema_downgrades() -> None:
     ${downgrades if downgrades else "pass"}
 
 def data_upgrades() -> None:
-    """Add any optional data upgrade migrations here!"""
+    """Add any optional data upgrade migrations here!
+
+    Backfills of large tables should go through migrations.backfill.migrate.
+    """
 
 def data_downgrades() -> None:
     """Add any optional data downgrade migrations here!"""
@@ -0,0 +1,107 @@
+"""Notify profile changes
+
+Revision ID: 17d0471e89d5
+Revises: 64c3e0e3f6e7
+Create Date: 2026-10-19 09:12:41.208315
+
+"""
+
+import warnings
+from typing import TYPE_CHECKING
+
+import sqlalchemy as sa
+from alembic import op
+from advanced_alchemy.types import EncryptedString, EncryptedText, GUID, ORA_JSONB, DateTimeUTC, StoredObject, PasswordHash
+from sqlalchemy import Text  # noqa: F401
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+__all__ = ["downgrade", "upgrade", "schema_upgrades", "schema_downgrades", "data_upgrades", "data_downgrades"]
+
+sa.GUID = GUID
+sa.DateTimeUTC = DateTimeUTC
+sa.ORA_JSONB = ORA_JSONB
+sa.EncryptedString = EncryptedString
+sa.EncryptedText = EncryptedText
+sa.StoredObject = StoredObject
+
+# revision identifiers, used by Alembic.
+revision = '17d0471e89d5'
+down_revision = '64c3e0e3f6e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=UserWarning)
+        with op.get_context().autocommit_block():
+            schema_upgrades()
+            data_upgrades()
+
+def downgrade() -> None:
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=UserWarning)
+        with op.get_context().autocommit_block():
+            data_downgrades()
+            schema_downgrades()
+
+def schema_upgrades() -> None:
+    """schema upgrade migrations go here."""
+    # Resume tokens for GET /profiles/changes are (updated_at, id) positions.
+    op.create_index(
+        op.f('ix_profiles_updated_at_id'),
+        'profiles',
+        ['updated_at', 'id'],
+        unique=False,
+        postgresql_concurrently=True,
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_profile_change() RETURNS trigger AS $$
+        DECLARE
+            payload json;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                payload := json_build_object(
+                    'op', 'delete', 'id', OLD.id, 'updated_at', OLD.updated_at
+                );
+            ELSE
+                payload := json_build_object(
+                    'op', lower(TG_OP),
+                    'id', NEW.id,
+                    'updated_at', NEW.updated_at,
+                    'full_name', NEW.full_name,
+                    'email', NEW.email
+                );
+            END IF;
+            PERFORM pg_notify('profile_changes', payload::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER profiles_notify_change
+        AFTER INSERT OR UPDATE OR DELETE ON profiles
+        FOR EACH ROW EXECUTE FUNCTION notify_profile_change()
+        """
+    )
+
+def schema_downgrades() -> None:
+    """schema downgrade migrations go here."""
+    op.execute("DROP TRIGGER IF EXISTS profiles_notify_change ON profiles")
+    op.execute("DROP FUNCTION IF EXISTS notify_profile_change()")
+    op.drop_index(
+        op.f('ix_profiles_updated_at_id'),
+        table_name='profiles',
+        postgresql_concurrently=True,
+    )
+
+def data_upgrades() -> None:
+    """Add any optional data upgrade migrations here!"""
+
+def data_downgrades() -> None:
+    """Add any optional data downgrade migrations here!"""
@@ -0,0 +1,88 @@
+"""Partition profiles
+
+Revision ID: 1c3dccc5d23b
+Revises: 43d3c0841e5e
+Create Date: 2026-10-19 14:03:27.551902
+
+Opt-in: pass ``-x profiles_partitioning=hash[:N]`` or
+``-x profiles_partitioning=range[:M]`` to convert ``profiles`` to a
+partitioned table (see ``migrations/partitioning.py``). Without it the
+revision changes nothing; a deployment can still partition later with
+``python -m migrations.partitioning``.
+
+Partitioning rules out the unique index on ``lower(email)`` that
+``22e6036f492a`` adds: a partitioned table gets no such index, so emails are
+not unique and the ``/profiles/by-email`` routes answer 501. Once that index
+exists, ``prepare`` refuses to partition; drop it first to choose
+partitioning over email upserts.
+
+"""
+
+import warnings
+from typing import TYPE_CHECKING
+
+import sqlalchemy as sa
+from alembic import context, op
+from advanced_alchemy.types import EncryptedString, EncryptedText, GUID, ORA_JSONB, DateTimeUTC, StoredObject, PasswordHash
+from sqlalchemy import Text  # noqa: F401
+
+from migrations import partitioning
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+__all__ = ["downgrade", "upgrade", "schema_upgrades", "schema_downgrades", "data_upgrades", "data_downgrades"]
+
+sa.GUID = GUID
+sa.DateTimeUTC = DateTimeUTC
+sa.ORA_JSONB = ORA_JSONB
+sa.EncryptedString = EncryptedString
+sa.EncryptedText = EncryptedText
+sa.StoredObject = StoredObject
+
+# revision identifiers, used by Alembic.
+revision = '1c3dccc5d23b'
+down_revision = '43d3c0841e5e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=UserWarning)
+        with op.get_context().autocommit_block():
+            schema_upgrades()
+            data_upgrades()
+
+def downgrade() -> None:
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=UserWarning)
+        with op.get_context().autocommit_block():
+            data_downgrades()
+            schema_downgrades()
+
+def schema_upgrades() -> None:
+    """schema upgrade migrations go here."""
+    option = context.get_x_argument(as_dictionary=True).get("profiles_partitioning")
+    if not option:
+        return
+    partitioning.migrate(op.get_bind(), partitioning.parse_scheme(option))
+
+def schema_downgrades() -> None:
+    """schema downgrade migrations go here."""
+    connection = op.get_bind()
+    if partitioning.is_partitioned(connection):
+        msg = (
+            "profiles is partitioned and cannot be converted back automatically; "
+            "the pre-partitioning heap is kept as profiles_unpartitioned until "
+            "`python -m migrations.partitioning cleanup` drops it"
+        )
+        raise RuntimeError(msg)
+    # Drop a copy left behind by an interrupted upgrade, if any.
+    partitioning.abort(connection)
+
+def data_upgrades() -> None:
+    """Add any optional data upgrade migrations here!"""
+
+def data_downgrades() -> None:
+    """Add any optional data downgrade migrations here!"""
@@ -0,0 +1,102 @@
+"""Unique profile email
+
+Revision ID: 22e6036f492a
+Revises: 1c3dccc5d23b
+Create Date: 2026-10-19 16:41:08.730144
+
+A unique index on a partitioned table has to include the partition key, so
+on a ``profiles`` table partitioned by ``1c3dccc5d23b`` the index is skipped
+with a warning. Case-insensitive email uniqueness is then not enforced and
+the ``/profiles/by-email`` routes answer 501.
+
+"""
+
+import logging
+import warnings
+from typing import TYPE_CHECKING
+
+import sqlalchemy as sa
+from alembic import op
+from advanced_alchemy.types import EncryptedString, EncryptedText, GUID, ORA_JSONB, DateTimeUTC, StoredObject, PasswordHash
+from sqlalchemy import Text  # noqa: F401
+
+from migrations import partitioning
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+__all__ = ["downgrade", "upgrade", "schema_upgrades", "schema_downgrades", "data_upgrades", "data_downgrades"]
+
+sa.GUID = GUID
+sa.DateTimeUTC = DateTimeUTC
+sa.ORA_JSONB = ORA_JSONB
+sa.EncryptedString = EncryptedString
+sa.EncryptedText = EncryptedText
+sa.StoredObject = StoredObject
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# revision identifiers, used by Alembic.
+revision = '22e6036f492a'
+down_revision = '1c3dccc5d23b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=UserWarning)
+        with op.get_context().autocommit_block():
+            schema_upgrades()
+            data_upgrades()
+
+def downgrade() -> None:
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=UserWarning)
+        with op.get_context().autocommit_block():
+            data_downgrades()
+            schema_downgrades()
+
+def schema_upgrades() -> None:
+    """schema upgrade migrations go here."""
+    connection = op.get_bind()
+    # A unique index on a partitioned table has to include the partition
+    # key, so lower(email) alone cannot be enforced there.
+    if partitioning.is_partitioned(connection):
+        logger.warning(
+            "profiles is partitioned; skipping uq_profiles_email_lower. Emails are"
+            " not unique and PUT /profiles/by-email will answer 501."
+        )
+        return
+    duplicates = connection.scalar(
+        sa.text(
+            "SELECT count(*) FROM (SELECT 1 FROM profiles WHERE email IS NOT NULL"
+            " GROUP BY lower(email) HAVING count(*) > 1) AS d"
+        )
+    )
+    if duplicates:
+        msg = f"{duplicates} emails are used by more than one profile; merge them first"
+        raise RuntimeError(msg)
+    # ON CONFLICT (lower(email)) in PUT /profiles/by-email infers this index.
+    op.create_index(
+        'uq_profiles_email_lower',
+        'profiles',
+        [sa.text('lower(email)')],
+        unique=True,
+        postgresql_concurrently=True,
+    )
+
+def schema_downgrades() -> None:
+    """schema downgrade migrations go here."""
+    op.drop_index(
+        'uq_profiles_email_lower',
+        table_name='profiles',
+        postgresql_concurrently=True,
+        if_exists=True,
+    )
+
+def data_upgrades() -> None:
+    """Add any optional data upgrade migrations here!"""
+
+def data_downgrades() -> None:
+    """Add any optional data downgrade migrations here!"""
@@ -1,11 +1,12 @@
 import logging
 
-from async_oauthlib import OAuth2Session
 from litestar import Controller, post, get, Request
 
 from config.zitadel import zitadel_settings
+from src.circuit import CircuitOpen, token_breaker
+from src.guards import idp_unavailable
 
-logger = logging.getLogger("_granian")
+logger = logging.getLogger(__name__)
 
 
 class AuthController(Controller):
@@ -13,6 +14,8 @@ class AuthController(Controller):
 
     @post("/authorization-url")
     async def get_authorization_url(self) -> dict:
+        from async_oauthlib import OAuth2Session
+
         zitadel_client = OAuth2Session(
             zitadel_settings.web_client_id,
             redirect_uri=zitadel_settings.web_redirect_uri,
@@ -23,7 +26,7 @@ class AuthController(Controller):
         )
 
         # State is used to prevent CSRF, keep this for later.
-        logger.info("state", state)
+        logger.debug("Issued authorization state %s", state)
         return {"authorization_url": authorization_url}
 
     @get("/callback")
@@ -34,15 +37,24 @@ class AuthController(Controller):
         if not code:
             return {"error": "No code provided"}
 
+        from async_oauthlib import OAuth2Session
+        from oauthlib.oauth2 import OAuth2Error
+
         async with OAuth2Session(
             client_id=zitadel_settings.web_client_id,
             state=state,
             redirect_uri=zitadel_settings.web_redirect_uri,
         ) as zitadel_client:
-            token = await zitadel_client.fetch_token(
-                token_url=zitadel_settings.token_endpoint,
-                code=code,
-                client_secret=zitadel_settings.web_client_secret,
-            )
+            try:
+                token = await token_breaker.call(
+                    zitadel_client.fetch_token,
+                    token_url=zitadel_settings.token_endpoint,
+                    code=code,
+                    client_secret=zitadel_settings.web_client_secret,
+                    # A rejected code or client is not an outage.
+                    is_failure=lambda e: not isinstance(e, OAuth2Error),
+                )
+            except CircuitOpen as e:
+                raise idp_unavailable(e)
 
         return {"token": token}
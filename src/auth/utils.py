@@ -33,6 +33,7 @@ from litestar.types import (
 from msgspec.structs import asdict
 
 from config.zitadel import zitadel_settings
+from src import deadlines
 from src.schemas import CurrentUser
 
 JWKS_CACHE: Dict[str, Any] = {}
@@ -63,7 +64,10 @@ oauth2_auth = OAuth2PasswordBearerAuth[CurrentUser](
 async def fetch_jwks() -> Dict[str, Any]:
     """Fetch Zitadel JWKS."""
     async with httpx.AsyncClient() as client:
-        response = await client.get(zitadel_settings.jwks_url, timeout=10)
+        response = await client.get(
+            zitadel_settings.jwks_url,
+            timeout=deadlines.timeout(zitadel_settings.http_timeout),
+        )
         response.raise_for_status()
         return response.json()
 
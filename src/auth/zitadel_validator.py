@@ -1,3 +1,4 @@
+import logging
 import time
 from typing import Dict
 
@@ -6,6 +7,9 @@ import requests
 from requests.auth import HTTPBasicAuth
 
 from config.zitadel import zitadel_settings
+from src import deadlines
+
+logger = logging.getLogger(__name__)
 
 
 class ValidatorError(Exception):
@@ -28,7 +32,12 @@ class ZitadelIntrospectTokenValidator(IntrospectTokenValidator):
             "scope": "openid",
         }
         auth = HTTPBasicAuth(zitadel_settings.client_id, zitadel_settings.client_secret)
-        resp = requests.post(url, data=data, auth=auth, timeout=60)
+        resp = requests.post(
+            url,
+            data=data,
+            auth=auth,
+            timeout=deadlines.timeout(zitadel_settings.http_timeout),
+        )
         resp.raise_for_status()
         return resp.json()
 
@@ -44,7 +53,7 @@ class ZitadelIntrospectTokenValidator(IntrospectTokenValidator):
         return False
 
     def validate_token(self, token, scopes, request):
-        print(f"Token: {token}\n")
+        logger.debug("Validating introspected token for sub %s", (token or {}).get("sub"))
         now = int(time.time())
         if not token:
             raise ValidatorError(
@@ -96,6 +105,11 @@ async def introspect_token_async(token_string: str) -> dict:
     auth = (zitadel_settings.client_id, zitadel_settings.client_secret)
 
     async with httpx.AsyncClient() as client:
-        resp = await client.post(url, data=data, auth=auth)
+        resp = await client.post(
+            url,
+            data=data,
+            auth=auth,
+            timeout=deadlines.timeout(zitadel_settings.http_timeout),
+        )
         resp.raise_for_status()
         return resp.json()
@@ -0,0 +1,211 @@
+"""Circuit breakers for calls to external services.
+
+A breaker counts consecutive failures of the calls made through it. After
+``failure_threshold`` of them it opens, and for ``recovery_timeout``
+seconds every call fails immediately with :class:`CircuitOpen` instead of
+waiting for its own timeout. After that the breaker is half-open: up to
+``half_open_max_calls`` probe calls go through. One success closes it again
+and one failure re-opens it.
+
+Breakers are per worker. Callers decide what to do with
+:class:`CircuitOpen`: serve something cached or fail fast with 503.
+
+A call cut short by the request's own deadline (see :mod:`src.deadlines`)
+counts as neither a failure nor a success. A client that asks for a tiny
+``X-Request-Timeout`` must not be able to open the breaker for everyone,
+and a call that never reached the service proves nothing about it.
+"""
+
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Literal, TypeVar
+
+import httpx
+import msgspec
+
+from config.zitadel import zitadel_settings
+from src import deadlines
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+State = Literal["closed", "open", "half_open"]
+
+# Timers may fire this early; a timeout this close to the deadline was the
+# deadline's.
+_DEADLINE_SLACK = 0.01
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"Circuit {name!r} is open; retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class InvalidResponse(Exception):
+    """A service answered successfully, but with a body that cannot be used."""
+
+
+class BreakerStats(msgspec.Struct):
+    """State and counters of one circuit breaker."""
+
+    state: State = "closed"
+    calls: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    rejected: int = 0
+    times_opened: int = 0
+    opened_at: float | None = None  # unix time
+    last_error: str | None = None
+
+
+def is_service_failure(exc: BaseException) -> bool:
+    """Transport errors, timeouts, 5xx, 429 and unusable bodies count.
+
+    Other 4xx responses do not: the service is up and said no.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(exc, (httpx.HTTPError, InvalidResponse, OSError, TimeoutError))
+
+
+def is_deadline_limited(exc: BaseException) -> bool:
+    """Whether ``exc`` came from the request's deadline rather than the service."""
+    if isinstance(exc, deadlines.DeadlineExceeded):
+        return True
+    if isinstance(exc, (httpx.TimeoutException, TimeoutError)):
+        left = deadlines.remaining()
+        return left is not None and left <= _DEADLINE_SLACK
+    return False
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        is_failure: Callable[[BaseException], bool] = is_service_failure,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.is_failure = is_failure
+        self.stats = BreakerStats()
+        self._probes = 0
+        self._opened_at = 0.0  # time.monotonic()
+
+    @property
+    def state(self) -> State:
+        return self.stats.state
+
+    async def call(
+        self,
+        fn: Callable[..., Awaitable[T]],
+        *args,
+        is_failure: Callable[[BaseException], bool] | None = None,
+        **kwargs,
+    ) -> T:
+        """Await ``fn(*args, **kwargs)`` through the breaker.
+
+        Raises:
+            CircuitOpen: if the breaker rejects the call.
+        """
+        probe = self._admit()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as exc:
+            if probe:
+                self._probes -= 1
+            if not isinstance(exc, Exception) or is_deadline_limited(exc):
+                raise  # cancelled or out of time: says nothing about the service
+            if (is_failure or self.is_failure)(exc):
+                self._on_failure(exc)
+            else:
+                # The service answered, just not with success (e.g. a 401).
+                self._on_success()
+            raise
+        if probe:
+            self._probes -= 1
+        self._on_success()
+        return result
+
+    def _admit(self) -> bool:
+        stats = self.stats
+        if stats.state == "open":
+            waited = time.monotonic() - self._opened_at
+            if waited < self.recovery_timeout:
+                stats.rejected += 1
+                raise CircuitOpen(self.name, self.recovery_timeout - waited)
+            stats.state = "half_open"
+            logger.info("Circuit %s half-open; probing", self.name)
+        if stats.state == "half_open":
+            if self._probes >= self.half_open_max_calls:
+                stats.rejected += 1
+                raise CircuitOpen(self.name, 0.0)
+            self._probes += 1
+            stats.calls += 1
+            return True
+        stats.calls += 1
+        return False
+
+    def _on_success(self) -> None:
+        self.stats.consecutive_failures = 0
+        if self.stats.state != "closed":
+            self._close()
+
+    def _on_failure(self, exc: Exception) -> None:
+        stats = self.stats
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        stats.last_error = repr(exc)
+        if (
+            stats.state == "half_open"
+            or stats.consecutive_failures >= self.failure_threshold
+        ):
+            if stats.state != "open":
+                stats.times_opened += 1
+                logger.warning(
+                    "Circuit %s opened after %d failures: %r",
+                    self.name,
+                    stats.consecutive_failures,
+                    exc,
+                )
+            stats.state = "open"
+            stats.opened_at = time.time()
+            self._opened_at = time.monotonic()
+
+    def _close(self) -> None:
+        if self.stats.state != "closed":
+            logger.info("Circuit %s closed", self.name)
+        self.stats.state = "closed"
+        self.stats.consecutive_failures = 0
+        self.stats.opened_at = None
+
+
+def _idp_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_threshold=zitadel_settings.breaker_failure_threshold,
+        recovery_timeout=zitadel_settings.breaker_recovery_timeout,
+        half_open_max_calls=zitadel_settings.breaker_half_open_max_calls,
+    )
+
+
+introspection_breaker = _idp_breaker("zitadel.introspect")
+jwks_breaker = _idp_breaker("zitadel.jwks")
+token_breaker = _idp_breaker("zitadel.token")
+
+breakers = {
+    b.name: b for b in (introspection_breaker, jwks_breaker, token_breaker)
+}
+
+
+def snapshot() -> dict[str, BreakerStats]:
+    return {name: breaker.stats for name, breaker in breakers.items()}
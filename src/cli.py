@@ -0,0 +1,293 @@
+"""``nyx`` command line entry point.
+
+``nyx serve`` (or ``python -m src.cli serve``) runs the API in production: a
+supervisor process imports ``src.main`` once, binds the listening socket and
+forks worker processes that serve it with uvicorn. Workers share the
+preloaded code copy-on-write, while anything stateful (DB pools, JWKS cache,
+scheduler tasks) is created in each worker after the fork, either by the
+application's startup hooks or lazily on first use.
+
+Signals sent to the supervisor:
+- ``SIGHUP``: replace workers one at a time. A new worker starts before the
+  old one is told to finish its in-flight requests and exit. Code is not
+  reloaded because it was preloaded; restart the supervisor to deploy.
+- ``SIGTERM``/``SIGINT``: graceful shutdown of all workers.
+Workers that die unexpectedly are replaced. Workers that die right after
+they start (e.g. the database is down) are replaced after a growing delay,
+and the supervisor exits with status 1 once too many have failed in a row.
+"""
+
+import importlib
+import logging
+import os
+import signal
+import socket
+import time
+
+import click
+
+from config.base import settings
+from src.log import configure_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+APP_PATH = "src.main:app"
+
+
+def resolve_worker_count(workers: int) -> int:
+    """Use ``workers`` if positive, otherwise one worker per CPU."""
+    if workers > 0:
+        return workers
+    return os.cpu_count() or 1
+
+
+def load_app(path: str = APP_PATH):
+    module_name, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def reset_worker_state() -> None:
+    """Drop per-process state that must never be shared across a fork.
+
+    Nothing in ``src.main`` opens connections or fills caches at import
+    time, so this is a safety net: if the supervisor ever did, each worker
+    starts clean and builds its own.
+    """
+    from config.db import alchemy_config
+    from src.guards import JWKSCache, get_auth_cache
+
+    if alchemy_config.engine_instance is not None:
+        # close=False leaves the parent's connections alone; the child just
+        # forgets them and opens its own.
+        alchemy_config.engine_instance.sync_engine.dispose(close=False)
+    JWKSCache._keys = None
+    JWKSCache._public_keys = {}
+    JWKSCache._last_fetch = 0
+    JWKSCache._last_attempt = 0.0
+    # Each worker opens the shared cache itself so its flock is its own.
+    get_auth_cache.cache_clear()
+
+
+class Supervisor:
+    def __init__(
+        self,
+        app,
+        workers: int,
+        host: str,
+        port: int,
+        backlog: int,
+        keep_alive: int,
+        graceful_timeout: float,
+    ) -> None:
+        self.app = app
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.keep_alive = keep_alive
+        self.graceful_timeout = graceful_timeout
+        self.children: set[int] = set()
+        self._started: dict[int, float] = {}
+        self._owed = 0
+        self._next_spawn = 0.0
+        self._failures = 0
+        self._reload = False
+        self._stop = False
+        self.exit_code = 0
+
+    def run(self) -> int:
+        """Serve until stopped; return the supervisor's exit status."""
+        sock = self._bind()
+        signal.signal(signal.SIGHUP, self._on_hup)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        logger.info(
+            "Serving on %s:%s with %d workers", self.host, self.port, self.workers
+        )
+        for _ in range(self.workers):
+            self._spawn(sock)
+
+        while not self._stop:
+            self._reap(sock, respawn=True)
+            if self._owed and time.monotonic() >= self._next_spawn:
+                for _ in range(self._owed):
+                    self._spawn(sock)
+                self._owed = 0
+            if self._reload:
+                self._reload = False
+                self._rolling_restart(sock)
+            time.sleep(0.2)
+
+        self._terminate(list(self.children))
+        sock.close()
+        return self.exit_code
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self, sock: socket.socket) -> int:
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            self._started[pid] = time.monotonic()
+            return pid
+
+        # Worker process: restore default signal handling so uvicorn can
+        # install its own graceful-shutdown handlers.
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            self._serve(sock)
+        except BaseException:
+            logger.exception("Worker %s crashed", os.getpid())
+            exit_code = 1
+        finally:
+            # os._exit skips atexit; write out the queued records first.
+            shutdown_logging()
+            os._exit(exit_code)
+
+    def _serve(self, sock: socket.socket) -> None:
+        import uvicorn
+
+        config = uvicorn.Config(
+            self.app,
+            backlog=self.backlog,
+            timeout_keep_alive=self.keep_alive,
+            timeout_graceful_shutdown=self.graceful_timeout,
+            lifespan="on",
+            # Leave uvicorn's loggers to the queue set up by src.log.
+            log_config=None,
+        )
+        uvicorn.Server(config).run(sockets=[sock])
+
+    def _reap(self, sock: socket.socket, respawn: bool) -> None:
+        for pid in list(self.children):
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if not done:
+                continue
+            self.children.discard(pid)
+            uptime = time.monotonic() - self._started.pop(pid)
+            if not respawn or self._stop:
+                continue
+            if uptime >= settings.server_min_uptime_s:
+                self._failures = 0
+                logger.warning(
+                    "Worker %s exited with status %s; replacing it", pid, status
+                )
+                self._owed += 1
+                continue
+            self._failures += 1
+            if self._failures >= settings.server_max_startup_failures:
+                logger.error(
+                    "Worker %s exited with status %s after %.1fs; %d workers in a "
+                    "row failed at startup, shutting down",
+                    pid,
+                    status,
+                    uptime,
+                    self._failures,
+                )
+                self.exit_code = 1
+                self._stop = True
+                return
+            delay = min(
+                0.5 * 2 ** (self._failures - 1), settings.server_respawn_backoff_max_s
+            )
+            logger.warning(
+                "Worker %s exited with status %s after %.1fs; replacing it in %.1fs",
+                pid,
+                status,
+                uptime,
+                delay,
+            )
+            self._owed += 1
+            self._next_spawn = time.monotonic() + delay
+
+    def _rolling_restart(self, sock: socket.socket) -> None:
+        logger.info("SIGHUP received: restarting workers")
+        for old in list(self.children):
+            self._spawn(sock)
+            self._terminate([old])
+
+    def _terminate(self, pids: list[int]) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        pending = set(pids)
+        while pending and time.monotonic() < deadline:
+            for pid in list(pending):
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    pending.discard(pid)
+                    self._started.pop(pid, None)
+            time.sleep(0.1)
+        for pid in pending:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self._started.pop(pid, None)
+        self.children.difference_update(pids)
+
+    def _on_hup(self, *_) -> None:
+        self._reload = True
+
+    def _on_stop(self, *_) -> None:
+        self._stop = True
+
+
+@click.group()
+def cli() -> None:
+    """Nyx service commands."""
+
+
+@cli.command()
+@click.option("--host", default=settings.server_host, show_default=True)
+@click.option("--port", default=settings.server_port, show_default=True, type=int)
+@click.option(
+    "--workers",
+    default=settings.server_workers,
+    show_default=True,
+    type=int,
+    help="Worker processes; 0 means one per CPU.",
+)
+@click.option("--backlog", default=settings.server_backlog, show_default=True, type=int)
+@click.option(
+    "--keep-alive",
+    default=settings.server_keep_alive_s,
+    show_default=True,
+    type=int,
+    help="Seconds to keep idle HTTP connections open.",
+)
+def serve(host: str, port: int, workers: int, backlog: int, keep_alive: int) -> None:
+    """Run the API with a preloaded app and forked uvicorn workers."""
+    # No listener thread in the supervisor; each worker starts its own.
+    configure_logging(background=False)
+    workers = resolve_worker_count(workers)
+    app = load_app()
+    os.register_at_fork(after_in_child=reset_worker_state)
+    exit_code = Supervisor(
+        app,
+        workers=workers,
+        host=host,
+        port=port,
+        backlog=backlog,
+        keep_alive=keep_alive,
+        graceful_timeout=settings.server_graceful_timeout_s,
+    ).run()
+    if exit_code:
+        raise SystemExit(exit_code)
+
+
+def main() -> None:
+    cli()
+
+
+if __name__ == "__main__":
+    main()
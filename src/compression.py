@@ -0,0 +1,288 @@
+"""Response compression with ``Accept-Encoding`` negotiation.
+
+Litestar's :class:`~litestar.middleware.compression.CompressionMiddleware`
+supports a single backend with a gzip fallback and matches encodings by
+substring. This middleware picks the best of zstd, brotli and gzip that
+both sides support, honouring ``q`` values, and leaves alone responses that
+are already encoded, are not worth compressing (images, archives, ...) or
+must not be buffered (Server-Sent Events). Streaming responses are
+compressed chunk by chunk, with each chunk flushed so the client can
+decode it straight away.
+
+brotli and zstd are optional; install the ``compression`` extra to enable
+them. Without them only gzip is offered.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import TYPE_CHECKING, ClassVar
+
+from litestar.config.compression import CompressionConfig
+from litestar.datastructures import Headers, MutableScopeHeaders
+from litestar.middleware import DefineMiddleware
+from litestar.middleware.compression import CompressionMiddleware
+from litestar.middleware.compression.facade import CompressionFacade
+from litestar.middleware.compression.gzip_facade import GzipCompression
+from litestar.utils.empty import value_or_default
+from litestar.utils.scope.state import ScopeState
+
+from config.base import settings
+
+if TYPE_CHECKING:
+    from litestar.types import HTTPResponseStartEvent, Message, Scope, Send
+
+# Content types that are already compressed, or that must reach the client
+# unbuffered (SSE). Matched as prefixes of the response media type.
+DEFAULT_SKIP_CONTENT_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zstd",
+    "application/octet-stream",
+    "text/event-stream",
+)
+
+
+def _zstd_module():
+    try:
+        from compression import zstd  # Python 3.14+
+
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+
+        return zstandard
+    except ImportError:
+        return None
+
+
+def available_encodings() -> set[str]:
+    encodings = {"gzip"}
+    try:
+        import brotli  # noqa: F401
+
+        encodings.add("br")
+    except ImportError:
+        pass
+    if _zstd_module() is not None:
+        encodings.add("zstd")
+    return encodings
+
+
+class ZstdCompression(CompressionFacade):
+    __slots__ = ("buffer", "compression_encoding", "compressor", "_flush_block")
+    encoding: ClassVar[str] = "zstd"
+
+    def __init__(
+        self, buffer: BytesIO, compression_encoding: str, config: CompressionConfig
+    ) -> None:
+        zstd = _zstd_module()
+        level = config.backend_config.zstd_level
+        self.buffer = buffer
+        self.compression_encoding = compression_encoding
+        if hasattr(zstd, "ZstdCompressor") and hasattr(zstd, "COMPRESSOBJ_FLUSH_BLOCK"):
+            # zstandard
+            self.compressor = zstd.ZstdCompressor(level=level).compressobj()
+            self._flush_block = zstd.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            # compression.zstd
+            self.compressor = zstd.ZstdCompressor(level=level)
+            self._flush_block = zstd.ZstdCompressor.FLUSH_BLOCK
+
+    def write(self, body: bytes) -> None:
+        self.buffer.write(self.compressor.compress(body))
+        self.buffer.write(self.compressor.flush(self._flush_block))
+
+    def close(self) -> None:
+        self.buffer.write(self.compressor.flush())
+
+
+def _brotli_facade() -> type[CompressionFacade]:
+    from litestar.middleware.compression.brotli_facade import BrotliCompression
+
+    return BrotliCompression
+
+
+@dataclass
+class NegotiationOptions:
+    """Settings for :class:`NegotiatingCompressionMiddleware`.
+
+    ``encodings`` is the server's order of preference, used to break ties
+    between encodings the client accepts with the same ``q``.
+    """
+
+    encodings: tuple[str, ...] = ("zstd", "br", "gzip")
+    zstd_level: int = 3
+    skip_content_types: tuple[str, ...] = DEFAULT_SKIP_CONTENT_TYPES
+    enabled_encodings: frozenset[str] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.enabled_encodings = frozenset(
+            e for e in self.encodings if e in available_encodings()
+        )
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """Map each coding in an ``Accept-Encoding`` header to its ``q`` value."""
+    accepted: dict[str, float] = {}
+    for part in header.split(","):
+        coding, *params = (p.strip() for p in part.split(";"))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def choose_encoding(header: str, options: NegotiationOptions) -> str | None:
+    """Return the preferred encoding for ``header``, or ``None`` for identity."""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best: tuple[float, int] | None = None
+    chosen = None
+    for rank, encoding in enumerate(options.encodings):
+        if encoding not in options.enabled_encodings:
+            continue
+        q = accepted.get(encoding, wildcard)
+        if q <= 0:
+            continue
+        if best is None or (q, -rank) > best:
+            best, chosen = (q, -rank), encoding
+    return chosen
+
+
+class NegotiatingCompressionMiddleware(CompressionMiddleware):
+    async def __call__(self, scope: Scope, receive, send: Send) -> None:
+        encoding = choose_encoding(
+            Headers.from_scope(scope).get("accept-encoding", ""),
+            self.config.backend_config,
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(
+            scope,
+            receive,
+            self.create_compression_send_wrapper(
+                send=send, compression_encoding=encoding, scope=scope
+            ),
+        )
+
+    def _facade(self, encoding: str, buffer: BytesIO) -> CompressionFacade:
+        if encoding == "zstd":
+            facade_type: type[CompressionFacade] = ZstdCompression
+        elif encoding == "br":
+            facade_type = _brotli_facade()
+        else:
+            facade_type = GzipCompression
+        return facade_type(
+            buffer=buffer, compression_encoding=encoding, config=self.config
+        )
+
+    def _should_compress(self, start: HTTPResponseStartEvent) -> bool:
+        headers = MutableScopeHeaders(start)
+        if headers.get("content-encoding"):
+            return False
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return not media_type.startswith(self.config.backend_config.skip_content_types)
+
+    def create_compression_send_wrapper(
+        self, send: Send, compression_encoding: str, scope: Scope
+    ) -> Send:
+        buffer = BytesIO()
+        facade: CompressionFacade | None = None
+        start: HTTPResponseStartEvent | None = None
+        passthrough = False
+        connection_state = ScopeState.from_scope(scope)
+        minimum_size = self.config.minimum_size
+
+        def take() -> bytes:
+            data = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return data
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal facade, start, passthrough
+
+            if message["type"] == "http.response.start":
+                start = message
+                passthrough = not self._should_compress(message) or value_or_default(
+                    connection_state.is_cached, False
+                )
+                if passthrough:
+                    await send(message)
+                return
+            if passthrough or start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = MutableScopeHeaders(start)
+
+            if facade is None:
+                if not more_body and len(body) < minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                facade = self._facade(compression_encoding, buffer)
+                headers["Content-Encoding"] = compression_encoding
+                headers.extend_header_value("vary", "Accept-Encoding")
+                connection_state.response_compressed = True
+                facade.write(body)
+                if more_body:
+                    # Streamed: length unknown, send each chunk as it is ready.
+                    del headers["Content-Length"]
+                else:
+                    facade.close()
+                message["body"] = take()
+                if not more_body:
+                    headers["Content-Length"] = str(len(message["body"]))
+                await send(start)
+                await send(message)
+                return
+
+            facade.write(body)
+            if not more_body:
+                facade.close()
+            message["body"] = take()
+            await send(message)
+
+        return send_wrapper
+
+
+def build_compression_middleware() -> DefineMiddleware:
+    # Registered as ordinary middleware: Litestar wraps handlers in its own
+    # CompressionMiddleware when ``compression_config`` is set, regardless of
+    # ``middleware_class``.
+    return DefineMiddleware(NegotiatingCompressionMiddleware, config=compression_config())
+
+
+def compression_config() -> CompressionConfig:
+    return CompressionConfig(
+        backend="gzip",
+        minimum_size=settings.compression_minimum_size,
+        gzip_compress_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        backend_config=NegotiationOptions(
+            encodings=tuple(settings.compression_encodings),
+            zstd_level=settings.compression_zstd_level,
+        ),
+    )
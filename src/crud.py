@@ -0,0 +1,605 @@
+"""Generated CRUD controllers for SQLAlchemy models.
+
+:func:`crud_controller` turns a model and its read and write msgspec structs
+into a Litestar controller, so every domain gets the same routes and the
+same performance work:
+
+- ``GET {path}``: offset pagination with a total, as before. Encoded
+  pages can be kept in a :class:`~src.result_cache.ResultCache`.
+- ``GET {path}/keyset?after=<id>``: keyset pagination on the primary key,
+  which stays fast however deep the page.
+- ``GET {path}/batch?ids=1&ids=2``: many items in one query.
+- ``GET {path}/{item_id}``: one item; concurrent reads of the same item
+  share one query and one encoded body.
+- ``POST {path}``, ``PATCH``/``DELETE {path}/{item_id}``: single writes.
+- ``POST {path}/bulk`` and ``DELETE {path}/bulk?ids=...``: bulk writes.
+
+Reads are Core selects mapped straight into the read struct, or into
+dicts of just the requested fields for ``fields=a,b``; no ORM instances
+are loaded (see :class:`CrudService`). Read responses are encoded straight
+to JSON or MessagePack bytes with msgspec (see :mod:`src.negotiation`),
+skipping Litestar's DTO layer.
+
+A domain that needs more than this subclasses the generated controller,
+adding routes or replacing generated handlers by defining a method with the
+same name.
+"""
+
+import functools
+import types
+from collections.abc import Callable, Sequence
+from typing import Any, ClassVar, Generic, TypeVar
+
+import msgspec
+from advanced_alchemy.exceptions import NotFoundError
+from advanced_alchemy.filters import LimitOffset, OrderBy
+from advanced_alchemy.repository import SQLAlchemyAsyncRepository
+from advanced_alchemy.service import SQLAlchemyAsyncRepositoryService
+from litestar import Controller, Request, Response, delete, get, patch, post
+from litestar.di import Provide
+from litestar.exceptions import HTTPException
+from litestar.params import Parameter
+from sqlalchemy import Column, Select, Table, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.negotiation import (
+    MSGPACK_MEDIA_TYPES,
+    NegotiatedMsgspecDTO,
+    NegotiatedResponse,
+    encode,
+    preferred_media_type,
+)
+from src.result_cache import ResultCache
+from src.schemas import OffsetPagination
+from src.singleflight import SingleFlight
+from src.tracing import span
+
+T = TypeVar("T")
+ModelT = TypeVar("ModelT")
+RepoT = TypeVar("RepoT", bound=SQLAlchemyAsyncRepository)
+
+
+class KeysetPage(msgspec.Struct, Generic[T]):
+    """A page of items in primary key order.
+
+    ``next`` is the ``after`` value for the following page, or ``None`` on
+    the last page.
+    """
+
+    items: list[T]
+    next: int | None = None
+
+
+class CrudService(SQLAlchemyAsyncRepositoryService[ModelT, RepoT]):
+    """Repository service with the read paths generated controllers use.
+
+    Subclasses set ``read_schema`` to the struct responses are built from
+    and ``resource`` to the name used in tracing spans. Methods taking
+    ``fields`` return plain dicts of just those fields, read with a
+    column-only query; without ``fields`` they return ``read_schema``
+    instances.
+
+    Reads are read-only Core selects of the schema's columns whose rows are
+    turned straight into ``read_schema`` instances, so no ORM instance is
+    built, added to the identity map or tracked for expiry. A service whose
+    read schema needs more than the table's columns, or that relies on ORM
+    loading, sets ``core_reads = False`` to read through the repository.
+    """
+
+    read_schema: ClassVar[type[msgspec.Struct]]
+    resource: ClassVar[str] = "item"
+    core_reads: ClassVar[bool] = True
+    _reads: ClassVar[SingleFlight[bytes]] = SingleFlight()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # One single-flight group per service, so ids of different models
+        # never share a result.
+        cls._reads = SingleFlight()
+
+    @property
+    def table(self) -> Table:
+        return self.repository.model_type.__table__
+
+    @property
+    def primary_key(self) -> Column:
+        return inspect(self.repository.model_type).primary_key[0]
+
+    @property
+    def reads_core(self) -> bool:
+        return (
+            self.core_reads
+            and self.primary_key.name in self.read_schema.__struct_fields__
+            and _schema_columns(self.table, self.read_schema) is not None
+        )
+
+    def to_read(self, obj: Any) -> msgspec.Struct:
+        return self.to_schema(obj, schema_type=self.read_schema)
+
+    def _select(
+        self,
+        columns: Sequence[Column],
+        where: Sequence[Any],
+        limit: int | None,
+        offset: int | None,
+    ) -> Select:
+        return (
+            select(*columns)
+            .where(*where)
+            .order_by(self.primary_key)
+            .limit(limit)
+            .offset(offset)
+        )
+
+    async def select_rows(
+        self,
+        fields: Sequence[str],
+        *where: Any,
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Read ``fields`` of the matching rows, in primary key order."""
+        columns = [self.table.c[name] for name in fields]
+        result = await self.repository.session.execute(
+            self._select(columns, where, limit, offset)
+        )
+        return [dict(row) for row in result.mappings()]
+
+    async def select_items(
+        self,
+        *where: Any,
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> list[msgspec.Struct]:
+        """Read the matching rows as ``read_schema`` instances, in primary key order.
+
+        Columns are selected in the struct's field order and each row is
+        passed to it positionally. Struct constructors do not validate, which
+        is fine for rows that were validated when they were written.
+        """
+        schema = self.read_schema
+        columns = _schema_columns(self.table, schema)
+        result = await self.repository.session.execute(
+            self._select(columns, where, limit, offset)
+        )
+        return [schema(*row) for row in result]
+
+    async def get_encoded(
+        self,
+        item_id: Any,
+        media_type: str = "application/json",
+        fields: Sequence[str] | None = None,
+    ) -> bytes:
+        """Return the item ``item_id`` encoded as JSON or MessagePack.
+
+        Concurrent reads of the same id, format and fields share one
+        in-flight query and its encoded result, so a burst of requests for a
+        hot item costs a single pooled connection instead of one per request.
+
+        Raises:
+            NotFoundError: if there is no such item.
+        """
+
+        async def load() -> bytes:
+            where = self.primary_key == item_id
+            if fields:
+                found: list[Any] = await self.select_rows(fields, where)
+            elif self.reads_core:
+                found = await self.select_items(where)
+            else:
+                found = [self.to_read(await self.get(item_id))]
+            if not found:
+                raise NotFoundError("No item found when making query")
+            with span(f"{self.resource}.encode", {"media_type": media_type}):
+                return encode(found[0], media_type)
+
+        key = (item_id, media_type in MSGPACK_MEDIA_TYPES, tuple(fields or ()))
+        with span(
+            f"{type(self).__name__}.get_encoded", {f"{self.resource}.id": item_id}
+        ):
+            return await self._reads.do(key, load)
+
+    async def list_page(
+        self, limit: int, offset: int, fields: Sequence[str] | None = None
+    ) -> tuple[list[Any], int]:
+        """Return one offset page and the total number of items."""
+        if not fields and not self.reads_core:
+            results, total = await self.list_and_count(
+                LimitOffset(limit=limit, offset=offset)
+            )
+            return [self.to_read(obj) for obj in results], total
+        with span(f"{type(self).__name__}.list_page"):
+            if fields:
+                items: list[Any] = await self.select_rows(
+                    fields, limit=limit, offset=offset
+                )
+            else:
+                items = await self.select_items(limit=limit, offset=offset)
+            return items, await self.count()
+
+    async def keyset_page(
+        self, after: int | None, limit: int, fields: Sequence[str] | None = None
+    ) -> KeysetPage[Any]:
+        """Return up to ``limit`` items with a primary key above ``after``."""
+        key = self.primary_key
+        where = [] if after is None else [key > after]
+        with span(f"{type(self).__name__}.keyset_page"):
+            if fields:
+                columns = list(dict.fromkeys([*fields, key.name]))
+                items: list[Any] = await self.select_rows(columns, *where, limit=limit)
+                last = items[-1][key.name] if items else None
+                if key.name not in fields:
+                    for item in items:
+                        del item[key.name]
+            elif self.reads_core:
+                items = await self.select_items(*where, limit=limit)
+                last = getattr(items[-1], key.name) if items else None
+            else:
+                results = await self.list(
+                    *where,
+                    OrderBy(field_name=key.name, sort_order="asc"),
+                    LimitOffset(limit=limit, offset=0),
+                )
+                items = [self.to_read(obj) for obj in results]
+                last = getattr(results[-1], key.name) if results else None
+        return KeysetPage(items=items, next=last if len(items) == limit else None)
+
+    async def get_many(
+        self, item_ids: Sequence[Any], fields: Sequence[str] | None = None
+    ) -> list[Any]:
+        """Return the items that exist among ``item_ids``, in the order given."""
+        key = self.primary_key
+        with span(f"{type(self).__name__}.get_many", {"count": len(item_ids)}):
+            if fields:
+                columns = list(dict.fromkeys([*fields, key.name]))
+                rows = await self.select_rows(columns, key.in_(item_ids))
+                found = {row[key.name]: row for row in rows}
+                if key.name not in fields:
+                    for row in rows:
+                        del row[key.name]
+            elif self.reads_core:
+                items = await self.select_items(key.in_(item_ids))
+                found = {getattr(item, key.name): item for item in items}
+            else:
+                results = await self.list(key.in_(item_ids))
+                found = {getattr(obj, key.name): self.to_read(obj) for obj in results}
+        return [found[i] for i in dict.fromkeys(item_ids) if i in found]
+
+
+@functools.cache
+def _schema_columns(
+    table: Table, schema: type[msgspec.Struct]
+) -> tuple[Column, ...] | None:
+    # The table's columns in the struct's field order, or None when a field
+    # is not a column.
+    if not all(name in table.c for name in schema.__struct_fields__):
+        return None
+    return tuple(table.c[name] for name in schema.__struct_fields__)
+
+
+def _named(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    # Handler names become OpenAPI operation ids, so give each generated
+    # handler the name a hand-written one would have had.
+    fn.__name__ = fn.__qualname__ = name
+    return fn
+
+
+def _respond(request: Request, content: Any, status_code: int = 200) -> Response:
+    media_type = preferred_media_type(request)
+    return NegotiatedResponse(
+        content=encode(content, media_type),
+        media_type=media_type,
+        status_code=status_code,
+    )
+
+
+def _default_service(
+    model: type, read_schema: type[msgspec.Struct], resource: str
+) -> type[CrudService]:
+    repository = types.new_class(
+        f"{model.__name__}Repository",
+        (SQLAlchemyAsyncRepository[model],),
+        exec_body=lambda ns: ns.update(model_type=model),
+    )
+    return types.new_class(
+        f"{model.__name__}Service",
+        (CrudService[model, repository],),
+        exec_body=lambda ns: ns.update(
+            repository_type=repository, read_schema=read_schema, resource=resource
+        ),
+    )
+
+
+def crud_controller(
+    model: type,
+    read_schema: type[msgspec.Struct],
+    write_schema: type[msgspec.Struct],
+    *,
+    path: str,
+    name: str | None = None,
+    plural: str | None = None,
+    service_type: type[CrudService] | None = None,
+    provide_service: Callable[..., Any] | None = None,
+    dto: type[NegotiatedMsgspecDTO] | None = None,
+    return_dto: type[NegotiatedMsgspecDTO] | None = None,
+    guards: Sequence[Any] | None = None,
+    tags: Sequence[str] | None = None,
+    max_batch: int = 1000,
+    list_cache: ResultCache | None = None,
+) -> type[Controller]:
+    """Build a controller with the standard CRUD routes for ``model``.
+
+    :param model: The SQLAlchemy model; its single-column primary key is
+                  used for item routes and keyset pagination.
+    :param read_schema: Struct returned by read routes.
+    :param write_schema: Struct accepted by create, update and bulk create.
+    :param path: The controller's path, e.g. ``/profiles``.
+    :param name: Singular resource name used in handler names and spans;
+                 defaults to the lower-cased model name.
+    :param plural: Plural resource name; defaults to ``name`` plus "s".
+    :param service_type: A :class:`CrudService` subclass; one is generated
+                         for ``model`` when omitted.
+    :param provide_service: Dependency provider for the service; defaults to
+                            one that builds it on the request's session.
+    :param dto: DTO for request bodies; defaults to a
+                :class:`NegotiatedMsgspecDTO` of ``write_schema``.
+    :param return_dto: DTO for write responses; defaults to a
+                       :class:`NegotiatedMsgspecDTO` of ``read_schema``.
+    :param guards: Guards applied to every route.
+    :param tags: OpenAPI tags.
+    :param max_batch: Most ids or items one batch or bulk request may carry.
+    :param list_cache: Caches the encoded pages of ``GET {path}``; it must be
+                       registered for the model's table so that writes
+                       invalidate it.
+    :return: A new :class:`~litestar.Controller` subclass.
+    """
+    name = name or model.__name__.lower()
+    plural = plural or f"{name}s"
+    Service = service_type or _default_service(model, read_schema, name)
+    valid_fields = frozenset(read_schema.__struct_fields__) & frozenset(
+        model.__table__.c.keys()
+    )
+
+    if provide_service is None:
+
+        async def provide_service(db_session: AsyncSession) -> Service:
+            return Service(session=db_session)
+
+    def parse_fields(fields: str | None) -> list[str] | None:
+        if not fields:
+            return None
+        selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in selected if f not in valid_fields]
+        if unknown:
+            raise HTTPException(
+                detail=f"Unknown fields: {', '.join(unknown)}.", status_code=400
+            )
+        return selected
+
+    def check_batch(count: int, status_code: int) -> None:
+        if count > max_batch:
+            raise HTTPException(
+                detail=f"At most {max_batch} {plural} per request.",
+                status_code=status_code,
+            )
+
+    FIELDS = Parameter(
+        query="fields",
+        required=False,
+        description="Comma-separated fields to return; all fields by default.",
+    )
+    ITEM_ID = Parameter(title=f"{name.title()} ID", description=f"The {name} ID.")
+    IDS = Parameter(query="ids", description=f"The {name} IDs.")
+
+    async def list_items(
+        self,
+        request: Request,
+        service: Service,
+        limit: int = Parameter(query="limit", default=10, ge=1),
+        offset: int = Parameter(query="offset", default=0, ge=0),
+        fields: str | None = FIELDS,
+    ) -> Response[OffsetPagination[read_schema]]:
+        """
+        Lists one page of items with the total count.
+
+        :param request: The current request, used to negotiate JSON or MessagePack.
+        :param service: The service for this model.
+        :param limit: Page size.
+        :param offset: Number of items to skip.
+        :param fields: Comma-separated fields to return.
+        :return: The page, its bounds and the total number of items.
+        """
+        selected = parse_fields(fields)
+        media_type = preferred_media_type(request)
+
+        async def load() -> bytes:
+            items, total = await service.list_page(limit, offset, selected)
+            page = OffsetPagination(items=items, total=total, limit=limit, offset=offset)
+            return encode(page, media_type)
+
+        if list_cache is None:
+            content = await load()
+        else:
+            key = (limit, offset, tuple(selected or ()), media_type in MSGPACK_MEDIA_TYPES)
+            content = await list_cache.get_or_load(key, load)
+        return NegotiatedResponse(content=content, media_type=media_type)
+
+    async def list_keyset(
+        self,
+        request: Request,
+        service: Service,
+        after: int | None = Parameter(
+            query="after",
+            required=False,
+            description="The `next` value of the previous page.",
+        ),
+        limit: int = Parameter(query="limit", default=100, ge=1),
+        fields: str | None = FIELDS,
+    ) -> Response[KeysetPage[read_schema]]:
+        """
+        Lists items in primary key order, one page after another.
+
+        Unlike offset pagination the cost of a page does not grow with its
+        position, and items written between requests are neither skipped
+        nor repeated.
+
+        :param request: The current request, used to negotiate JSON or MessagePack.
+        :param service: The service for this model.
+        :param after: Return items with a primary key above this value.
+        :param limit: Page size.
+        :param fields: Comma-separated fields to return.
+        :return: The page and the ``after`` value for the next one.
+        """
+        check_batch(limit, 400)
+        page = await service.keyset_page(after, limit, parse_fields(fields))
+        return _respond(request, page)
+
+    async def get_batch(
+        self,
+        request: Request,
+        service: Service,
+        ids: list[int] = IDS,
+        fields: str | None = FIELDS,
+    ) -> Response[list[read_schema]]:
+        """
+        Retrieves many items by ID with one query.
+
+        Missing IDs are left out of the result; the others keep the order
+        they were requested in.
+
+        :param request: The current request, used to negotiate JSON or MessagePack.
+        :param service: The service for this model.
+        :param ids: The IDs to retrieve.
+        :param fields: Comma-separated fields to return.
+        :return: The items found.
+        """
+        check_batch(len(ids), 400)
+        return _respond(request, await service.get_many(ids, parse_fields(fields)))
+
+    async def get_item(
+        self,
+        request: Request,
+        service: Service,
+        item_id: int = ITEM_ID,
+        fields: str | None = FIELDS,
+    ) -> Response[read_schema]:
+        """
+        Retrieves an item by ID.
+
+        Concurrent requests for the same ID share a single database query
+        and its encoded response body.
+
+        :param request: The current request, used to negotiate JSON or MessagePack.
+        :param service: The service for this model.
+        :param item_id: The ID of the item to retrieve.
+        :param fields: Comma-separated fields to return.
+        :return: The item.
+        """
+        media_type = preferred_media_type(request)
+        try:
+            content = await service.get_encoded(
+                item_id, media_type, parse_fields(fields)
+            )
+        except NotFoundError:
+            raise HTTPException(detail=f"No {name} found.", status_code=404)
+        return NegotiatedResponse(content=content, media_type=media_type)
+
+    async def create_item(self, service: Service, data: write_schema) -> read_schema:
+        """
+        Creates an item.
+
+        :param service: The service for this model.
+        :param data: The item to create.
+        :return: The created item.
+        """
+        return await service.create(data, auto_commit=True)
+
+    async def create_bulk(
+        self, service: Service, data: list[write_schema]
+    ) -> list[read_schema]:
+        """
+        Creates many items in one transaction.
+
+        :param service: The service for this model.
+        :param data: The items to create.
+        :return: The created items.
+        """
+        check_batch(len(data), 413)
+        if not data:
+            return []
+        return await service.create_many(data, auto_commit=True)
+
+    async def update_item(
+        self, service: Service, data: write_schema, item_id: int = ITEM_ID
+    ) -> read_schema:
+        """
+        Updates an item.
+
+        :param service: The service for this model.
+        :param data: The new values.
+        :param item_id: The ID of the item to update.
+        :return: The updated item.
+        """
+        return await service.update(data=data, item_id=item_id, auto_commit=True)
+
+    async def delete_item(self, service: Service, item_id: int = ITEM_ID) -> None:
+        """
+        Deletes an item.
+
+        :param service: The service for this model.
+        :param item_id: The ID of the item to delete.
+        :return: None
+        """
+        await service.delete(item_id)
+
+    async def delete_bulk(self, service: Service, ids: list[int] = IDS) -> None:
+        """
+        Deletes many items in one transaction.
+
+        :param service: The service for this model.
+        :param ids: The IDs of the items to delete.
+        :return: None
+        """
+        check_batch(len(ids), 400)
+        await service.delete_many(ids, auto_commit=True)
+
+    handlers = {
+        f"list_{plural}": get(path="", return_dto=None)(_named(f"list_{plural}", list_items)),
+        f"list_{plural}_keyset": get(path="/keyset", return_dto=None)(
+            _named(f"list_{plural}_keyset", list_keyset)
+        ),
+        f"get_{plural}_batch": get(path="/batch", return_dto=None)(
+            _named(f"get_{plural}_batch", get_batch)
+        ),
+        f"get_{name}": get(path="/{item_id:int}", return_dto=None)(
+            _named(f"get_{name}", get_item)
+        ),
+        f"create_{name}": post(path="")(_named(f"create_{name}", create_item)),
+        f"create_{plural}_bulk": post(path="/bulk")(
+            _named(f"create_{plural}_bulk", create_bulk)
+        ),
+        f"update_{name}": patch(path="/{item_id:int}")(
+            _named(f"update_{name}", update_item)
+        ),
+        f"delete_{name}": delete(path="/{item_id:int}")(
+            _named(f"delete_{name}", delete_item)
+        ),
+        f"delete_{plural}_bulk": delete(path="/bulk")(
+            _named(f"delete_{plural}_bulk", delete_bulk)
+        ),
+    }
+    return type(
+        f"{model.__name__}CrudController",
+        (Controller,),
+        {
+            "__doc__": f"{model.__name__} CRUD",
+            "path": path,
+            "tags": list(tags or [plural]),
+            "guards": list(guards or []),
+            "dependencies": {"service": Provide(provide_service)},
+            "dto": dto or NegotiatedMsgspecDTO[write_schema],
+            "return_dto": return_dto or NegotiatedMsgspecDTO[read_schema],
+            "response_class": NegotiatedResponse,
+            **handlers,
+        },
+    )
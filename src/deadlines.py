@@ -0,0 +1,134 @@
+"""Per-request deadlines.
+
+Every HTTP request gets a time budget: the route's ``opt["timeout"]`` (in
+seconds; ``None`` disables it), otherwise ``request_timeout_s``. A client can
+ask for a shorter budget with the ``X-Request-Timeout`` header; it never
+raises the route's budget or ``request_timeout_max_s``, and values that are
+not positive finite numbers are ignored. :class:`DeadlineMiddleware` stores the absolute
+deadline in a context variable and cancels the request when it passes,
+answering ``504``. The budget only covers producing the response; once the
+headers are sent (e.g. a Server-Sent Events stream) the deadline is lifted.
+
+Code below the middleware uses the remaining budget to bound its own work.
+:func:`install_statement_timeout` applies it to PostgreSQL
+``statement_timeout`` at the start of each transaction, and :func:`timeout`
+clamps outbound HTTP timeouts to it.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from contextvars import ContextVar
+
+from litestar.datastructures import Headers
+from litestar.exceptions import HTTPException
+from litestar.status_codes import HTTP_504_GATEWAY_TIMEOUT
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config.base import settings
+
+logger = logging.getLogger(__name__)
+
+# Absolute deadline on the time.monotonic() clock (the event loop's clock).
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    status_code = HTTP_504_GATEWAY_TIMEOUT
+    detail = "Request deadline exceeded"
+
+
+def remaining() -> float | None:
+    """Seconds left before the current request's deadline, or ``None``."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def timeout(default: float) -> float:
+    """Return ``default`` clamped to the remaining budget.
+
+    Raises:
+        DeadlineExceeded: if the deadline has already passed.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(default, left)
+
+
+def _budget(scope: Scope) -> float | None:
+    opt = scope["route_handler"].opt
+    budget = opt["timeout"] if "timeout" in opt else settings.request_timeout_s
+    if not budget:
+        return None
+    requested = Headers.from_scope(scope).get(settings.request_timeout_header)
+    if requested:
+        try:
+            seconds = float(requested)
+        except ValueError:
+            return budget
+        if math.isfinite(seconds) and seconds > 0:
+            budget = min(budget, seconds, settings.request_timeout_max_s)
+    return budget
+
+
+class DeadlineMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        budget = _budget(scope) if scope["type"] == "http" else None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        deadline = time.monotonic() + budget
+        started = False
+        token = _deadline.set(deadline)
+        try:
+            async with asyncio.timeout_at(deadline) as cm:
+
+                async def send_wrapper(message: Message) -> None:
+                    nonlocal started
+                    if message["type"] == "http.response.start":
+                        # Streaming responses may run for as long as they like.
+                        started = True
+                        cm.reschedule(None)
+                        _deadline.set(None)
+                    await send(message)
+
+                await self.app(scope, receive, send_wrapper)
+        except TimeoutError:
+            if started:
+                raise
+            logger.warning(
+                "%s %s exceeded its %.1fs deadline",
+                scope["method"],
+                scope["path"],
+                budget,
+            )
+            raise DeadlineExceeded() from None
+        finally:
+            _deadline.reset(token)
+
+
+def _set_statement_timeout(session, transaction, connection) -> None:
+    left = remaining()
+    if left is None:
+        return
+    # At least 1ms: 0 would disable the timeout.
+    ms = max(int(left * 1000), 1)
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {ms}")
+
+
+def install_statement_timeout() -> None:
+    """Bound every transaction opened during a request by its remaining budget."""
+    if not event.contains(Session, "after_begin", _set_statement_timeout):
+        event.listen(Session, "after_begin", _set_statement_timeout)
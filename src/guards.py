@@ -1,31 +1,305 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import math
+import os
+import tempfile
+from collections import OrderedDict
+
 import msgspec
 from litestar.connection import ASGIConnection
-from litestar.exceptions import NotAuthorizedException
+from litestar.exceptions import (
+    NotAuthorizedException,
+    PermissionDeniedException,
+    ServiceUnavailableException,
+)
 import httpx
 import jwt
 import time
+from typing import Any
 from litestar.handlers import BaseRouteHandler
 
 from config.zitadel import zitadel_settings
+from src import deadlines
+from src.circuit import (
+    CircuitOpen,
+    InvalidResponse,
+    introspection_breaker,
+    jwks_breaker,
+)
 from src.schemas import CurrentUser
-from src.auth.zitadel_validator import introspect_token_async
+from src.shared_cache import SharedCache
+from src.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSSnapshot(msgspec.Struct):
+    """Last good key set, persisted so a worker can boot without the IdP."""
+
+    fetched_at: float
+    keys: list[dict[str, Any]]
+
+
+class JWKSDocument(msgspec.Struct):
+    """The part of the IdP's JWKS response that is used."""
+
+    keys: list[dict[str, Any]]
+
+
+class AuthCache:
+    """Verified tokens and the JWKS, shared by all workers on the host.
+
+    Without it each worker verifies (or introspects) the same token and
+    fetches the same JWKS on its own. Tokens are keyed by a hash of the raw
+    token and kept until they expire, but no longer than
+    ``auth_token_cache_ttl`` seconds.
+    """
+
+    _JWKS_KEY = b"jwks"
+
+    def __init__(self, path: str, slots: int) -> None:
+        self._tokens = SharedCache(f"{path}.tokens", slots=slots, slot_size=1024)
+        self._jwks = SharedCache(f"{path}.jwks", slots=1, slot_size=64 * 1024)
+        self._user_decoder = msgspec.msgpack.Decoder(CurrentUser)
+        self._jwks_decoder = msgspec.msgpack.Decoder(JWKSSnapshot)
+
+    def get_user(self, token: str) -> CurrentUser | None:
+        data = self._tokens.get(token.encode())
+        return None if data is None else self._user_decoder.decode(data)
+
+    def put_user(self, token: str, user: CurrentUser) -> None:
+        expires_at = time.time() + zitadel_settings.auth_token_cache_ttl
+        if user.exp is not None:
+            expires_at = min(expires_at, user.exp)
+        self._tokens.set(token.encode(), msgspec.msgpack.encode(user), expires_at)
+
+    def get_jwks(self) -> JWKSSnapshot | None:
+        data = self._jwks.get(self._JWKS_KEY)
+        return None if data is None else self._jwks_decoder.decode(data)
+
+    def put_jwks(self, snapshot: JWKSSnapshot) -> None:
+        expires_at = snapshot.fetched_at + zitadel_settings.jwks_max_staleness
+        if not self._jwks.set(self._JWKS_KEY, msgspec.msgpack.encode(snapshot), expires_at):
+            logger.warning("JWKS too large for the shared auth cache")
+
+
+@functools.cache
+def get_auth_cache() -> AuthCache | None:
+    """Return this worker's handle on the shared auth cache, if enabled."""
+    if not zitadel_settings.auth_shared_cache_enabled:
+        return None
+    try:
+        return AuthCache(
+            zitadel_settings.auth_shared_cache_path,
+            zitadel_settings.auth_shared_cache_slots,
+        )
+    except OSError:
+        logger.exception("Shared auth cache unavailable; continuing without it")
+        return None
 
 
 class JWKSCache:
+    """Zitadel signing keys, parsed once per fetch.
+
+    The last good key set is also written to ``jwks_snapshot_path``. Workers
+    load it synchronously at startup (see :meth:`load_snapshot`) and can
+    verify tokens straight away, with a background refresh replacing it
+    shortly after. While the IdP is unreachable the cached keys are used for
+    up to ``jwks_max_staleness`` seconds after they were fetched; past that
+    requests fail with 503 rather than trust keys that may have been revoked.
+    """
+
     _keys: list[dict] | None = None
+    _public_keys: dict[str, Any] = {}  # kid -> parsed RSA public key
     _last_fetch = 0
+    _last_attempt = 0.0
     _ttl = 3600  # refresh every 1 hour
+    _retry_interval = 30  # seconds between refresh attempts on the request path
+    _snapshot_decoder = msgspec.json.Decoder(JWKSSnapshot)
+    _document_decoder = msgspec.json.Decoder(JWKSDocument)
 
     @classmethod
     async def get_keys(cls) -> list[dict]:
-        if cls._keys is None or (time.time() - cls._last_fetch) > cls._ttl:
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(zitadel_settings.jwks_url)
-                resp.raise_for_status()
-                cls._keys = resp.json()["keys"]
-                cls._last_fetch = time.time()
+        now = time.time()
+        if cls._keys is None or (now - cls._last_fetch) > cls._ttl:
+            if cls._keys is None or now - cls._last_attempt > cls._retry_interval:
+                cls._last_attempt = now
+                try:
+                    await cls.refresh()
+                except CircuitOpen as e:
+                    if zitadel_settings.idp_fallback == "fail":
+                        raise idp_unavailable(e)
+                except (httpx.HTTPError, InvalidResponse) as e:
+                    logger.warning("JWKS refresh failed: %r", e)
+        if cls._keys is None or not cls.is_usable():
+            raise ServiceUnavailableException("Signing keys are unavailable")
         return cls._keys
 
+    @classmethod
+    def is_usable(cls) -> bool:
+        """Whether cached keys exist and are within ``jwks_max_staleness``."""
+        return (
+            cls._keys is not None
+            and time.time() - cls._last_fetch <= zitadel_settings.jwks_max_staleness
+        )
+
+    @classmethod
+    async def get_public_key(cls, kid: str | None) -> Any | None:
+        """Return the parsed public key for ``kid``, parsing each JWK only once."""
+        jwks = await cls.get_keys()
+        key = cls._public_keys.get(kid)
+        if key is None:
+            jwk = next((k for k in jwks if k.get("kid") == kid), None)
+            if jwk is None:
+                return None
+            key = cls._public_keys[kid] = jwt.algorithms.RSAAlgorithm.from_jwk(jwk)
+        return key
+
+    @classmethod
+    async def refresh(cls) -> None:
+        """Fetch the JWKS, unless another worker on the host did so recently."""
+        cache = get_auth_cache()
+        if cache is not None:
+            shared = cache.get_jwks()
+            if (
+                shared is not None
+                and shared.fetched_at > cls._last_fetch
+                and time.time() - shared.fetched_at < cls._ttl
+            ):
+                cls._set(shared.keys, shared.fetched_at)
+                return
+
+        with span("auth.jwks_fetch"):
+            keys = await jwks_breaker.call(cls._fetch)
+        fetched_at = time.time()
+        cls._set(keys, fetched_at)
+        snapshot = JWKSSnapshot(fetched_at=fetched_at, keys=keys)
+        if cache is not None:
+            cache.put_jwks(snapshot)
+        if zitadel_settings.jwks_snapshot_path:
+            try:
+                await asyncio.to_thread(
+                    cls._write_snapshot, zitadel_settings.jwks_snapshot_path, snapshot
+                )
+            except OSError:
+                logger.exception("Could not persist JWKS snapshot")
+
+    @classmethod
+    async def _fetch(cls) -> list[dict]:
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(
+                zitadel_settings.jwks_url,
+                timeout=deadlines.timeout(zitadel_settings.http_timeout),
+            )
+            resp.raise_for_status()
+        try:
+            return cls._document_decoder.decode(resp.content).keys
+        except msgspec.DecodeError as e:
+            raise InvalidResponse(f"Malformed JWKS: {e}") from e
+
+    @classmethod
+    def load_snapshot(cls, path: str | None = None) -> bool:
+        """Load the persisted key set; returns ``True`` if usable keys were loaded.
+
+        Blocking, and meant to be called once at startup. A missing,
+        unreadable or too stale snapshot is ignored.
+        """
+        path = path or zitadel_settings.jwks_snapshot_path
+        if not path:
+            return False
+        try:
+            with open(path, "rb") as f:
+                snapshot = cls._snapshot_decoder.decode(f.read())
+        except FileNotFoundError:
+            return False
+        except (OSError, msgspec.DecodeError):
+            logger.warning("Ignoring unreadable JWKS snapshot at %s", path)
+            return False
+        age = time.time() - snapshot.fetched_at
+        if age > zitadel_settings.jwks_max_staleness:
+            logger.warning("Ignoring JWKS snapshot fetched %.0fs ago", age)
+            return False
+        cls._set(snapshot.keys, snapshot.fetched_at)
+        return True
+
+    @classmethod
+    def _set(cls, keys: list[dict], fetched_at: float) -> None:
+        cls._public_keys = {
+            k["kid"]: jwt.algorithms.RSAAlgorithm.from_jwk(k)
+            for k in keys
+            if k.get("kty") == "RSA" and "kid" in k
+        }
+        cls._keys = keys
+        cls._last_fetch = fetched_at
+
+    @staticmethod
+    def _write_snapshot(path: str, snapshot: JWKSSnapshot) -> None:
+        # Write to a temporary file in the same directory and rename it over
+        # the old snapshot, so readers never see a partial file even when
+        # several workers refresh at once.
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".jwks-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(msgspec.json.encode(snapshot))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def idp_unavailable(error: CircuitOpen) -> ServiceUnavailableException:
+    return ServiceUnavailableException(
+        "Identity provider unavailable",
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+    )
+
+
+class IntrospectionCache:
+    """Recent introspection results, used only while the IdP circuit is open.
+
+    Bounded LRU keyed by a hash of the token. An entry is served for at most
+    ``introspection_cache_staleness`` seconds after it was introspected and
+    never past the token's ``exp``.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._maxsize = maxsize
+        self._entries: OrderedDict[bytes, tuple[CurrentUser, float]] = OrderedDict()
+
+    def put(self, token: str, user: CurrentUser) -> None:
+        if not self._maxsize:
+            return
+        key = _token_key(token)
+        self._entries[key] = (user, time.time())
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, token: str) -> CurrentUser | None:
+        entry = self._entries.get(_token_key(token))
+        if entry is None:
+            return None
+        user, introspected_at = entry
+        now = time.time()
+        if now - introspected_at > zitadel_settings.introspection_cache_staleness or (
+            user.exp is not None and user.exp <= now
+        ):
+            return None
+        return user
+
+
+def _token_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+introspection_cache = IntrospectionCache(zitadel_settings.introspection_cache_size)
+
 
 async def jwt_guard(connection: ASGIConnection, _: BaseRouteHandler) -> None:
     auth = connection.headers.get("authorization")
@@ -33,25 +307,36 @@ async def jwt_guard(connection: ASGIConnection, _: BaseRouteHandler) -> None:
         raise NotAuthorizedException("Missing Authorization header")
 
     token = auth.removeprefix("Bearer ").strip()
-    jwks = await JWKSCache.get_keys()
+    cache = get_auth_cache()
+    if cache is not None:
+        with span("auth.cache_lookup"):
+            user = cache.get_user(token)
+        if user is not None:
+            connection.state.current_user = user
+            return
+
     header = jwt.get_unverified_header(token)
 
-    key = next((k for k in jwks if k["kid"] == header.get("kid")), None)
+    key = await JWKSCache.get_public_key(header.get("kid"))
     if not key:
         raise NotAuthorizedException("Invalid key ID")
 
     try:
-        payload = jwt.decode(
-            token,
-            jwt.algorithms.RSAAlgorithm.from_jwk(key),
-            algorithms=["RS256"],
-            audience=zitadel_settings.audience,
-        )
+        with span("auth.verify"):
+            payload = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=zitadel_settings.audience,
+            )
     except jwt.PyJWTError as e:
         raise NotAuthorizedException(str(e))
 
     # ⚡ Convert to typed msgspec.Struct
-    connection.state.current_user = msgspec.convert(payload, type=CurrentUser)
+    user = msgspec.convert(payload, type=CurrentUser)
+    if cache is not None:
+        cache.put_user(token, user)
+    connection.state.current_user = user
 
 
 async def introspect_guard(connection: ASGIConnection, _: BaseRouteHandler) -> None:
@@ -60,9 +345,30 @@ async def introspect_guard(connection: ASGIConnection, _: BaseRouteHandler) -> N
         raise NotAuthorizedException("Missing Authorization header")
 
     token_string = auth.removeprefix("Bearer ").strip()
+    cache = get_auth_cache()
+    if cache is not None:
+        with span("auth.cache_lookup"):
+            user = cache.get_user(token_string)
+        if user is not None:
+            connection.state.current_user = user
+            return
+
+    # Imported on first use: the validator module pulls in authlib and requests,
+    # which only deployments running with introspection need.
+    from src.auth.zitadel_validator import introspect_token_async
 
     try:
-        token = await introspect_token_async(token_string)
+        with span("auth.introspect"):
+            token = await introspection_breaker.call(
+                introspect_token_async, token_string
+            )
+    except CircuitOpen as e:
+        if zitadel_settings.idp_fallback == "cache" and (
+            user := introspection_cache.get(token_string)
+        ):
+            connection.state.current_user = user
+            return
+        raise idp_unavailable(e)
     except httpx.HTTPStatusError as e:
         raise NotAuthorizedException(f"Introspection failed: {e.response.text}")
     except httpx.RequestError as e:
@@ -87,13 +393,26 @@ async def introspect_guard(connection: ASGIConnection, _: BaseRouteHandler) -> N
         "exp": token.get("exp"),
     }
 
-    connection.state.current_user = msgspec.convert(user_data, type=CurrentUser)
+    user = msgspec.convert(user_data, type=CurrentUser)
+    introspection_cache.put(token_string, user)
+    if cache is not None:
+        cache.put_user(token_string, user)
+    connection.state.current_user = user
 
 
 async def auth_guard(
     connection: ASGIConnection, route_handler: BaseRouteHandler
 ) -> None:
-    if zitadel_settings.use_introspection:
-        await introspect_guard(connection, route_handler)
-    else:
-        await jwt_guard(connection, route_handler)
+    with span("auth_guard"):
+        if zitadel_settings.use_introspection:
+            await introspect_guard(connection, route_handler)
+        else:
+            await jwt_guard(connection, route_handler)
+
+
+async def admin_guard(
+    connection: ASGIConnection, route_handler: BaseRouteHandler
+) -> None:
+    await auth_guard(connection, route_handler)
+    if zitadel_settings.admin_role not in connection.state.current_user.roles:
+        raise PermissionDeniedException("Admin role required")
@@ -0,0 +1,372 @@
+"""``Idempotency-Key`` support for mutating routes.
+
+A client that retries a ``POST`` or ``PATCH`` after a timeout cannot tell
+whether the first attempt went through. Sending the same
+``Idempotency-Key`` header with every attempt makes the retries safe: the
+first request runs and its status, headers and body are stored in the
+``idempotency_keys`` table, keyed by the caller's ``sub`` and the key.
+Later requests with that key get the stored response back, with an
+``Idempotent-Replayed: true`` header, without running the handler again.
+
+Duplicates that arrive while the first request is still running wait for
+it. Within a worker they share its result directly (see
+:class:`~src.singleflight.SingleFlight`). A worker that finds the key
+claimed by another worker polls the table for up to
+``idempotency_wait_s`` and then answers 409. A claim whose worker died is
+taken over once its ``idempotency_lease_s`` lease has run out.
+
+Reusing a key for a different request is a client error: requests are
+fingerprinted by method, path, query string and body, and a mismatch gets
+422. Bodies are hashed as they stream through and never buffered. Responses
+with a 5xx status are not stored, so a retry runs the request again.
+Stored responses are kept for ``idempotency_ttl_s`` and then purged by the
+``idempotency-purge`` job.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager
+from datetime import datetime, timedelta, timezone
+from typing import Literal
+
+import msgspec
+from litestar.connection import ASGIConnection
+from litestar.datastructures import Headers
+from litestar.exceptions import HTTPException
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.base import settings
+from config.db import alchemy_config
+from src.idempotency.models import IdempotencyRecord
+from src.singleflight import SingleFlight
+
+SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+HEADER = "idempotency-key"
+REPLAYED_HEADER = "idempotent-replayed"
+METHODS = frozenset({"POST", "PATCH"})
+MAX_KEY_LENGTH = 255
+# Headers that describe this particular response rather than its content.
+_UNSTORED_HEADERS = frozenset({b"date", b"set-cookie"})
+
+
+class StoredResponse(msgspec.Struct):
+    status_code: int
+    headers: list[tuple[str, str]]
+    body: bytes
+    fingerprint: str
+
+
+class Claim(msgspec.Struct):
+    """The state of a key when a request tried to claim it.
+
+    ``new`` means the caller now holds the key and must run the request;
+    ``done`` carries the stored response; ``running`` means another worker
+    holds it.
+    """
+
+    state: Literal["new", "done", "running"]
+    response: StoredResponse | None = None
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _stored(row) -> StoredResponse:
+    return StoredResponse(
+        status_code=row.status_code,
+        headers=[tuple(header) for header in row.headers],
+        body=row.body,
+        fingerprint=row.fingerprint,
+    )
+
+
+class IdempotencyStore:
+    """Claims, completes and purges rows of ``idempotency_keys``."""
+
+    def __init__(
+        self,
+        session_factory: SessionFactory,
+        ttl: float,
+        lease: float,
+    ) -> None:
+        self._session_factory = session_factory
+        self._ttl = timedelta(seconds=ttl)
+        self._lease = timedelta(seconds=lease)
+
+    async def claim(self, sub: str, key: str) -> Claim:
+        table = IdempotencyRecord.__table__
+        where = (table.c.sub == sub) & (table.c.key == key)
+        now = _now()
+        async with self._session_factory() as session, session.begin():
+            row = (
+                await session.execute(select(table).where(where).with_for_update())
+            ).one_or_none()
+            if row is None:
+                try:
+                    async with session.begin_nested():
+                        await session.execute(
+                            insert(table).values(
+                                sub=sub, key=key, created_at=now, expires_at=now + self._lease
+                            )
+                        )
+                except IntegrityError:
+                    # Another worker claimed it between our select and insert.
+                    return Claim("running")
+                return Claim("new")
+            if row.expires_at > now:
+                if row.status_code is None:
+                    return Claim("running")
+                return Claim("done", _stored(row))
+            # An abandoned claim or a stored response awaiting the purge.
+            await session.execute(
+                update(table)
+                .where(where)
+                .values(
+                    fingerprint=None,
+                    status_code=None,
+                    headers=None,
+                    body=None,
+                    created_at=now,
+                    expires_at=now + self._lease,
+                )
+            )
+            return Claim("new")
+
+    async def get(self, sub: str, key: str) -> Claim | None:
+        table = IdempotencyRecord.__table__
+        async with self._session_factory() as session:
+            row = (
+                await session.execute(
+                    select(table).where(table.c.sub == sub, table.c.key == key)
+                )
+            ).one_or_none()
+        if row is None or row.expires_at <= _now():
+            return None
+        if row.status_code is None:
+            return Claim("running")
+        return Claim("done", _stored(row))
+
+    async def complete(self, sub: str, key: str, response: StoredResponse) -> None:
+        table = IdempotencyRecord.__table__
+        async with self._session_factory() as session, session.begin():
+            await session.execute(
+                update(table)
+                .where(table.c.sub == sub, table.c.key == key)
+                .values(
+                    fingerprint=response.fingerprint,
+                    status_code=response.status_code,
+                    headers=[list(header) for header in response.headers],
+                    body=response.body,
+                    expires_at=_now() + self._ttl,
+                )
+            )
+
+    async def release(self, sub: str, key: str) -> None:
+        """Drop an unfinished claim so that the next attempt runs the request."""
+        table = IdempotencyRecord.__table__
+        async with self._session_factory() as session, session.begin():
+            await session.execute(
+                delete(table).where(
+                    table.c.sub == sub,
+                    table.c.key == key,
+                    table.c.status_code.is_(None),
+                )
+            )
+
+    async def purge(self) -> int:
+        """Delete expired rows and return how many there were."""
+        table = IdempotencyRecord.__table__
+        async with self._session_factory() as session, session.begin():
+            result = await session.execute(
+                delete(table).where(table.c.expires_at <= _now())
+            )
+        return result.rowcount
+
+
+# Shared by every route's middleware instance, since a key is per caller
+# rather than per route.
+_flights: SingleFlight[StoredResponse] = SingleFlight()
+
+
+class IdempotencyMiddleware:
+    """Runs each ``(sub, Idempotency-Key)`` once and replays its response.
+
+    Only applies to authenticated routes: the route's guards are run first
+    to learn the caller's ``sub``, and run again by Litestar afterwards.
+    Requests without the header, or to unguarded routes, pass straight
+    through.
+    """
+
+    def __init__(self, app: ASGIApp, store: IdempotencyStore | None = None) -> None:
+        self.app = app
+        self._store = store
+
+    @property
+    def store(self) -> IdempotencyStore:
+        return self._store or get_idempotency_store()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in METHODS:
+            await self.app(scope, receive, send)
+            return
+        key = Headers.from_scope(scope).get(HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters.",
+                status_code=400,
+            )
+        sub = await self._authenticate(scope)
+        if sub is None:
+            await self.app(scope, receive, send)
+            return
+
+        digest = _digest(scope)
+        sent = False
+
+        async def run() -> StoredResponse:
+            nonlocal sent
+            claim = await self.store.claim(sub, key)
+            if claim.state == "done":
+                return claim.response
+            if claim.state == "running":
+                return await self._wait(sub, key)
+            try:
+                response = await self._execute(scope, receive, send, digest)
+            except BaseException:
+                await self.store.release(sub, key)
+                raise
+            finally:
+                sent = True
+            if response.status_code >= 500:
+                await self.store.release(sub, key)
+            else:
+                await self.store.complete(sub, key, response)
+            return response
+
+        response = await _flights.do((sub, key), run)
+        if sent:
+            return
+        await _drain(receive, digest)
+        if response.fingerprint != digest.hexdigest():
+            raise HTTPException(
+                detail="Idempotency-Key was already used for a different request.",
+                status_code=422,
+            )
+        await _replay(response, send)
+
+    async def _authenticate(self, scope: Scope) -> str | None:
+        connection = ASGIConnection(scope)
+        route_handler = scope["route_handler"]
+        guards = route_handler.resolve_guards()
+        for guard in guards:
+            await guard(connection, route_handler)
+        user = getattr(connection.state, "current_user", None)
+        return user.sub if guards and user is not None else None
+
+    async def _execute(
+        self, scope: Scope, receive: Receive, send: Send, digest
+    ) -> StoredResponse:
+        status_code = 500
+        headers: list[tuple[str, str]] = []
+        chunks: list[bytes] = []
+        body_read = False
+
+        async def hashing_receive() -> Message:
+            nonlocal body_read
+            message = await receive()
+            if message["type"] == "http.request":
+                digest.update(message.get("body", b""))
+                body_read = not message.get("more_body", False)
+            return message
+
+        async def recording_send(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers.extend(
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in message.get("headers", ())
+                    if name.lower() not in _UNSTORED_HEADERS
+                )
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, hashing_receive, recording_send)
+        if not body_read:
+            # The handler did not read the whole body; the fingerprint needs it.
+            await _drain(receive, digest)
+        return StoredResponse(
+            status_code=status_code,
+            headers=headers,
+            body=b"".join(chunks),
+            fingerprint=digest.hexdigest(),
+        )
+
+    async def _wait(self, sub: str, key: str) -> StoredResponse:
+        deadline = time.monotonic() + settings.idempotency_wait_s
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.idempotency_poll_s)
+            claim = await self.store.get(sub, key)
+            if claim is None:
+                break
+            if claim.state == "done":
+                return claim.response
+        raise HTTPException(
+            detail="A request with this Idempotency-Key is in progress; retry later.",
+            status_code=409,
+        )
+
+
+def _digest(scope: Scope):
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope["query_string"]):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest
+
+
+async def _drain(receive: Receive, digest) -> None:
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return
+        digest.update(message.get("body", b""))
+        if not message.get("more_body", False):
+            return
+
+
+async def _replay(response: StoredResponse, send: Send) -> None:
+    headers = [
+        (name.encode("latin-1"), value.encode("latin-1"))
+        for name, value in response.headers
+    ]
+    headers.append((REPLAYED_HEADER.encode(), b"true"))
+    await send(
+        {"type": "http.response.start", "status": response.status_code, "headers": headers}
+    )
+    await send({"type": "http.response.body", "body": response.body})
+
+
+_store: IdempotencyStore | None = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _store
+    if _store is None:
+        _store = IdempotencyStore(
+            alchemy_config.get_session,
+            ttl=settings.idempotency_ttl_s,
+            lease=settings.idempotency_lease_s,
+        )
+    return _store
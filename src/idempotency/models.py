@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Any
+
+from advanced_alchemy.base import DefaultBase
+from advanced_alchemy.types import DateTimeUTC, JsonB
+from sqlalchemy import Index, LargeBinary, SmallInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class IdempotencyRecord(DefaultBase):
+    """The outcome of a request sent with an ``Idempotency-Key``.
+
+    A row is claimed, with a null ``status_code``, before the request runs
+    and completed with the response once it has finished. ``expires_at`` is
+    the end of the claim's lease while it runs and the end of the retention
+    period afterwards; expired rows are purged by a background job.
+    """
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (Index("ix_idempotency_keys_expires_at", "expires_at"),)
+
+    sub: Mapped[str] = mapped_column(String(255), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    fingerprint: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    status_code: Mapped[int | None] = mapped_column(SmallInteger, nullable=True)
+    headers: Mapped[list[Any] | None] = mapped_column(JsonB, nullable=True)
+    body: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTimeUTC(timezone=True), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTimeUTC(timezone=True), nullable=False)
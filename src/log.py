@@ -0,0 +1,311 @@
+"""Structured logging that keeps I/O off the event loop.
+
+:func:`configure_logging` gives the root logger a single
+:class:`~logging.handlers.QueueHandler`. The thread that logs only decides
+whether to keep the record, tags it with the request id and renders its
+message. A :class:`~logging.handlers.QueueListener` thread then redacts it,
+formats it and writes it to stdout, so a slow or blocked stdout never
+stalls a request. When the queue (``log_queue_size``) is full, records are
+dropped and counted instead of blocking.
+
+- Records are JSON lines by default (``log_format``), carrying the time,
+  level, logger, message, request id, traceback and any ``extra`` fields.
+- :class:`RequestIdMiddleware` takes the request id from the
+  ``request_id_header`` header, or makes one up, and echoes it in the
+  response. Everything logged while the request is handled carries it.
+- Records below WARNING are sampled at ``log_sample_rate``, or at the rate
+  in ``log_sample_rates`` for the logger or its closest configured
+  parent. Sampling is decided per request id, so a request's records are
+  kept or dropped together.
+- Values of ``log_redact_keys`` fields, ``key=value`` pairs with those keys,
+  bearer tokens and JWTs are replaced by ``[REDACTED]``.
+
+Each process needs its own listener thread, so the configuration is redone
+in a child after ``fork``. A process that forks workers, like the ``nyx
+serve`` supervisor, writes synchronously instead (``background=False``) so
+that it has no thread at fork time. A process that ends with ``os._exit``
+calls :func:`shutdown_logging` first, or its queued records are lost.
+"""
+
+import atexit
+import copy
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+import msgspec
+from litestar.datastructures import Headers
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.base import settings
+
+REDACTED = "[REDACTED]"
+
+_request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed as ``extra``.
+_RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "request_id"}
+_VALID_REQUEST_ID = re.compile(r"[\w.:-]{1,128}")
+_json_encoder = msgspec.json.Encoder(enc_hook=repr)
+
+
+def current_request_id() -> str | None:
+    return _request_id.get()
+
+
+class RequestIdMiddleware:
+    """Binds each request to a request id for logging and returns it."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._header = settings.request_id_header.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = Headers.from_scope(scope).get(settings.request_id_header)
+        if not request_id or not _VALID_REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (self._header, request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        token = _request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
+
+
+class Redactor:
+    """Masks secrets in messages and ``extra`` fields."""
+
+    def __init__(self, keys: list[str]) -> None:
+        self.keys = frozenset(key.lower() for key in keys)
+        names = "|".join(re.escape(key) for key in sorted(self.keys, key=len, reverse=True))
+        self._pattern = re.compile(
+            r"(?P<jwt>\beyJ[\w-]+\.[\w-]+\.[\w-]*)"
+            r"|(?P<bearer>\bBearer\s+)[\w.~+/=-]+"
+            + (rf"""|(?P<pair>\b(?:{names})["']?\s*[:=]\s*["']?)[^\s"',;&}}]+""" if names else ""),
+            re.IGNORECASE,
+        )
+
+    def text(self, value: str) -> str:
+        return self._pattern.sub(self._replace, value)
+
+    def value(self, key: str, value: Any) -> Any:
+        if key.lower() in self.keys:
+            return REDACTED
+        if isinstance(value, str):
+            return self.text(value)
+        if isinstance(value, dict):
+            return {k: self.value(str(k), v) for k, v in value.items()}
+        return value
+
+    @staticmethod
+    def _replace(match: re.Match) -> str:
+        # Keep "Bearer " or "key=" and mask what follows; mask JWTs whole.
+        return (match["bearer"] or match["pair"] or "") + REDACTED
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def __init__(self, redactor: Redactor) -> None:
+        super().__init__()
+        self.redactor = redactor
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": self.redactor.text(record.getMessage()),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = self.redactor.value(key, value)
+        if record.exc_text:
+            entry["exc"] = self.redactor.text(record.exc_text)
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return _json_encoder.encode(entry).decode()
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, redactor: Redactor) -> None:
+        super().__init__(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+        )
+        self.redactor = redactor
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not getattr(record, "request_id", None):
+            record.request_id = "-"
+        return self.redactor.text(super().format(record))
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records below WARNING."""
+
+    def __init__(self, rate: float, rates: dict[str, float] | None = None) -> None:
+        super().__init__()
+        self.rate = rate
+        self.rates = rates or {}
+        self._by_logger: dict[str, float] = {}
+
+    def rate_for(self, name: str) -> float:
+        rate = self._by_logger.get(name)
+        if rate is None:
+            rate = self.rate
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._by_logger[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1:
+            return True
+        request_id = _request_id.get()
+        if request_id is None:
+            return random.random() < rate
+        return zlib.crc32(request_id.encode()) < rate * 2**32
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Drops records when the queue is full rather than waiting."""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message while its arguments still hold the values they
+        # had when it was logged. Tracebacks become text here too, since
+        # exc_info keeps the frames of this thread alive.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: QueueListener | None = None
+_handler: NonBlockingQueueHandler | None = None
+_pid: int | None = None
+_hooks_installed = False
+
+
+def configure_logging(background: bool = True) -> None:
+    """Route all logging through the queue; a no-op if already done in this process.
+
+    :param background: Write records from a listener thread. ``False`` writes
+        them synchronously instead, for a process that will fork: a thread
+        must not exist at fork time, and each child sets up its own queue.
+    """
+    global _listener, _handler, _pid, _hooks_installed
+    if _pid == os.getpid():
+        return
+    redactor = Redactor(settings.log_redact_keys)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(
+        JsonFormatter(redactor) if settings.log_format == "json" else TextFormatter(redactor)
+    )
+    filters = [
+        SamplingFilter(settings.log_sample_rate, settings.log_sample_rates),
+        RequestIdFilter(),
+    ]
+    queue_handler = listener = None
+    if background:
+        log_queue: queue.Queue = queue.Queue(settings.log_queue_size)
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        listener = QueueListener(log_queue, output, respect_handler_level=True)
+    handler = queue_handler or output
+    for log_filter in filters:
+        handler.addFilter(log_filter)
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.log_level.upper())
+    # Servers' own loggers write through the same pipeline.
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "granian"):
+        logger = logging.getLogger(name)
+        for existing in logger.handlers[:]:
+            logger.removeHandler(existing)
+        logger.propagate = True
+
+    if listener is not None:
+        listener.start()
+    if not _hooks_installed:
+        atexit.register(shutdown_logging)
+        os.register_at_fork(after_in_child=_after_fork)
+        _hooks_installed = True
+    _listener, _handler, _pid = listener, queue_handler, os.getpid()
+
+
+def shutdown_logging() -> None:
+    """Write out queued records, stop the listener thread and detach the queue.
+
+    A later :func:`configure_logging` sets everything up again.
+    """
+    global _listener, _handler, _pid
+    if _pid != os.getpid():
+        return
+    if _listener is not None:
+        _listener.stop()
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+    _listener = _handler = _pid = None
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler is not None else 0
+
+
+def _after_fork() -> None:
+    # The listener thread did not survive the fork; start a fresh one.
+    global _listener
+    _listener = None
+    configure_logging()
@@ -1,19 +1,76 @@
-import asyncio
-
 from advanced_alchemy.extensions.litestar import (
     SQLAlchemyPlugin,
 )
 from litestar import Litestar
+from litestar.logging.config import LoggingConfig
 from litestar.openapi import OpenAPIConfig
 
+from config.base import settings
 from config.db import alchemy_config
+from config.zitadel import zitadel_settings
 from src.auth.controller import AuthController
+from src.compression import build_compression_middleware
+from src.deadlines import DeadlineMiddleware, install_statement_timeout
+from src.guards import JWKSCache
+from src.idempotency.middleware import get_idempotency_store
+from src.log import RequestIdMiddleware, configure_logging, shutdown_logging
+from src.outbox.dispatcher import build_outbox_dispatcher
+from src.profiles.batching import close_profile_write_coalescer
+from src.profiles.changes import (
+    close_profile_change_hub,
+    get_profile_change_hub,
+    profile_list_cache,
+)
 from src.profiles.controllers import ProfileController
-from src.utils import refresh_jwks_periodically
+from src.profiling import ProfilingMiddleware
+from src.scheduler import scheduler
+from src.system.controllers import HealthController, SystemController
+from src.tracing import configure_tracing, shutdown_tracing, tracing_middleware
+from src.utils import refresh_jwks
+from src.warmup import warmup
+
+install_statement_timeout()
+
+scheduler.add_job(
+    "jwks-refresh", refresh_jwks, interval=zitadel_settings.jwks_refresh_interval
+)
+if settings.outbox_dispatch_enabled:
+    scheduler.add_job(
+        "outbox-dispatch",
+        build_outbox_dispatcher().drain,
+        interval=settings.outbox_poll_interval_s,
+    )
+scheduler.add_job(
+    "idempotency-purge",
+    get_idempotency_store().purge,
+    interval=settings.idempotency_purge_interval_s,
+)
+if profile_list_cache is not None:
+    # The page cache is only trusted while changes from other workers arrive.
+    scheduler.add_job(
+        "profile-changes-listen", get_profile_change_hub().listen, interval=5
+    )
 
 
 async def on_startup():
-    asyncio.create_task(refresh_jwks_periodically())
+    configure_logging()
+    configure_tracing()
+    if not zitadel_settings.use_introspection:
+        # Serve authenticated requests from the persisted key set until the
+        # jwks-refresh job has fetched a fresh one.
+        JWKSCache.load_snapshot()
+    if settings.warmup_enabled:
+        warmup.start()
+    scheduler.start()
+
+
+async def on_shutdown():
+    await warmup.stop()
+    await scheduler.stop()
+    await close_profile_write_coalescer()
+    await close_profile_change_hub()
+    shutdown_tracing()
+    shutdown_logging()
 
 
 openapi_config = OpenAPIConfig(
@@ -23,9 +80,30 @@ openapi_config = OpenAPIConfig(
 
 
 app = Litestar(
-    route_handlers=[ProfileController, AuthController],
+    route_handlers=[
+        ProfileController,
+        AuthController,
+        SystemController,
+        HealthController,
+    ],
     plugins=[SQLAlchemyPlugin(config=alchemy_config)],
     openapi_config=openapi_config,
+    middleware=[
+        RequestIdMiddleware,
+        *tracing_middleware(),
+        # Outside compression, so profiles include it.
+        ProfilingMiddleware,
+        *([build_compression_middleware()] if settings.compression_enabled else []),
+        DeadlineMiddleware,
+    ],
+    # Handlers come from src.log; Litestar's own logger just propagates to
+    # them, and uncaught exceptions are logged outside debug mode too.
+    logging_config=LoggingConfig(
+        configure_root_logger=False,
+        log_exceptions="always",
+        loggers={"litestar": {"level": "INFO", "propagate": True}},
+    ),
     on_startup=[on_startup],
+    on_shutdown=[on_shutdown],
     # security=[oauth2_auth],
 )
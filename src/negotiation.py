@@ -0,0 +1,91 @@
+"""MessagePack content negotiation alongside JSON.
+
+Controllers opt in by using :class:`NegotiatedResponse` as their
+``response_class`` and a :class:`NegotiatedMsgspecDTO` for request bodies.
+Clients that send ``Accept: application/msgpack`` get MessagePack
+responses, and bodies sent with ``Content-Type: application/msgpack`` are
+decoded as MessagePack; everything else stays JSON. ``application/x-msgpack``
+and ``application/vnd.msgpack`` are accepted as aliases. Encoders and
+per-type decoders are created once and reused.
+"""
+
+import functools
+from typing import Any, Generic, TypeVar
+
+import msgspec
+from litestar import MediaType, Request, Response
+from litestar.connection import ASGIConnection
+from litestar.dto.msgspec_dto import MsgspecDTO
+from litestar.exceptions import ValidationException
+from litestar.serialization import default_serializer
+from litestar.types import Serializer
+
+T = TypeVar("T")
+
+MSGPACK = "application/msgpack"
+MSGPACK_MEDIA_TYPES = frozenset(
+    {MSGPACK, MediaType.MESSAGEPACK.value, "application/vnd.msgpack"}
+)
+_OFFERED = [MediaType.JSON.value, *sorted(MSGPACK_MEDIA_TYPES)]
+
+json_encoder = msgspec.json.Encoder()
+msgpack_encoder = msgspec.msgpack.Encoder()
+
+
+@functools.cache
+def msgpack_decoder(type_: Any) -> msgspec.msgpack.Decoder:
+    return msgspec.msgpack.Decoder(type_)
+
+
+def preferred_media_type(request: Request) -> str:
+    """Return the response media type the client prefers: JSON or a MessagePack type."""
+    if "accept" not in request.headers:
+        return MediaType.JSON.value
+    return request.accept.best_match(_OFFERED, default=MediaType.JSON.value)
+
+
+def is_msgpack_request(connection: ASGIConnection) -> bool:
+    return connection.content_type[0] in MSGPACK_MEDIA_TYPES
+
+
+def encode(content: Any, media_type: str) -> bytes:
+    """Encode ``content`` as MessagePack or JSON, matching ``media_type``."""
+    if media_type in MSGPACK_MEDIA_TYPES:
+        return msgpack_encoder.encode(content)
+    return json_encoder.encode(content)
+
+
+class NegotiatedResponse(Response[T]):
+    """Encodes JSON handler results as MessagePack when the client asks for it."""
+
+    def to_asgi_response(self, app, request: Request, **kwargs: Any):
+        media_type = self.media_type or kwargs.get("media_type") or MediaType.JSON
+        if media_type == MediaType.JSON and not isinstance(self.content, bytes):
+            self.media_type = preferred_media_type(request)
+        self.headers.setdefault("vary", "Accept")
+        return super().to_asgi_response(app, request, **kwargs)
+
+    def render(
+        self, content: Any, media_type: str, enc_hook: Serializer = default_serializer
+    ) -> bytes:
+        if media_type in MSGPACK_MEDIA_TYPES and not isinstance(content, bytes):
+            if enc_hook is default_serializer:
+                return msgpack_encoder.encode(content)
+            return msgspec.msgpack.encode(content, enc_hook=enc_hook)
+        return super().render(content, media_type, enc_hook)
+
+
+class NegotiatedMsgspecDTO(MsgspecDTO[T], Generic[T]):
+    """A msgspec DTO that also reads MessagePack request bodies.
+
+    MessagePack bodies are decoded straight into the model type, so the
+    DTO must not rename or exclude fields.
+    """
+
+    def decode_bytes(self, value: bytes) -> Any:
+        if not is_msgpack_request(self.asgi_connection):
+            return super().decode_bytes(value)
+        try:
+            return msgpack_decoder(self.model_type).decode(value)
+        except (msgspec.ValidationError, msgspec.DecodeError) as e:
+            raise ValidationException(str(e)) from e
@@ -0,0 +1,82 @@
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.base import settings
+from config.db import alchemy_config
+from src.outbox.models import OutboxEvent
+from src.outbox.sinks import FileSink, InMemorySink, OutboxMessage, OutboxSink
+
+SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+
+class OutboxDispatcher:
+    """Move events from the ``outbox`` table to a sink in batches.
+
+    Each batch is claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``, handed to
+    the sink and deleted in the same transaction, so any number of workers can
+    dispatch concurrently without claiming the same row twice. If the sink or
+    the commit fails the rows are released and retried, which makes delivery
+    at-least-once; ordering is only guaranteed within a single batch.
+    """
+
+    def __init__(
+        self,
+        session_factory: SessionFactory,
+        sink: OutboxSink,
+        batch_size: int = 100,
+    ) -> None:
+        self._session_factory = session_factory
+        self._sink = sink
+        self._batch_size = batch_size
+
+    async def dispatch_once(self) -> int:
+        """Deliver one batch and return how many events it contained."""
+        table = OutboxEvent.__table__
+        claim = (
+            select(
+                table.c.id,
+                table.c.aggregate_type,
+                table.c.aggregate_id,
+                table.c.event_type,
+                table.c.payload,
+                table.c.created_at,
+            )
+            .order_by(table.c.id)
+            .limit(self._batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with self._session_factory() as session, session.begin():
+            rows = (await session.execute(claim)).mappings().all()
+            if not rows:
+                return 0
+            await self._sink.send([OutboxMessage(**row) for row in rows])
+            await session.execute(
+                delete(table).where(table.c.id.in_([row["id"] for row in rows]))
+            )
+        return len(rows)
+
+    async def drain(self) -> int:
+        """Dispatch full batches until the outbox is (momentarily) empty."""
+        total = 0
+        while True:
+            sent = await self.dispatch_once()
+            total += sent
+            if sent < self._batch_size:
+                return total
+
+
+def build_outbox_sink() -> OutboxSink:
+    if settings.outbox_sink == "memory":
+        return InMemorySink()
+    return FileSink(settings.outbox_file_path)
+
+
+def build_outbox_dispatcher() -> OutboxDispatcher:
+    return OutboxDispatcher(
+        alchemy_config.get_session,
+        build_outbox_sink(),
+        batch_size=settings.outbox_batch_size,
+    )
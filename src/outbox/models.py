@@ -0,0 +1,21 @@
+from typing import Any
+
+from advanced_alchemy.base import IdentityAuditBase
+from advanced_alchemy.types import JsonB
+from sqlalchemy import BigInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class OutboxEvent(IdentityAuditBase):
+    """A domain event waiting to be delivered downstream.
+
+    Rows are written in the same transaction as the change they describe and
+    deleted by the dispatcher once the sink has accepted them.
+    """
+
+    __tablename__ = "outbox"
+
+    aggregate_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    aggregate_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    event_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JsonB, nullable=False)
@@ -0,0 +1,54 @@
+import asyncio
+from collections.abc import Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Protocol
+
+import msgspec
+
+
+class OutboxMessage(msgspec.Struct):
+    id: int
+    aggregate_type: str
+    aggregate_id: int
+    event_type: str
+    payload: dict[str, Any]
+    created_at: datetime
+
+
+class OutboxSink(Protocol):
+    """Destination for dispatched outbox messages.
+
+    ``send`` must only return once the whole batch has been accepted; raising
+    leaves the batch in the outbox to be retried.
+    """
+
+    async def send(self, messages: Sequence[OutboxMessage]) -> None: ...
+
+
+class InMemorySink:
+    """Collects messages in a list; intended for tests."""
+
+    def __init__(self) -> None:
+        self.messages: list[OutboxMessage] = []
+
+    async def send(self, messages: Sequence[OutboxMessage]) -> None:
+        self.messages.extend(messages)
+
+
+class FileSink:
+    """Appends messages to a local file as newline-delimited JSON."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._encoder = msgspec.json.Encoder()
+
+    async def send(self, messages: Sequence[OutboxMessage]) -> None:
+        lines = b"".join(self._encoder.encode(m) + b"\n" for m in messages)
+        await asyncio.to_thread(self._append, lines)
+
+    def _append(self, data: bytes) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("ab") as fh:
+            fh.write(data)
+            fh.flush()
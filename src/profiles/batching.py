@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+from collections.abc import Awaitable, Callable, Mapping
+from typing import Any
+
+import msgspec
+from advanced_alchemy.exceptions import NotFoundError
+
+from config.base import settings
+from config.db import alchemy_config
+from src.profiles.repositories import ProfileRepository
+from src.profiles.schemas import ProfileStruct
+from src.profiles.services import profile_event
+
+FlushFn = Callable[[Mapping[int, Mapping[str, Any]]], Awaitable[list[dict[str, Any]]]]
+
+
+class ProfileWriteCoalescer:
+    """Write-behind buffer that merges profile updates and flushes them in batches.
+
+    Updates submitted within ``window`` seconds of the first pending update are
+    merged per profile id (last write wins, field by field) and written by a
+    single ``flush`` call. ``submit`` only returns once the batch containing
+    the update has been committed, so a successful response is as durable as
+    an unbatched one; a failed flush fails every request in that batch.
+    """
+
+    def __init__(self, flush: FlushFn, window: float, max_batch: int = 500) -> None:
+        self._flush = flush
+        self._window = window
+        self._max_batch = max_batch
+        self._pending: dict[int, dict[str, Any]] = {}
+        self._waiters: dict[int, list[asyncio.Future[ProfileStruct]]] = {}
+        self._timer: asyncio.Task[None] | None = None
+        self._flushes: set[asyncio.Task[None]] = set()
+        # Batches are written one at a time so an older batch can never land
+        # after a newer one for the same id.
+        self._flush_lock = asyncio.Lock()
+
+    async def submit(self, item_id: int, changes: Mapping[str, Any]) -> ProfileStruct:
+        """Queue ``changes`` for ``item_id`` and wait for the batch to commit."""
+        future: asyncio.Future[ProfileStruct] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._pending.setdefault(item_id, {}).update(changes)
+        self._waiters.setdefault(item_id, []).append(future)
+
+        if len(self._pending) >= self._max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_window())
+        # The write goes ahead even if this request is cancelled.
+        return await asyncio.shield(future)
+
+    async def close(self) -> None:
+        """Flush anything still pending and wait for in-flight batches."""
+        if self._pending:
+            self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self._window)
+        self._timer = None
+        self._start_flush()
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, waiters = self._pending, self._waiters
+        self._pending, self._waiters = {}, {}
+        # Run in a fresh context: the batch serves many requests and must not
+        # inherit the deadline of whichever one happened to trigger it.
+        task = asyncio.create_task(
+            self._write(batch, waiters), context=contextvars.Context()
+        )
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(
+        self,
+        batch: dict[int, dict[str, Any]],
+        waiters: dict[int, list[asyncio.Future[ProfileStruct]]],
+    ) -> None:
+        try:
+            async with self._flush_lock:
+                rows = await self._flush(batch)
+            updated = {row["id"]: msgspec.convert(row, ProfileStruct) for row in rows}
+        except Exception as exc:
+            for futures in waiters.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            return
+
+        for item_id, futures in waiters.items():
+            profile = updated.get(item_id)
+            for future in futures:
+                if future.done():
+                    continue
+                if profile is None:
+                    future.set_exception(NotFoundError("No item found when one was expected"))
+                else:
+                    future.set_result(profile)
+
+
+async def flush_profile_updates(
+    changes: Mapping[int, Mapping[str, Any]],
+) -> list[dict[str, Any]]:
+    """Write a merged batch of profile updates and their outbox events."""
+    async with alchemy_config.get_session() as session:
+        rows = await ProfileRepository(session=session).update_many_by_id(changes)
+        session.add_all([profile_event("updated", dict(row)) for row in rows])
+        await session.commit()
+    return rows
+
+
+_coalescer: ProfileWriteCoalescer | None = None
+
+
+def get_profile_write_coalescer() -> ProfileWriteCoalescer | None:
+    """Return the per-worker coalescer, or ``None`` when write coalescing is off."""
+    global _coalescer
+    if settings.profile_write_coalesce_ms <= 0:
+        return None
+    if _coalescer is None:
+        _coalescer = ProfileWriteCoalescer(
+            flush_profile_updates,
+            window=settings.profile_write_coalesce_ms / 1000,
+            max_batch=settings.profile_write_coalesce_max_batch,
+        )
+    return _coalescer
+
+
+async def close_profile_write_coalescer() -> None:
+    if _coalescer is not None:
+        await _coalescer.close()
@@ -0,0 +1,310 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+import msgspec
+from litestar.response import ServerSentEventMessage
+from sqlalchemy import select, tuple_
+
+from config.base import settings
+from config.db import alchemy_config
+from src.profiles.models import Profile
+from src.result_cache import ResultCache, register_result_cache
+
+if TYPE_CHECKING:
+    import asyncpg
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "profile_changes"
+
+
+class ProfileChange(msgspec.Struct):
+    """A change to a profile row, as published by the ``profiles`` NOTIFY trigger.
+
+    ``op`` is ``insert``, ``update`` or ``delete`` for live events and
+    ``upsert`` for rows replayed from the table while catching up, where the
+    original operation is no longer known.
+    """
+
+    op: str
+    id: int
+    updated_at: datetime
+    full_name: str | None = None
+    email: str | None = None
+
+    @property
+    def token(self) -> str:
+        return encode_resume_token(self.updated_at, self.id)
+
+
+_MAX_BIGINT = 2**63 - 1
+
+
+def encode_resume_token(updated_at: datetime, item_id: int) -> str:
+    """Encode an opaque resume token: microseconds since epoch and row id."""
+    micros = int(updated_at.timestamp() * 1_000_000)
+    return f"{micros}-{item_id}"
+
+
+def decode_resume_token(token: str) -> tuple[datetime, int]:
+    """Decode a token produced by :func:`encode_resume_token`.
+
+    Raises:
+        ValueError: if the token is malformed or out of range.
+    """
+    micros, _, item_id = token.partition("-")
+    position = int(item_id)
+    if not 0 <= position <= _MAX_BIGINT:
+        raise ValueError(f"Row id out of range: {item_id}")
+    try:
+        updated_at = datetime.fromtimestamp(int(micros) / 1_000_000, tz=timezone.utc)
+    except (OverflowError, OSError) as e:
+        raise ValueError(f"Timestamp out of range: {micros}") from e
+    return updated_at, position
+
+
+class ChangeSubscription:
+    """A subscriber's bounded queue; ``None`` marks the end of the stream."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue: asyncio.Queue[ProfileChange | None] = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    def close(self) -> None:
+        # Make room for the sentinel so a blocked ``get`` wakes up right away.
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ProfileChangeHub:
+    """Fan out ``profile_changes`` notifications to in-process subscribers.
+
+    A single LISTEN connection is opened per worker on the first subscription
+    and shared by every subscriber. Each subscriber has a bounded queue; one
+    that falls behind far enough to fill it is dropped rather than allowed to
+    slow down the others, and is expected to reconnect with its resume token.
+    If the LISTEN connection is lost every subscriber is dropped the same way
+    and the next subscription reconnects.
+
+    Change callbacks are called on every notification and whenever the
+    connection is (re)established, since changes may have been missed while
+    it was down.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable["asyncpg.Connection"]],
+        queue_size: int = 256,
+    ) -> None:
+        self._connect = connect
+        self._queue_size = queue_size
+        self._subscribers: set[ChangeSubscription] = set()
+        self._connection: "asyncpg.Connection | None" = None
+        self._lock = asyncio.Lock()
+        self._decoder = msgspec.json.Decoder(ProfileChange)
+        self._callbacks: list[Callable[[], None]] = []
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def listening(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    def add_change_callback(self, callback: Callable[[], None]) -> None:
+        self._callbacks.append(callback)
+
+    async def listen(self) -> None:
+        """Open the LISTEN connection if it is not open yet."""
+        await self._ensure_listening()
+
+    async def subscribe(self) -> ChangeSubscription:
+        await self._ensure_listening()
+        subscription = ChangeSubscription(self._queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ChangeSubscription) -> None:
+        self._subscribers.discard(subscription)
+
+    async def close(self) -> None:
+        self._drop_all()
+        async with self._lock:
+            connection, self._connection = self._connection, None
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+
+    def publish(self, change: ProfileChange) -> None:
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                logger.info("Dropping slow profile change subscriber")
+                self._drop(subscription)
+
+    async def _ensure_listening(self) -> None:
+        async with self._lock:
+            if self.listening:
+                return
+            connection = await self._connect()
+            connection.add_termination_listener(self._on_terminated)
+            await connection.add_listener(CHANNEL, self._on_notification)
+            self._connection = connection
+        self._changed()
+
+    def _on_notification(self, _connection, _pid, _channel, payload: str) -> None:
+        try:
+            change = self._decoder.decode(payload)
+        except msgspec.DecodeError:
+            logger.warning("Ignoring malformed profile change payload")
+            return
+        self._changed()
+        self.publish(change)
+
+    def _changed(self) -> None:
+        for callback in self._callbacks:
+            callback()
+
+    def _on_terminated(self, connection: "asyncpg.Connection") -> None:
+        if connection is self._connection:
+            logger.warning("Profile change LISTEN connection lost")
+            self._connection = None
+            self._drop_all()
+
+    def _drop(self, subscription: ChangeSubscription) -> None:
+        self._subscribers.discard(subscription)
+        subscription.dropped = True
+        subscription.close()
+
+    def _drop_all(self) -> None:
+        for subscription in list(self._subscribers):
+            self._drop(subscription)
+
+
+async def fetch_changes_since(
+    updated_at: datetime, item_id: int, limit: int
+) -> list[ProfileChange]:
+    """Return up to ``limit`` rows changed after the ``(updated_at, id)`` position."""
+    statement = (
+        select(Profile.id, Profile.updated_at, Profile.full_name, Profile.email)
+        .where(tuple_(Profile.updated_at, Profile.id) > tuple_(updated_at, item_id))
+        .order_by(Profile.updated_at, Profile.id)
+        .limit(limit)
+    )
+    async with alchemy_config.get_session() as session:
+        rows = (await session.execute(statement)).all()
+    return [
+        ProfileChange(
+            op="upsert",
+            id=row.id,
+            updated_at=row.updated_at,
+            full_name=row.full_name,
+            email=row.email,
+        )
+        for row in rows
+    ]
+
+
+_encoder = msgspec.json.Encoder()
+
+
+async def stream_profile_changes(
+    hub: ProfileChangeHub,
+    subscription: ChangeSubscription,
+    position: tuple[datetime, int] | None,
+    keepalive: float,
+    catchup_batch: int = 500,
+) -> AsyncIterator[ServerSentEventMessage]:
+    """Yield SSE messages: rows changed after ``position``, then live changes.
+
+    ``subscription`` must be opened before the stream starts so nothing
+    committed during the catch-up is missed; live events already covered by
+    the catch-up are skipped. Deletes that happened while the client was away cannot be
+    replayed from the table and are not part of the catch-up.
+    """
+    try:
+        if position is not None:
+            while not subscription.dropped:
+                rows = await fetch_changes_since(*position, limit=catchup_batch)
+                for change in rows:
+                    yield _message(change)
+                if rows:
+                    position = (rows[-1].updated_at, rows[-1].id)
+                if len(rows) < catchup_batch:
+                    break
+
+        while True:
+            try:
+                change = await asyncio.wait_for(subscription.queue.get(), keepalive)
+            except TimeoutError:
+                yield ServerSentEventMessage(data=None, comment="keepalive")
+                continue
+            if change is None:
+                return
+            if (
+                position is not None
+                and change.op != "delete"
+                and (change.updated_at, change.id) <= position
+            ):
+                continue
+            yield _message(change)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def _message(change: ProfileChange) -> ServerSentEventMessage:
+    return ServerSentEventMessage(
+        data=_encoder.encode(change).decode(), event=change.op, id=change.token
+    )
+
+
+async def _connect_listener() -> "asyncpg.Connection":
+    import asyncpg
+
+    # asyncpg expects a plain libpq URL, without SQLAlchemy's driver suffix.
+    return await asyncpg.connect(
+        settings.sqlalchemy_database_uri.replace("+asyncpg", "", 1)
+    )
+
+
+_hub: ProfileChangeHub | None = None
+
+
+def get_profile_change_hub() -> ProfileChangeHub:
+    """Return this worker's shared change hub, creating it on first use."""
+    global _hub
+    if _hub is None:
+        _hub = ProfileChangeHub(
+            _connect_listener,
+            queue_size=settings.profile_changes_queue_size,
+        )
+    return _hub
+
+
+async def close_profile_change_hub() -> None:
+    if _hub is not None:
+        await _hub.close()
+
+
+def build_profile_list_cache() -> ResultCache | None:
+    """Create the ``GET /profiles`` page cache, or ``None`` when disabled.
+
+    Local commits invalidate it through the session listeners, and commits
+    made anywhere else arrive as ``profile_changes`` notifications. Without
+    a LISTEN connection those would go unnoticed, so the cache is bypassed
+    until the hub is listening (see the ``profile-changes-listen`` job).
+    """
+    if not settings.list_cache_max_bytes:
+        return None
+    hub = get_profile_change_hub()
+    cache = ResultCache(settings.list_cache_max_bytes, is_coherent=lambda: hub.listening)
+    hub.add_change_callback(cache.invalidate)
+    return register_result_cache(Profile.__tablename__, cache)
+
+
+profile_list_cache = build_profile_list_cache()
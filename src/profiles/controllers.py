@@ -1,154 +1,250 @@
-from advanced_alchemy import filters
+import msgspec
 from advanced_alchemy.exceptions import NotFoundError
-from litestar import Controller, get, post, patch, delete
+from litestar import Request, Response, get, patch, post, put
 from litestar.di import Provide
 from litestar.exceptions import HTTPException
 from litestar.params import Parameter
+from litestar.response import ServerSentEvent
 
+from config.base import settings
+from src.crud import crud_controller
 from src.guards import auth_guard
-from src.profiles.dependencies import provide_profiles_service
+from src.idempotency.middleware import IdempotencyMiddleware
+from src.negotiation import NegotiatedResponse, encode, preferred_media_type
+from src.profiles.batching import ProfileWriteCoalescer
+from src.profiles.changes import (
+    ProfileChangeHub,
+    decode_resume_token,
+    profile_list_cache,
+    stream_profile_changes,
+)
+from src.profiles.dependencies import (
+    provide_profile_change_hub,
+    provide_profile_write_coalescer,
+    provide_profiles_service,
+)
+from src.profiles.models import Profile
 from src.profiles.schemas import (
+    ProfileImportResult,
     ProfileStruct,
     ProfileWriteStruct,
     ProfileWriteDTO,
     ProfileDTO,
 )
 from src.profiles.services import ProfileService
-from src.schemas import OffsetPagination
+from src.streaming import decode_batches, is_ndjson_request
+
+
+ProfileCrudController = crud_controller(
+    Profile,
+    ProfileStruct,
+    ProfileWriteStruct,
+    path="/profiles",
+    name="profile",
+    service_type=ProfileService,
+    provide_service=provide_profiles_service,
+    dto=ProfileWriteDTO,
+    return_dto=ProfileDTO,
+    guards=[auth_guard],
+    tags=["profiles"],
+    max_batch=settings.profile_bulk_max_items,
+    list_cache=profile_list_cache,
+)
+
+
+class ProfileController(ProfileCrudController):
+    """Profile CRUD
 
+    The generated routes (see :func:`src.crud.crud_controller`) plus the
+    change stream, upserts by email and write-behind batching of updates.
+    POST and PATCH routes honour ``Idempotency-Key`` (see
+    :mod:`src.idempotency.middleware`).
+    """
 
-class ProfileController(Controller):
-    """Profile CRUD"""
+    middleware = [IdempotencyMiddleware]
 
-    dependencies = {"service": Provide(provide_profiles_service)}
-    dto = ProfileWriteDTO
-    return_dto = ProfileDTO
-    tags = ["profiles"]
-    path = "/profiles"
-    guards = [auth_guard]
+    dependencies = {
+        **ProfileCrudController.dependencies,
+        "coalescer": Provide(provide_profile_write_coalescer, sync_to_thread=False),
+        "hub": Provide(provide_profile_change_hub, sync_to_thread=False),
+    }
 
-    @get(path="")
-    async def list_profiles(
+    @get(path="/changes", return_dto=None)
+    async def profile_changes(
         self,
-        service: ProfileService,
-        limit: int = 10,
-        offset: int = 0,
-    ) -> OffsetPagination[ProfileStruct]:
+        hub: ProfileChangeHub,
+        last_event_id: str | None = Parameter(
+            header="Last-Event-ID",
+            required=False,
+            description="Resume token of the last event received.",
+        ),
+        since: str | None = Parameter(
+            query="since",
+            required=False,
+            description="Resume token to catch up from, for clients that cannot set Last-Event-ID.",
+        ),
+    ) -> ServerSentEvent:
         """
-        Handles retrieving a paginated list of profiles using the provided filtering and
-        pagination parameters.
-
-        :param service: The service responsible for fetching and managing profile data.
-                        Must implement methods to list and count profiles.
-        :type service: ProfileService
-        :param limit_offset: Object containing pagination parameters, including `limit` and
-                             `offset`.
-        :type limit_offset: filters.LimitOffset
-        :return: An OffsetPagination object containing the list of profiles, the total
-                 count, and pagination metadata (limit and offset).
-        :rtype: OffsetPagination[ProfileStruct]
+        Streams profile changes as Server-Sent Events.
+
+        Each event carries the changed profile and an ``id`` that doubles as a
+        resume token. When a token is supplied, profiles changed after it are
+        replayed first (deletes are not replayed), then live changes follow.
+        Clients that fall too far behind are disconnected and should reconnect
+        with the last token they received.
+
+        :param hub: The shared LISTEN/NOTIFY fan-out for this worker.
+        :param last_event_id: Resume token sent by EventSource on reconnect.
+        :param since: Resume token supplied as a query parameter.
+        :return: A ServerSentEvent stream of profile changes.
         """
-        limit_offset = filters.LimitOffset(limit=limit, offset=offset)
-
-        results, total = await service.list_and_count(limit_offset)
-        return OffsetPagination[ProfileStruct](
-            items=results,
-            total=total,
-            limit=limit_offset.limit,
-            offset=limit_offset.offset,
+        token = last_event_id or since
+        try:
+            position = decode_resume_token(token) if token else None
+        except ValueError:
+            raise HTTPException(detail="Invalid resume token.", status_code=400)
+
+        subscription = await hub.subscribe()
+        return ServerSentEvent(
+            stream_profile_changes(
+                hub, subscription, position, settings.profile_changes_keepalive_s
+            )
         )
 
-    @post(path="")
-    async def create_profile(
+    @put(path="/by-email/{email:str}", return_dto=None)
+    async def upsert_profile_by_email(
         self,
+        request: Request,
         service: ProfileService,
         data: ProfileWriteStruct,
-    ) -> ProfileStruct:
+        email: str = Parameter(
+            title="Email",
+            description="Email of the profile to create or replace, ignoring case.",
+        ),
+    ) -> Response[ProfileStruct]:
         """
-        Creates a user profile using the provided service and data.
-
-        :param service: An instance of ProfileService used to handle profile creation.
-        :type service: ProfileService
-        :param data: The input data required to create the profile.
-        :type data: ProfileWriteStruct
-        :return: The created profile object.
-        :rtype: ProfileStruct
+        Creates or updates the profile with the given email in one statement.
+
+        The email is matched case-insensitively and must match the one in the
+        body, which may change its case. Responds with 201 when a profile was
+        created and 200 when an existing one was updated.
+
+        :param request: The current request, used to negotiate JSON or MessagePack.
+        :param service: Instance of ProfileService used to write the profile.
+        :param data: The full profile to store.
+        :param email: The email identifying the profile.
+        :return: The stored profile.
         """
-        return await service.create(data, auto_commit=True)
+        if data.email.lower() != email.lower():
+            raise HTTPException(
+                detail="The email in the body must match the path.",
+                status_code=400,
+            )
+        [(profile, created)] = await service.upsert_by_email([data], auto_commit=True)
+        media_type = preferred_media_type(request)
+        return NegotiatedResponse(
+            content=encode(profile, media_type),
+            media_type=media_type,
+            status_code=201 if created else 200,
+        )
 
-    @get(path="/{profile_id:int}")
-    async def get_profile(
+    @put(path="/by-email")
+    async def upsert_profiles_by_email(
         self,
         service: ProfileService,
-        profile_id: int = Parameter(
-            title="ProfileSchema ID",
-            description="The ProfileSchema to retrieve.",
-        ),
-    ) -> ProfileStruct:
+        data: list[ProfileWriteStruct],
+    ) -> list[ProfileStruct]:
         """
-        Retrieves a profile by the given profile ID.
+        Creates or updates many profiles by email with a single statement.
 
-        This endpoint fetches a profile associated with the provided profile ID
-        using the service instance. If no profile is found for the given ID,
-        a 404 HTTP exception is raised.
+        Records are matched case-insensitively on their email; when several
+        records share an email only the last one is written.
 
-        :param service: Instance of ProfileService used to process the request.
-        :param profile_id: An integer identifier representing the profile to retrieve.
-        :return: A ProfileStruct instance reflecting the requested profile data.
+        :param service: Instance of ProfileService used to write the profiles.
+        :param data: The profiles to store, at most ``profile_bulk_max_items``.
+        :return: The stored profiles.
         """
-        try:
-            return await service.get(profile_id)
-        except NotFoundError:
+        if len(data) > settings.profile_bulk_max_items:
             raise HTTPException(
-                detail="No profile found.",
-                status_code=404,
+                detail=f"At most {settings.profile_bulk_max_items} profiles per request.",
+                status_code=413,
             )
-
-    @patch(
-        path="/{profile_id:int}",
+        if not data:
+            return []
+        results = await service.upsert_by_email(data, auto_commit=True)
+        return [profile for profile, _ in results]
+
+    @post(
+        path="/import",
+        return_dto=None,
+        status_code=200,
+        request_max_body_size=settings.profile_import_max_bytes,
     )
+    async def import_profiles(
+        self, request: Request, service: ProfileService
+    ) -> ProfileImportResult:
+        """
+        Creates or updates profiles by email from a streamed JSON array or NDJSON body.
+
+        The body is decoded while it is received and written in batches of
+        ``profile_import_batch_size`` records, so it is never held in memory
+        as a whole. All batches share one transaction: a malformed record or
+        a body over ``profile_import_max_bytes`` or ``profile_import_max_items``
+        (413) rolls back the whole import.
+
+        :param request: The current request, streamed as ``application/json``
+                        or ``application/x-ndjson``.
+        :param service: Instance of ProfileService used to write the profiles.
+        :return: How many profiles were created and how many updated.
+        """
+        result = ProfileImportResult()
+        batches = decode_batches(
+            request.stream(),
+            ProfileWriteStruct,
+            ndjson=is_ndjson_request(request),
+            batch_size=settings.profile_import_batch_size,
+            max_items=settings.profile_import_max_items,
+        )
+        async for batch in batches:
+            for _, created in await service.upsert_by_email(batch, auto_commit=False):
+                if created:
+                    result.created += 1
+                else:
+                    result.updated += 1
+        return result
+
+    @patch(path="/{item_id:int}")
     async def update_profile(
         self,
         service: ProfileService,
+        coalescer: ProfileWriteCoalescer | None,
         data: ProfileWriteStruct,
-        profile_id: int = Parameter(
-            title="ProfileSchema ID",
-            description="The ProfileSchema to update.",
+        item_id: int = Parameter(
+            title="Profile ID",
+            description="The profile ID.",
         ),
     ) -> ProfileStruct:
         """
         Updates a profile with the given data.
 
-        This function updates an existing profile identified by the given `profile_id`
+        This function updates an existing profile identified by the given `item_id`
         using the provided `data`. The `service` parameter is used to handle the
-        updating operation asynchronously.
+        updating operation asynchronously. When write coalescing is enabled the
+        update is merged with other updates received within the batching window
+        and the response is sent once that batch has been committed.
 
         :param service: The ProfileService instance responsible for managing profiles.
+        :param coalescer: The write-behind coalescer, or None when disabled.
         :param data: An instance of ProfileWriteStruct containing the update data.
-        :param profile_id: The ID of the profile to be updated.
+        :param item_id: The ID of the profile to be updated.
         :return: An updated ProfileStruct object.
         """
-        return await service.update(data=data, item_id=profile_id, auto_commit=True)
-
-    @delete(path="/{profile_id:int}")
-    async def delete_profile(
-        self,
-        service: ProfileService,
-        profile_id: int = Parameter(
-            title="ProfileSchema ID",
-            description="The ProfileSchema to delete.",
-        ),
-    ) -> None:
-        """
-        Deletes a profile associated with the given profile ID.
-
-        This functionality allows the deletion of a specific profile through the
-        provided service using the profile ID.
-
-        :param service: The service instance that performs profile deletion.
-        :type service: ProfileService
-        :param profile_id: The unique identifier of the profile to delete.
-        :type profile_id: int
-        :return: None
-        """
-        await service.delete(profile_id)
+        if coalescer is None:
+            return await service.update(data=data, item_id=item_id, auto_commit=True)
+        try:
+            return await coalescer.submit(item_id, msgspec.structs.asdict(data))
+        except NotFoundError:
+            raise HTTPException(
+                detail="No profile found.",
+                status_code=404,
+            )
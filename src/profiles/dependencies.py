@@ -1,8 +1,23 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.profiles.batching import (
+    ProfileWriteCoalescer,
+    get_profile_write_coalescer,
+)
+from src.profiles.changes import ProfileChangeHub, get_profile_change_hub
 from src.profiles.services import ProfileService
 
 
 async def provide_profiles_service(db_session: AsyncSession) -> ProfileService:
     """This provides the default Authors repository."""
     return ProfileService(session=db_session)
+
+
+def provide_profile_write_coalescer() -> ProfileWriteCoalescer | None:
+    """Provide the write-behind coalescer when it is enabled in settings."""
+    return get_profile_write_coalescer()
+
+
+def provide_profile_change_hub() -> ProfileChangeHub:
+    """Provide this worker's shared profile change hub."""
+    return get_profile_change_hub()
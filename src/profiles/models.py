@@ -1,10 +1,15 @@
 from advanced_alchemy.base import IdentityAuditBase
-from sqlalchemy import String
+from sqlalchemy import Index, String, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 
 class Profile(IdentityAuditBase):
     __tablename__ = "profiles"
+    __table_args__ = (Index("ix_profiles_updated_at_id", "updated_at", "id"),)
 
     full_name: Mapped["str"] = mapped_column(String(100), nullable=False)
     email: Mapped["str"] = mapped_column(String(100), nullable=True)
+
+
+# One profile per email, ignoring case; PUT /profiles/by-email upserts on it.
+Index("uq_profiles_email_lower", func.lower(Profile.email), unique=True)
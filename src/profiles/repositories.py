@@ -1,9 +1,112 @@
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timezone
+from typing import Any
+
 from advanced_alchemy.repository import SQLAlchemyAsyncRepository
+from litestar.exceptions import HTTPException
+from litestar.status_codes import HTTP_501_NOT_IMPLEMENTED
+from sqlalchemy import Boolean, column, func, literal_column, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import ProgrammingError
 
 from src.profiles.models import Profile
 
+# "there is no unique or exclusion constraint matching the ON CONFLICT
+# specification"
+_NO_CONFLICT_TARGET = "42P10"
+
+
+class EmailUpsertUnavailable(HTTPException):
+    """``uq_profiles_email_lower`` is missing, e.g. on a partitioned table."""
+
+    status_code = HTTP_501_NOT_IMPLEMENTED
+    detail = "Upserting profiles by email is not available on this database."
+
 
 class ProfileRepository(SQLAlchemyAsyncRepository[Profile]):
     """Profile repository."""
 
     model_type = Profile
+
+    async def update_many_by_id(
+        self, changes: Mapping[int, Mapping[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Apply per-id column changes with one ``UPDATE ... FROM (VALUES ...)``.
+
+        Rows are grouped by the set of columns they touch so that every group
+        is a single statement. Returns the updated rows (``id``, ``full_name``
+        and ``email``); ids that do not exist are simply absent.
+        """
+        groups: dict[tuple[str, ...], list[tuple[int, Mapping[str, Any]]]] = {}
+        for item_id, fields in changes.items():
+            groups.setdefault(tuple(sorted(fields)), []).append((item_id, fields))
+
+        table = Profile.__table__
+        now = datetime.now(timezone.utc)
+        updated: list[dict[str, Any]] = []
+        for names, rows in groups.items():
+            data = values(
+                column("id", table.c.id.type),
+                *(column(name, table.c[name].type) for name in names),
+                name="changes",
+            ).data([(item_id, *(fields[n] for n in names)) for item_id, fields in rows])
+            statement = (
+                update(table)
+                .where(table.c.id == data.c.id)
+                .values({**{name: data.c[name] for name in names}, "updated_at": now})
+                .returning(table.c.id, table.c.full_name, table.c.email)
+            )
+            result = await self.session.execute(statement)
+            updated.extend(dict(row) for row in result.mappings())
+        return updated
+
+    async def upsert_by_email(
+        self, rows: Sequence[Mapping[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Insert or update profiles by case-insensitive email in one statement.
+
+        Uses ``INSERT ... ON CONFLICT (lower(email)) DO UPDATE ... RETURNING``
+        against the ``uq_profiles_email_lower`` index. A statement may touch
+        each row only once, so rows whose emails differ only in case are
+        collapsed first, the last one winning. Returns ``id``, ``full_name``,
+        ``email`` and ``inserted`` (false when an existing row was updated)
+        for every written row.
+
+        Raises:
+            EmailUpsertUnavailable: if the index does not exist.
+        """
+        unique = {row["email"].lower(): row for row in rows}
+        table = Profile.__table__
+        now = datetime.now(timezone.utc)
+        statement = insert(table).values(
+            [
+                {
+                    "full_name": row["full_name"],
+                    "email": row["email"],
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for row in unique.values()
+            ]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[func.lower(table.c.email)],
+            set_={
+                "full_name": statement.excluded.full_name,
+                "email": statement.excluded.email,
+                "updated_at": now,
+            },
+        ).returning(
+            table.c.id,
+            table.c.full_name,
+            table.c.email,
+            # xmax is only zero on a freshly inserted row version.
+            literal_column("xmax = 0", Boolean).label("inserted"),
+        )
+        try:
+            result = await self.session.execute(statement)
+        except ProgrammingError as exc:
+            if getattr(exc.orig, "sqlstate", None) == _NO_CONFLICT_TARGET:
+                raise EmailUpsertUnavailable() from exc
+            raise
+        return [dict(row) for row in result.mappings()]
@@ -1,7 +1,7 @@
 import msgspec
 
 from src.schemas import PositiveIntStruct, EmailStrStruct
-from litestar.dto.msgspec_dto import MsgspecDTO
+from src.negotiation import NegotiatedMsgspecDTO
 
 
 class BaseProfileStruct(msgspec.Struct):
@@ -16,7 +16,12 @@ class ProfileStruct(BaseProfileStruct):
 class ProfileWriteStruct(BaseProfileStruct): ...
 
 
-class ProfileWriteDTO(MsgspecDTO[ProfileWriteStruct]): ...
+class ProfileImportResult(msgspec.Struct):
+    created: int = 0
+    updated: int = 0
 
 
-class ProfileDTO(MsgspecDTO[ProfileStruct]): ...
+class ProfileWriteDTO(NegotiatedMsgspecDTO[ProfileWriteStruct]): ...
+
+
+class ProfileDTO(NegotiatedMsgspecDTO[ProfileStruct]): ...
@@ -1,10 +1,133 @@
-from advanced_alchemy.service import SQLAlchemyAsyncRepositoryService
+from collections.abc import Sequence
+from typing import Any
 
+import msgspec
+
+from src.crud import CrudService
+from src.outbox.models import OutboxEvent
 from src.profiles.models import Profile
 from src.profiles.repositories import ProfileRepository
+from src.profiles.schemas import ProfileStruct, ProfileWriteStruct
+from src.tracing import span
+
+
+def profile_event(event_type: str, payload: dict[str, Any]) -> OutboxEvent:
+    """Build the outbox row for a ``profile.<event_type>`` event."""
+    return OutboxEvent(
+        aggregate_type="profile",
+        aggregate_id=payload["id"],
+        event_type=f"profile.{event_type}",
+        payload=payload,
+    )
+
 
+class ProfileService(CrudService[Profile, ProfileRepository]):
+    """Service for managing blog Profiles with automatic schema validation.
 
-class ProfileService(SQLAlchemyAsyncRepositoryService[Profile, ProfileRepository]):
-    """Service for managing blog Profiles with automatic schema validation."""
+    Every write also records an outbox event in the same transaction, so
+    downstream consumers see exactly the changes that were committed.
+    """
 
     repository_type = ProfileRepository
+    read_schema = ProfileStruct
+    resource = "profile"
+
+    async def create(
+        self, data: Any, *, auto_commit: bool | None = None, **kwargs: Any
+    ) -> Profile:
+        with span("ProfileService.create"):
+            profile = await super().create(data, auto_commit=False, **kwargs)
+            await self._record("created", self._event_payload(profile), auto_commit)
+        return profile
+
+    async def update(
+        self,
+        data: Any,
+        item_id: Any | None = None,
+        *,
+        auto_commit: bool | None = None,
+        **kwargs: Any,
+    ) -> Profile:
+        with span("ProfileService.update", {"profile.id": item_id}):
+            profile = await super().update(
+                data, item_id=item_id, auto_commit=False, **kwargs
+            )
+            await self._record("updated", self._event_payload(profile), auto_commit)
+        return profile
+
+    async def delete(
+        self, item_id: Any, *, auto_commit: bool | None = None, **kwargs: Any
+    ) -> Profile:
+        with span("ProfileService.delete", {"profile.id": item_id}):
+            profile = await super().delete(item_id, auto_commit=False, **kwargs)
+            await self._record("deleted", {"id": profile.id}, auto_commit)
+        return profile
+
+    async def create_many(
+        self, data: Any, *, auto_commit: bool | None = None, **kwargs: Any
+    ) -> Sequence[Profile]:
+        with span("ProfileService.create_many", {"profile.count": len(data)}):
+            profiles = await super().create_many(data, auto_commit=False, **kwargs)
+            self.repository.session.add_all(
+                [profile_event("created", self._event_payload(p)) for p in profiles]
+            )
+            await self._finish(auto_commit)
+        return profiles
+
+    async def delete_many(
+        self, item_ids: list[Any], *, auto_commit: bool | None = None, **kwargs: Any
+    ) -> Sequence[Profile]:
+        with span("ProfileService.delete_many", {"profile.count": len(item_ids)}):
+            profiles = await super().delete_many(item_ids, auto_commit=False, **kwargs)
+            self.repository.session.add_all(
+                [profile_event("deleted", {"id": p.id}) for p in profiles]
+            )
+            await self._finish(auto_commit)
+        return profiles
+
+    async def upsert_by_email(
+        self,
+        data: Sequence[ProfileWriteStruct],
+        *,
+        auto_commit: bool | None = None,
+    ) -> list[tuple[ProfileStruct, bool]]:
+        """Create or update profiles matched by email, ignoring case.
+
+        Every record is written by a single statement and the returned
+        profiles are built from its ``RETURNING`` rows, without loading ORM
+        instances. Returns ``(profile, created)`` pairs.
+        """
+        with span("ProfileService.upsert_by_email", {"profile.count": len(data)}):
+            rows = await self.repository.upsert_by_email(
+                [msgspec.structs.asdict(item) for item in data]
+            )
+            results = []
+            for row in rows:
+                created = row.pop("inserted")
+                results.append((msgspec.convert(row, ProfileStruct), created))
+                self.repository.session.add(
+                    profile_event("created" if created else "updated", row)
+                )
+            await self._finish(auto_commit)
+        return results
+
+    async def list_and_count(
+        self, *filters: Any, **kwargs: Any
+    ) -> tuple[list[Profile], int]:
+        with span("ProfileService.list_and_count"):
+            return await super().list_and_count(*filters, **kwargs)
+
+    def _event_payload(self, profile: Profile) -> dict[str, Any]:
+        return msgspec.to_builtins(self.to_schema(profile, schema_type=ProfileStruct))
+
+    async def _record(
+        self, event_type: str, payload: dict[str, Any], auto_commit: bool | None
+    ) -> None:
+        self.repository.session.add(profile_event(event_type, payload))
+        await self._finish(auto_commit)
+
+    async def _finish(self, auto_commit: bool | None) -> None:
+        if auto_commit if auto_commit is not None else self.repository.auto_commit:
+            await self.repository.session.commit()
+        else:
+            await self.repository.session.flush()
@@ -0,0 +1,181 @@
+"""On-demand profiling of individual requests.
+
+When switched on (``PUT /system/profiling`` or the ``profiling_*``
+settings), requests carrying the profiling header, and a random
+``sample_rate`` fraction of the others, run under :mod:`cProfile` with a
+:mod:`tracemalloc` snapshot taken before and after. The profile covers the
+whole request: guards, handler, service and database calls, and response
+serialisation. Reports are kept in a bounded in-memory ring buffer per
+worker and can be fetched from ``/system/profiling/reports``.
+
+When it is off, the middleware costs one attribute check per request.
+Only one request per worker is profiled at a time. cProfile follows the
+event-loop thread, so the report also includes work from other requests
+that ran concurrently on that thread.
+"""
+
+import cProfile
+import io
+import itertools
+import pstats
+import random
+import time
+import tracemalloc
+from collections import deque
+
+import msgspec
+from litestar.datastructures import Headers
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.base import settings
+
+
+class ProfileReportSummary(msgspec.Struct):
+    id: int
+    method: str
+    path: str
+    status: int | None
+    trigger: str
+    started_at: float
+    duration_ms: float
+
+
+class ProfileReport(ProfileReportSummary):
+    """A summary plus the cProfile stats text and the top allocation sites."""
+
+    stats: str
+    allocations: list[str]
+
+    def summary(self) -> ProfileReportSummary:
+        return ProfileReportSummary(
+            **{f: getattr(self, f) for f in ProfileReportSummary.__struct_fields__}
+        )
+
+
+class ProfilingState(msgspec.Struct):
+    enabled: bool
+    sample_rate: float = msgspec.field(default=0.0)
+
+
+class RequestProfiler:
+    def __init__(
+        self,
+        enabled: bool = False,
+        sample_rate: float = 0.0,
+        header: str = "x-profile",
+        buffer_size: int = 20,
+        trace_allocations: bool = True,
+        top: int = 40,
+    ) -> None:
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.header = header.lower()
+        self.trace_allocations = trace_allocations
+        self.top = top
+        self.reports: deque[ProfileReport] = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._busy = False
+
+    @property
+    def state(self) -> ProfilingState:
+        return ProfilingState(enabled=self.enabled, sample_rate=self.sample_rate)
+
+    def configure(self, state: ProfilingState) -> None:
+        self.enabled = state.enabled
+        self.sample_rate = min(max(state.sample_rate, 0.0), 1.0)
+
+    def get(self, report_id: int) -> ProfileReport | None:
+        return next((r for r in self.reports if r.id == report_id), None)
+
+    def trigger(self, scope: Scope) -> str | None:
+        """Return why this request should be profiled, or ``None``."""
+        if self._busy:
+            return None
+        if self.header in Headers.from_scope(scope):
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def profile(
+        self, app: ASGIApp, scope: Scope, receive: Receive, send: Send, trigger: str
+    ) -> None:
+        status: int | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self._busy = True
+        started_tracing = False
+        before = None
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            before = tracemalloc.take_snapshot()
+        profiler = cProfile.Profile()
+        started_at = time.time()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started
+            allocations: list[str] = []
+            if before is not None:
+                after = tracemalloc.take_snapshot()
+                if started_tracing:
+                    tracemalloc.stop()
+                allocations = [
+                    str(stat) for stat in after.compare_to(before, "lineno")[: self.top]
+                ]
+            self._busy = False
+            self.reports.append(
+                ProfileReport(
+                    id=next(self._ids),
+                    method=scope.get("method", ""),
+                    path=scope["path"],
+                    status=status,
+                    trigger=trigger,
+                    started_at=started_at,
+                    duration_ms=duration * 1000,
+                    stats=self._format(profiler),
+                    allocations=allocations,
+                )
+            )
+
+    def _format(self, profiler: cProfile.Profile) -> str:
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        return out.getvalue()
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, profiler: "RequestProfiler | None" = None) -> None:
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        profiler = self.profiler
+        if not profiler.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = profiler.trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        await profiler.profile(self.app, scope, receive, send, trigger)
+
+
+request_profiler = RequestProfiler(
+    enabled=settings.profiling_enabled,
+    sample_rate=settings.profiling_sample_rate,
+    header=settings.profiling_header,
+    buffer_size=settings.profiling_buffer_size,
+    trace_allocations=settings.profiling_trace_allocations,
+)
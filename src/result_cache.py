@@ -0,0 +1,187 @@
+"""Cache of encoded query results, invalidated per table by a generation counter.
+
+Each cached table has a :class:`ResultCache` whose ``generation`` is bumped
+on every committed write to the table. Entries remember the generation they
+were loaded under and are only served while it is still current, so a
+write invalidates every cached result of the table in O(1) without looking
+at a single key. Superseded entries are never served again and age out of
+the LRU as new entries push them out.
+
+Writes are picked up from SQLAlchemy sessions: ORM flushes and DML
+statements run through ``Session.execute`` record the tables they touch,
+and the generations of those tables are bumped once the transaction
+commits. Writes from other processes have to be signalled separately (see
+``src.profiles.changes``); a cache whose ``is_coherent`` check fails is
+bypassed, not trusted.
+"""
+
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from itertools import chain
+
+import msgspec
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from src.singleflight import SingleFlight
+
+_WRITTEN = "result_cache_written_tables"
+
+
+class ResultCacheStats(msgspec.Struct):
+    generation: int
+    entries: int
+    size: int
+    max_bytes: int
+    hits: int
+    misses: int
+
+
+class ResultCache:
+    """A byte-bounded LRU of encoded results for one table.
+
+    ``max_bytes`` bounds the summed size of the cached values; results
+    larger than that are not cached at all. ``is_coherent`` is consulted on
+    every lookup and, while it returns false, results are loaded without
+    being read from or written to the cache.
+    """
+
+    def __init__(
+        self, max_bytes: int, is_coherent: Callable[[], bool] = lambda: True
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._is_coherent = is_coherent
+        self._entries: OrderedDict[Hashable, tuple[int, bytes]] = OrderedDict()
+        self._loads: SingleFlight[bytes] = SingleFlight()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self) -> None:
+        self.generation += 1
+
+    def get(self, key: Hashable) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        generation, value = entry
+        if generation != self.generation:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, generation: int, value: bytes) -> None:
+        """Store ``value`` as loaded under ``generation``.
+
+        Callers pass the generation read *before* running the query, so a
+        result that raced with a write is stored already stale.
+        """
+        if generation != self.generation or len(value) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (generation, value)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    async def get_or_load(
+        self, key: Hashable, load: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """Return the cached value for ``key`` or load, cache and return it.
+
+        Concurrent misses for the same key and generation share one load.
+        """
+        if not self._is_coherent():
+            return await load()
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        generation = self.generation
+
+        async def load_and_store() -> bytes:
+            value = await load()
+            self.put(key, generation, value)
+            return value
+
+        return await self._loads.do((key, generation), load_and_store)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> ResultCacheStats:
+        return ResultCacheStats(
+            generation=self.generation,
+            entries=len(self._entries),
+            size=self.size,
+            max_bytes=self.max_bytes,
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+_caches: dict[str, ResultCache] = {}
+
+
+def register_result_cache(table: str, cache: ResultCache) -> ResultCache:
+    """Invalidate ``cache`` whenever a session commits a write to ``table``."""
+    if not _caches:
+        _install_listeners()
+    _caches[table] = cache
+    return cache
+
+
+def invalidate(table: str) -> None:
+    cache = _caches.get(table)
+    if cache is not None:
+        cache.invalidate()
+
+
+def snapshot() -> dict[str, ResultCacheStats]:
+    return {table: cache.stats() for table, cache in _caches.items()}
+
+
+def _written(session: Session) -> set[str]:
+    return session.info.setdefault(_WRITTEN, set())
+
+
+def _after_flush(session: Session, _flush_context) -> None:
+    # new/dirty/deleted still describe what was just flushed at this point.
+    _written(session).update(
+        obj.__table__.name
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if hasattr(obj, "__table__")
+    )
+
+
+def _do_orm_execute(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        _written(state.session).add(state.statement.table.name)
+
+
+def _after_commit(session: Session) -> None:
+    for table in session.info.pop(_WRITTEN, ()):
+        invalidate(table)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_WRITTEN, None)
+
+
+def _install_listeners() -> None:
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+
+import msgspec
+
+logger = logging.getLogger(__name__)
+
+JobFn = Callable[[], Awaitable[object]]
+
+
+class JobStats(msgspec.Struct):
+    """Run counters and latency for one periodic job."""
+
+    runs: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    running: bool = False
+    last_started_at: float | None = None
+    last_duration_s: float | None = None
+    max_duration_s: float = 0.0
+    total_duration_s: float = 0.0
+    last_error: str | None = None
+
+
+class PeriodicJob:
+    def __init__(
+        self,
+        name: str,
+        fn: JobFn,
+        interval: float,
+        jitter: float,
+        run_at_start: bool,
+    ) -> None:
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        self.run_at_start = run_at_start
+        self.stats = JobStats()
+        self.lock = asyncio.Lock()
+
+    def next_delay(self) -> float:
+        """Seconds until the next run, including jitter and failure backoff."""
+        failures = self.stats.consecutive_failures
+        if failures:
+            # Retry sooner than the normal schedule, doubling each time, but
+            # never wait longer than one interval.
+            return min(min(1.0, self.interval) * 2 ** (failures - 1), self.interval)
+        spread = self.interval * self.jitter
+        return max(0.0, self.interval + random.uniform(-spread, spread))
+
+
+class Scheduler:
+    """Run async jobs periodically in the background of a worker.
+
+    Each job runs in its own task, strictly one run at a time, so a slow run
+    delays the next one instead of overlapping it. Exceptions are logged and
+    recorded in the job's stats; a failing job is retried with exponential
+    backoff and then returns to its normal interval once it succeeds.
+    ``stop`` lets in-flight runs finish for up to ``grace`` seconds before
+    cancelling them.
+    """
+
+    def __init__(self) -> None:
+        self._jobs: dict[str, PeriodicJob] = {}
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+        self._stopping: asyncio.Event | None = None
+
+    def add_job(
+        self,
+        name: str,
+        fn: JobFn,
+        interval: float,
+        *,
+        jitter: float = 0.1,
+        run_at_start: bool = True,
+    ) -> None:
+        """Register ``fn`` to run every ``interval`` seconds (± ``jitter`` × interval)."""
+        if name in self._jobs:
+            raise ValueError(f"Job {name!r} is already registered")
+        self._jobs[name] = PeriodicJob(name, fn, interval, jitter, run_at_start)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._stopping = asyncio.Event()
+        for name, job in self._jobs.items():
+            self._tasks[name] = asyncio.create_task(self._loop(job), name=f"job:{name}")
+
+    async def stop(self, grace: float = 5.0) -> None:
+        if not self._tasks:
+            return
+        assert self._stopping is not None
+        self._stopping.set()
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        _, pending = await asyncio.wait(tasks, timeout=grace)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_job(self, name: str) -> bool:
+        """Run a job now; returns ``False`` if a run is already in progress."""
+        job = self._jobs[name]
+        if job.lock.locked():
+            return False
+        await self._run(job)
+        return True
+
+    def snapshot(self) -> dict[str, JobStats]:
+        return {name: job.stats for name, job in self._jobs.items()}
+
+    async def _loop(self, job: PeriodicJob) -> None:
+        delay = 0.0 if job.run_at_start else job.next_delay()
+        while not await self._wait_stopping(delay):
+            await self._run(job)
+            delay = job.next_delay()
+
+    async def _wait_stopping(self, delay: float) -> bool:
+        assert self._stopping is not None
+        try:
+            await asyncio.wait_for(self._stopping.wait(), delay)
+        except TimeoutError:
+            return False
+        return True
+
+    async def _run(self, job: PeriodicJob) -> None:
+        async with job.lock:
+            stats = job.stats
+            stats.running = True
+            stats.last_started_at = time.time()
+            started = time.perf_counter()
+            try:
+                await job.fn()
+            except Exception as exc:
+                stats.failures += 1
+                stats.consecutive_failures += 1
+                stats.last_error = repr(exc)
+                logger.exception("Scheduled job %s failed", job.name)
+            else:
+                stats.consecutive_failures = 0
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.running = False
+                stats.runs += 1
+                stats.last_duration_s = elapsed
+                stats.total_duration_s += elapsed
+                stats.max_duration_s = max(stats.max_duration_s, elapsed)
+
+
+scheduler = Scheduler()
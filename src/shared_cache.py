@@ -0,0 +1,158 @@
+"""Host-local key/value cache shared by every worker process.
+
+The table lives in a memory-mapped file (``/dev/shm`` by default, so it
+never touches disk) that each worker maps independently. It is a fixed-size
+open-addressing hash table with short linear probing. Entries expire at an
+absolute time and are overwritten when their slot is needed; nothing is ever
+deleted explicitly.
+
+Reads take no lock. Each slot starts with a sequence counter that writers
+make odd while they change the slot and even again when done (a seqlock);
+a reader that sees an odd counter, or a different counter after copying
+the slot, retries. Writers serialise on an ``flock`` of the file, which is
+cheap because writes only happen on cache misses.
+
+The layout is part of the file name (``{path}.{slots}x{slot_size}``), so a
+process with a different layout, e.g. the previous deploy, keeps its own
+file. A file is never shrunk once created: another process may still have
+it mapped, and reading past its new end would kill that process with
+``SIGBUS``.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+_MAGIC = b"NYXSHC01"
+_HEADER = struct.Struct("<8sII")  # magic, slots, slot size
+_HEADER_SIZE = 64
+# sequence, key digest, expires at (unix time), value length
+_SLOT = struct.Struct("<Q16sdI4x")
+_SEQ = struct.Struct("<Q")
+_EMPTY_KEY = bytes(16)
+
+
+class SharedCache:
+    """A fixed-size ``bytes -> bytes`` cache in a shared memory-mapped file.
+
+    ``slot_size`` bounds the size of one entry including its 40-byte header;
+    :meth:`set` ignores values that don't fit. The table is stored in
+    ``{path}.{slots}x{slot_size}``; a file written by an older version is
+    cleared in place when opened.
+    """
+
+    def __init__(
+        self, path: str, slots: int, slot_size: int = 1024, probe: int = 8
+    ) -> None:
+        if slot_size <= _SLOT.size:
+            raise ValueError(f"slot_size must be larger than {_SLOT.size}")
+        self.path = f"{path}.{slots}x{slot_size}"
+        self.slots = slots
+        self.slot_size = slot_size
+        self.probe = min(probe, slots)
+        self.capacity = slot_size - _SLOT.size
+        size = _HEADER_SIZE + slots * slot_size
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with self._locked():
+                header = _HEADER.pack(_MAGIC, slots, slot_size)
+                current = os.fstat(self._fd).st_size
+                if os.pread(self._fd, _HEADER.size, 0) != header:
+                    if current:
+                        # Zero the old contents in place; never truncate.
+                        blank = bytes(min(current, 1 << 20))
+                        for offset in range(0, current, len(blank)):
+                            os.pwrite(self._fd, blank[: current - offset], offset)
+                    os.pwrite(self._fd, header, 0)
+                if current < size:
+                    os.ftruncate(self._fd, size)
+            self._mm = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+    def get(self, key: bytes, now: float | None = None) -> bytes | None:
+        """Return the live value stored for ``key``, or ``None``."""
+        digest = _digest(key)
+        now = time.time() if now is None else now
+        mm = self._mm
+        for offset in self._probe_offsets(digest):
+            for _ in range(4):
+                seq, slot_key, expires_at, length = _SLOT.unpack_from(mm, offset)
+                if seq & 1:
+                    continue  # a writer is mid-update; look again
+                if slot_key != digest:
+                    if slot_key == _EMPTY_KEY:
+                        return None  # end of the probe chain
+                    break
+                start = offset + _SLOT.size
+                value = mm[start : start + length]
+                if _SEQ.unpack_from(mm, offset)[0] != seq:
+                    continue  # overwritten while copying
+                return value if expires_at > now else None
+        return None
+
+    def set(self, key: bytes, value: bytes, expires_at: float) -> bool:
+        """Store ``value`` until ``expires_at``; returns ``False`` if it is too large."""
+        if len(value) > self.capacity:
+            return False
+        digest = _digest(key)
+        now = time.time()
+        mm = self._mm
+        with self._locked():
+            # The key's own slot wins over a free one earlier in the chain,
+            # or the stale copy would resurface once that slot is reused.
+            target = free = oldest = None
+            for offset in self._probe_offsets(digest):
+                _, slot_key, slot_expires, _ = _SLOT.unpack_from(mm, offset)
+                if slot_key == digest:
+                    target = offset
+                    break
+                if slot_key == _EMPTY_KEY or slot_expires <= now:
+                    if free is None:
+                        free = offset
+                    if slot_key == _EMPTY_KEY:
+                        break  # the end of the chain; the key is not further on
+                elif oldest is None or slot_expires < oldest[0]:
+                    oldest = (slot_expires, offset)
+            if target is None:
+                target = free if free is not None else oldest[1]
+
+            seq = _SEQ.unpack_from(mm, target)[0]
+            _SEQ.pack_into(mm, target, seq + 1)
+            start = target + _SLOT.size
+            mm[start : start + len(value)] = value
+            _SLOT.pack_into(mm, target, seq + 1, digest, expires_at, len(value))
+            _SEQ.pack_into(mm, target, seq + 2)
+        return True
+
+    def _probe_offsets(self, digest: bytes):
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        for i in range(self.probe):
+            yield _HEADER_SIZE + ((start + i) % self.slots) * self.slot_size
+
+    def _locked(self):
+        return _FileLock(self._fd)
+
+
+class _FileLock:
+    def __init__(self, fd: int) -> None:
+        self._fd = fd
+
+    def __enter__(self) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *_) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+def _digest(key: bytes) -> bytes:
+    return hashlib.blake2b(key, digest_size=16).digest()
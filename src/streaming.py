@@ -0,0 +1,229 @@
+"""Incremental decoding of large JSON and NDJSON request bodies.
+
+Litestar reads a whole body into memory before decoding it, which for
+multi-hundred-megabyte batch uploads means holding the raw bytes, the parsed
+items and the service's copies at the same time. :func:`decode_batches`
+instead decodes ``request.stream()`` with msgspec as chunks arrive and
+yields the items in lists of ``batch_size``, so only the batch being written
+and about one chunk of raw bytes are held at a time.
+
+Bodies are either one JSON array (``application/json``) or one JSON value
+per line (``application/x-ndjson``, also accepted as ``application/ndjson``
+and ``application/jsonl``). The body size limit is the route's
+``request_max_body_size``, which Litestar enforces while streaming; the
+item limit is enforced here. Both fail with 413 as soon as they are crossed.
+"""
+
+import functools
+import re
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Any, Generic, TypeVar
+
+import msgspec
+from litestar import Request
+from litestar.exceptions import HTTPException, ValidationException
+
+T = TypeVar("T")
+
+NDJSON = "application/x-ndjson"
+NDJSON_MEDIA_TYPES = frozenset({NDJSON, "application/ndjson", "application/jsonl"})
+
+_WHITESPACE = b" \t\r\n"
+# Element paths in msgspec errors, e.g. "at `$[3].email`".
+_ITEM_PATH = re.compile(r"\$\[(\d+)\]")
+# Outside strings: the next byte that changes nesting, separates elements
+# or opens a string.
+_STRUCTURAL = re.compile(rb'[\[\]{},"]')
+# The rest of a string: stops before its closing quote, at the end of the
+# data, or at a backslash whose escaped byte has not arrived yet.
+_STRING_REST = re.compile(rb'[^"\\]*+(?:\\.[^"\\]*+)*+', re.S)
+_STRING = rb'"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+# A run of complete top-level elements that are flat objects, strings or
+# scalars, each followed by its comma. Matching these in one regex call
+# rather than token by token is what keeps scanning as fast as decoding.
+_FLAT_ELEMENTS = re.compile(
+    rb'(?:\s*+(?:\{(?:[^{}\[\]"]++|' + _STRING + rb')*+\}|' + _STRING
+    + rb'|[^,\[\]{}"\s][^,\[\]{}"]*+)\s*+,)*',
+    re.S,
+)
+
+
+@functools.cache
+def list_decoder(type_: Any) -> msgspec.json.Decoder:
+    return msgspec.json.Decoder(list[type_])
+
+
+def is_ndjson_request(request: Request) -> bool:
+    return request.content_type[0] in NDJSON_MEDIA_TYPES
+
+
+class NdjsonDecoder(Generic[T]):
+    """Decodes NDJSON chunks, one item per non-blank line."""
+
+    def __init__(self, type_: type[T]) -> None:
+        self._decoder = msgspec.json.Decoder(type_)
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> list[T]:
+        self._buffer += chunk
+        end = self._buffer.rfind(b"\n")
+        if end < 0:
+            return []
+        items = self._decoder.decode_lines(self._buffer[: end + 1])
+        del self._buffer[: end + 1]
+        return items
+
+    def close(self) -> list[T]:
+        items = self._decoder.decode_lines(self._buffer)
+        self._buffer.clear()
+        return items
+
+
+class JsonArrayDecoder(Generic[T]):
+    """Decodes the elements of one top-level JSON array as chunks arrive.
+
+    Each chunk is scanned once, carrying the nesting depth and whether it
+    ended inside a string over to the next chunk, to find the last comma
+    between two elements of the outer array. Everything before it is
+    decoded by msgspec as an array and dropped, so only the unfinished
+    element stays buffered. Runs of flat elements are skipped by a single
+    regex match; nested ones are walked token by token.
+    """
+
+    def __init__(self, type_: type[T]) -> None:
+        self._decoder = list_decoder(type_)
+        self._buffer = bytearray()
+        self._opened = False
+        self._after_comma = False
+        # Scan state: where to resume, and what was open there.
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._at_element = True
+
+    def feed(self, chunk: bytes) -> list[T]:
+        self._buffer += chunk
+        if not self._opened and not self._open():
+            return []
+        cut = self._scan()
+        if cut < 0:
+            return []
+        head = self._buffer[:cut]
+        if not head.strip(_WHITESPACE):
+            raise msgspec.DecodeError("Unexpected comma in the JSON array")
+        items = self._decoder.decode(b"[" + head + b"]")
+        del self._buffer[: cut + 1]
+        self._pos -= cut + 1
+        self._after_comma = True
+        return items
+
+    def _scan(self) -> int:
+        """Scan the new bytes; return the last top-level comma's offset, or -1."""
+        buffer = self._buffer
+        end = len(buffer)
+        pos, depth = self._pos, self._depth
+        in_string, at_element = self._in_string, self._at_element
+        cut = -1
+        while True:
+            if in_string:
+                pos = _STRING_REST.match(buffer, pos).end()
+                if pos == end or buffer[pos] != ord('"'):
+                    break
+                pos += 1
+                in_string = False
+            elif at_element:
+                skipped = _FLAT_ELEMENTS.match(buffer, pos).end()
+                if skipped > pos:
+                    cut, pos = skipped - 1, skipped
+                if pos < end:
+                    at_element = False
+            match = _STRUCTURAL.search(buffer, pos)
+            if match is None:
+                pos = end
+                break
+            byte = buffer[match.start()]
+            pos = match.end()
+            if byte == ord('"'):
+                in_string = True
+            elif byte == ord(","):
+                if depth == 0:
+                    cut = pos - 1
+                    at_element = True
+            elif byte in b"[{":
+                depth += 1
+            else:
+                depth -= 1
+        self._pos, self._depth = pos, depth
+        self._in_string, self._at_element = in_string, at_element
+        return cut
+
+    def close(self) -> list[T]:
+        if not self._opened:
+            raise msgspec.DecodeError("Expected a JSON array")
+        # What is left is the last elements and the closing bracket.
+        items = self._decoder.decode(b"[" + self._buffer)
+        if self._after_comma and not items:
+            raise msgspec.DecodeError("Trailing comma in the JSON array")
+        self._buffer.clear()
+        return items
+
+    def _open(self) -> bool:
+        stripped = self._buffer.lstrip(_WHITESPACE)
+        if not stripped:
+            self._buffer.clear()
+            return False
+        if stripped[0] != ord("["):
+            raise msgspec.DecodeError("Expected a JSON array")
+        self._buffer = stripped[1:]
+        self._opened = True
+        return True
+
+
+async def decode_batches(
+    chunks: AsyncIterable[bytes],
+    type_: type[T],
+    *,
+    ndjson: bool,
+    batch_size: int,
+    max_items: int,
+) -> AsyncIterator[list[T]]:
+    """Decode a streamed JSON array or NDJSON body into lists of ``type_``.
+
+    Every list but the last holds exactly ``batch_size`` items. Malformed or
+    invalid items fail with 400 and more than ``max_items`` items with 413,
+    after the batches before them were already yielded.
+    """
+    decoder = NdjsonDecoder(type_) if ndjson else JsonArrayDecoder(type_)
+    batch: list[T] = []
+    count = 0
+
+    def add(items: list[T]) -> list[list[T]]:
+        nonlocal batch, count
+        count += len(items)
+        if count > max_items:
+            raise HTTPException(
+                detail=f"At most {max_items} items per request.", status_code=413
+            )
+        full = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                full.append(batch)
+                batch = []
+        return full
+
+    def invalid(error: msgspec.DecodeError) -> ValidationException:
+        # Paths are relative to the decoded piece; make them absolute.
+        message = _ITEM_PATH.sub(lambda m: f"$[{count + int(m[1])}]", str(error))
+        return ValidationException(f"Invalid body after {count} items: {message}")
+
+    try:
+        async for chunk in chunks:
+            for full in add(decoder.feed(chunk)):
+                yield full
+        for full in add(decoder.close()):
+            yield full
+    except msgspec.DecodeError as e:
+        raise invalid(e) from e
+    if batch:
+        yield batch
@@ -0,0 +1,131 @@
+from litestar import Controller, Response, get, put
+from litestar.exceptions import NotFoundException
+from litestar.status_codes import HTTP_200_OK, HTTP_503_SERVICE_UNAVAILABLE
+
+from src import circuit, result_cache
+from src.circuit import BreakerStats
+from src.guards import admin_guard, auth_guard
+from src.profiling import (
+    ProfileReport,
+    ProfileReportSummary,
+    ProfilingState,
+    request_profiler,
+)
+from src.result_cache import ResultCacheStats
+from src.scheduler import JobStats, scheduler
+from src.warmup import warmup
+
+
+class SystemController(Controller):
+    """Operational endpoints"""
+
+    tags = ["system"]
+    path = "/system"
+
+    @get(path="/jobs", guards=[auth_guard])
+    async def list_jobs(self) -> dict[str, JobStats]:
+        """
+        Returns run counts, failures and latency for each background job.
+
+        :return: A mapping of job name to its current statistics.
+        """
+        return scheduler.snapshot()
+
+    @get(path="/breakers")
+    async def list_breakers(self) -> dict[str, BreakerStats]:
+        """
+        Returns the state and counters of each circuit breaker in this worker.
+
+        Not guarded: it must stay readable while the identity provider, and
+        therefore authentication, is down.
+
+        :return: A mapping of breaker name to its current statistics.
+        """
+        return circuit.snapshot()
+
+    @get(path="/caches", guards=[auth_guard])
+    async def list_caches(self) -> dict[str, ResultCacheStats]:
+        """
+        Returns the generation, size and hit counts of each result cache.
+
+        :return: A mapping of table name to its cache's statistics.
+        """
+        return result_cache.snapshot()
+
+    @get(path="/profiling", guards=[admin_guard])
+    async def get_profiling(self) -> ProfilingState:
+        """
+        Returns whether request profiling is on in this worker.
+
+        :return: The current profiling switch and sample rate.
+        """
+        return request_profiler.state
+
+    @put(path="/profiling", guards=[admin_guard])
+    async def set_profiling(self, data: ProfilingState) -> ProfilingState:
+        """
+        Switches request profiling on or off in the worker serving this call.
+
+        While on, requests sending the profiling header (``X-Profile`` by
+        default) and ``sample_rate`` of all other requests are profiled.
+
+        :param data: The new switch state and sample rate (0-1).
+        :return: The profiling state now in effect.
+        """
+        request_profiler.configure(data)
+        return request_profiler.state
+
+    @get(path="/profiling/reports", guards=[admin_guard])
+    async def list_profile_reports(self) -> list[ProfileReportSummary]:
+        """
+        Lists the profiling reports kept by this worker, newest first.
+
+        :return: Report summaries without the stats and allocation details.
+        """
+        return [report.summary() for report in reversed(request_profiler.reports)]
+
+    @get(path="/profiling/reports/{report_id:int}", guards=[admin_guard])
+    async def get_profile_report(self, report_id: int) -> ProfileReport:
+        """
+        Returns one profiling report with its cProfile stats and allocations.
+
+        :param report_id: The report id from the report list.
+        :return: The full report.
+        """
+        report = request_profiler.get(report_id)
+        if report is None:
+            raise NotFoundException(detail="No profiling report found.")
+        return report
+
+
+class HealthController(Controller):
+    """Load balancer probes; unauthenticated by design."""
+
+    tags = ["system"]
+    path = "/health"
+
+    @get(path="/live")
+    async def live(self) -> dict[str, str]:
+        """
+        Reports that the worker process is up and serving requests.
+
+        :return: A static ``ok`` status.
+        """
+        return {"status": "ok"}
+
+    @get(path="/ready")
+    async def ready(self) -> Response[dict[str, object]]:
+        """
+        Reports whether this worker has finished warming up.
+
+        Returns 503 until the DB pool is open, the JWKS is loaded and the
+        profile statements are prepared, and again once shutdown starts, so
+        the load balancer only routes traffic to warm workers.
+
+        :return: The overall status and the state of each warm-up step.
+        """
+        ready = warmup.ready
+        return Response(
+            {"status": "ready" if ready else "starting", "steps": warmup.status},
+            status_code=HTTP_200_OK if ready else HTTP_503_SERVICE_UNAVAILABLE,
+        )
@@ -0,0 +1,156 @@
+"""Optional OpenTelemetry tracing.
+
+OpenTelemetry is an optional dependency (the ``tracing`` extra) and tracing
+is off unless ``tracing_exporter`` is set. While it is off this module
+imports nothing from ``opentelemetry``, the request middleware and
+instrumentation are not installed, and :func:`span` returns a shared no-op
+context manager.
+
+When enabled, every request gets a server span (Litestar's OpenTelemetry
+middleware) with child spans for the auth guard, ``ProfileService`` calls
+and each SQLAlchemy statement, and outgoing ``httpx`` requests to Zitadel
+carry the ``traceparent`` header. Spans go to one of these exporters:
+
+- ``memory``: kept in :data:`memory_exporter`, for tests.
+- ``file``: one JSON span per line in ``tracing_file_path``.
+- ``otlp``: OTLP/HTTP, configured through the standard ``OTEL_EXPORTER_OTLP_*``
+  environment variables (needs ``opentelemetry-exporter-otlp-proto-http``).
+"""
+
+import contextlib
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any, ContextManager
+
+from config.base import settings
+
+if TYPE_CHECKING:
+    from litestar.middleware import DefineMiddleware
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+
+enabled = settings.tracing_exporter != "none"
+
+_NOOP: ContextManager[None] = contextlib.nullcontext()
+_tracer: Any = None
+_provider: "TracerProvider | None" = None
+_global_provider_set = False
+memory_exporter: "InMemorySpanExporter | None" = None
+
+
+def span(name: str, attributes: Mapping[str, Any] | None = None) -> ContextManager[Any]:
+    """Open a child span of the current one; a no-op while tracing is off."""
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def tracing_middleware() -> list["DefineMiddleware"]:
+    """Middleware that opens a server span per request, if tracing is enabled.
+
+    It resolves the tracer through the global provider, which
+    :func:`configure_tracing` installs later in each worker.
+    """
+    if not enabled:
+        return []
+    from litestar.contrib.opentelemetry import OpenTelemetryConfig
+
+    return [OpenTelemetryConfig(exclude=["/health"]).middleware]
+
+
+def configure_tracing(instrument_db: bool = True) -> None:
+    """Install the tracer provider and instrument SQLAlchemy and httpx.
+
+    Must run in the worker process (exporters start background threads,
+    which do not survive a fork), so it is called from ``on_startup``. It
+    may run again after :func:`shutdown_tracing`; :func:`span` and the
+    instrumentation then use the new provider. OpenTelemetry lets the global
+    provider, which request spans come from, be set only once per process.
+    """
+    global _tracer, _provider, _global_provider_set, memory_exporter
+    if not enabled or _provider is not None:
+        return
+
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.tracing_service_name}),
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_rate)),
+    )
+    if settings.tracing_exporter == "memory":
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+            InMemorySpanExporter,
+        )
+
+        memory_exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(memory_exporter))
+    elif settings.tracing_exporter == "file":
+        provider.add_span_processor(BatchSpanProcessor(_file_exporter()))
+    else:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    if not _global_provider_set:
+        trace.set_tracer_provider(provider)
+        _global_provider_set = True
+    _provider = provider
+    _tracer = provider.get_tracer("nyx")
+
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+
+    HTTPXClientInstrumentor().instrument(tracer_provider=provider)
+    if instrument_db:
+        from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+
+        from config.db import alchemy_config
+
+        SQLAlchemyInstrumentor().instrument(
+            engine=alchemy_config.get_engine().sync_engine, tracer_provider=provider
+        )
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans, close the exporter and remove the instrumentation."""
+    global _tracer, _provider
+    if _provider is None:
+        return
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+
+    for instrumentor in (HTTPXClientInstrumentor(), _sqlalchemy_instrumentor()):
+        if instrumentor is not None and instrumentor.is_instrumented_by_opentelemetry:
+            instrumentor.uninstrument()
+    _provider.shutdown()
+    _provider = None
+    _tracer = None
+
+
+def _sqlalchemy_instrumentor():
+    try:
+        from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+    except ImportError:
+        return None
+    return SQLAlchemyInstrumentor()
+
+
+def _file_exporter():
+    import os
+
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    class FileSpanExporter(ConsoleSpanExporter):
+        def shutdown(self) -> None:
+            self.out.close()
+
+    path = settings.tracing_file_path
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return FileSpanExporter(
+        out=open(path, "a", buffering=1),
+        formatter=lambda s: s.to_json(indent=None) + "\n",
+    )
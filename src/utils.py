@@ -1,9 +1,6 @@
-import asyncio
+from src.guards import JWKSCache
 
-from src.auth.utils import get_jwks
 
-
-async def refresh_jwks_periodically():
-    while True:
-        await get_jwks()
-        await asyncio.sleep(6 * 3600)
+async def refresh_jwks():
+    """Refresh the JWKS used by ``jwt_guard``; scheduled from ``src.main``."""
+    await JWKSCache.refresh()
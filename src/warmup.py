@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from contextlib import AsyncExitStack
+
+from advanced_alchemy.exceptions import NotFoundError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from config.base import settings
+from config.db import alchemy_config
+from config.zitadel import zitadel_settings
+from src.guards import JWKSCache
+from src.profiles.services import ProfileService
+
+logger = logging.getLogger(__name__)
+
+Step = Callable[[], Awaitable[None]]
+
+
+class WarmUp:
+    """Run start-up warm-up steps in the background and track readiness.
+
+    Steps run concurrently. A failing step is retried with exponential
+    backoff (capped at ``max_backoff`` seconds) until it succeeds, so a
+    worker that boots while the database or IdP is unavailable becomes ready
+    once they recover instead of staying cold forever. ``ready`` is only
+    true once every step has succeeded and the worker is not shutting down.
+    """
+
+    def __init__(self, steps: dict[str, Step], max_backoff: float = 30.0) -> None:
+        self._steps = steps
+        self._max_backoff = max_backoff
+        self.status: dict[str, str] = {name: "pending" for name in steps}
+        self._task: asyncio.Task[None] | None = None
+        self._stopping = False
+
+    @property
+    def ready(self) -> bool:
+        return not self._stopping and all(s == "ok" for s in self.status.values())
+
+    def start(self) -> None:
+        self._stopping = False
+        self.status = {name: "pending" for name in self._steps}
+        self._task = asyncio.create_task(self.run(), name="warmup")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run(self) -> None:
+        await asyncio.gather(*(self._run_step(name) for name in self._steps))
+        logger.info("Warm-up complete")
+
+    async def _run_step(self, name: str) -> None:
+        delay = min(0.5, self._max_backoff)
+        while True:
+            try:
+                await self._steps[name]()
+            except Exception as exc:
+                self.status[name] = "failed"
+                logger.warning(
+                    "Warm-up step %s failed (%r); retrying in %.1fs", name, exc, delay
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._max_backoff)
+            else:
+                self.status[name] = "ok"
+                return
+
+
+async def _prime_profile_statements(connection: AsyncConnection) -> None:
+    # Run the statements the profile endpoints use so SQLAlchemy compiles
+    # them and asyncpg prepares them on this pooled connection.
+    async with AsyncSession(bind=connection, expire_on_commit=False) as session:
+        await _prime_profile_reads(ProfileService(session=session))
+
+
+async def _prime_profile_reads(service: ProfileService) -> None:
+    # The same calls as GET /profiles and GET /profiles/{id}, so the Core
+    # selects they issue are the ones that get prepared.
+    await service.list_page(1, 0)
+    try:
+        await service.get_encoded(0)
+    except NotFoundError:
+        pass
+
+
+async def warm_db_pool() -> None:
+    """Open ``warmup_db_connections`` pooled connections and prime each one.
+
+    The connections are held at the same time so the pool really grows to
+    that size, then returned to it.
+    """
+    engine = alchemy_config.get_engine()
+    async with AsyncExitStack() as stack:
+        connections = await asyncio.gather(
+            *(
+                stack.enter_async_context(engine.connect())
+                for _ in range(settings.warmup_db_connections)
+            )
+        )
+        for connection in connections:
+            await _prime_profile_statements(connection)
+
+
+async def warm_jwks() -> None:
+    """Make sure ``jwt_guard`` has keys to verify tokens against.
+
+    Keys loaded from a fresh snapshot are enough; the ``jwks-refresh`` job
+    replaces them in the background.
+    """
+    if not JWKSCache.is_usable():
+        await JWKSCache.refresh()
+
+
+def build_warmup() -> WarmUp:
+    steps: dict[str, Step] = {"db": warm_db_pool}
+    if not zitadel_settings.use_introspection:
+        steps["jwks"] = warm_jwks
+    return WarmUp(steps)
+
+
+warmup = build_warmup()
@@ -0,0 +1,56 @@
+from sqlalchemy import create_engine, text
+
+from migrations.backfill import Backfill, load_progress, run_backfill
+
+UPPERCASE = Backfill(
+    name="uppercase",
+    table="items",
+    apply="UPDATE items SET name = upper(name) WHERE id > :lower AND id <= :upper",
+    batch_size=10,
+)
+
+
+def _engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        connection.execute(
+            text("INSERT INTO items (id, name) VALUES (:id, 'item')"),
+            [{"id": i} for i in range(1, 26)],
+        )
+    return engine
+
+
+def test_backfill_resumes_from_checkpoint():
+    engine = _engine()
+    with engine.connect() as connection:
+        progress = run_backfill(connection, UPPERCASE, max_batches=2)
+        assert (progress.position, progress.rows, progress.completed) == (20, 20, False)
+
+    with engine.connect() as connection:
+        assert load_progress(connection, "uppercase").position == 20
+        progress = run_backfill(connection, UPPERCASE)
+        assert progress.completed and progress.rows == 25 and progress.batches == 3
+        names = connection.execute(text("SELECT DISTINCT name FROM items")).scalars()
+        assert list(names) == ["ITEM"]
+        # A completed backfill does not run again.
+        assert run_backfill(connection, UPPERCASE).batches == 3
+
+
+def test_backfill_waits_for_replicas(monkeypatch):
+    engine = _engine()
+    lags = iter([3.0, 0.5, 0.0, 0.0, 0.0])
+    sleeps = []
+    monkeypatch.setattr("migrations.backfill.time.sleep", sleeps.append)
+    throttled = Backfill(
+        name="throttled",
+        table="items",
+        apply=UPPERCASE.apply,
+        batch_size=20,
+        max_lag=1.0,
+        lag_poll=0.25,
+    )
+    with engine.connect() as connection:
+        progress = run_backfill(connection, throttled, lag=lambda _: next(lags))
+    assert progress.completed
+    assert sleeps == [0.25]
@@ -0,0 +1,116 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src import deadlines
+from src.circuit import CircuitBreaker, CircuitOpen
+
+
+async def fail():
+    raise httpx.ConnectError("idp down")
+
+
+async def ok():
+    return "ok"
+
+
+async def unauthorized():
+    request = httpx.Request("POST", "http://idp/introspect")
+    response = httpx.Response(401, request=request)
+    raise httpx.HTTPStatusError("401", request=request, response=response)
+
+
+def test_opens_after_threshold_and_recovers_through_a_probe():
+    breaker = CircuitBreaker("idp", failure_threshold=2, recovery_timeout=0.05)
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await breaker.call(fail)
+        assert breaker.state == "open"
+
+        with pytest.raises(CircuitOpen):
+            await breaker.call(ok)
+
+        await asyncio.sleep(0.06)
+        # A failed probe re-opens the circuit straight away.
+        with pytest.raises(httpx.ConnectError):
+            await breaker.call(fail)
+        assert breaker.state == "open"
+
+        await asyncio.sleep(0.06)
+        assert await breaker.call(ok) == "ok"
+        assert breaker.state == "closed"
+
+    asyncio.run(main())
+    assert breaker.stats.rejected == 1
+    assert breaker.stats.times_opened == 2
+
+
+def test_client_errors_do_not_count_as_failures():
+    breaker = CircuitBreaker("idp", failure_threshold=1)
+
+    async def main():
+        for _ in range(3):
+            with pytest.raises(httpx.HTTPStatusError):
+                await breaker.call(unauthorized)
+
+    asyncio.run(main())
+    assert breaker.state == "closed"
+    assert breaker.stats.failures == 0
+
+
+def test_only_one_probe_at_a_time_while_half_open():
+    breaker = CircuitBreaker("idp", failure_threshold=1, recovery_timeout=0.01)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        with pytest.raises(httpx.ConnectError):
+            await breaker.call(fail)
+        await asyncio.sleep(0.02)
+        return await asyncio.gather(
+            breaker.call(slow), breaker.call(slow), return_exceptions=True
+        )
+
+    first, second = asyncio.run(main())
+    assert first == "ok"
+    assert isinstance(second, CircuitOpen)
+    assert breaker.state == "closed"
+
+
+def test_calls_cut_short_by_the_request_deadline_are_neutral():
+    breaker = CircuitBreaker("idp", failure_threshold=1, recovery_timeout=0.01)
+
+    async def timed_out():
+        await asyncio.sleep(0.02)
+        raise httpx.ReadTimeout("budget spent")
+
+    async def out_of_time():
+        deadlines.timeout(5)
+
+    async def main():
+        token = deadlines._deadline.set(deadlines.time.monotonic() + 0.01)
+        try:
+            for _ in range(3):
+                with pytest.raises(httpx.ReadTimeout):
+                    await breaker.call(timed_out)
+            assert breaker.state == "closed"
+
+            deadlines._deadline.set(None)
+            with pytest.raises(httpx.ConnectError):
+                await breaker.call(fail)
+            await asyncio.sleep(0.02)
+            # A deadline that ran out before the IdP was called is no probe.
+            deadlines._deadline.set(deadlines.time.monotonic() - 1)
+            with pytest.raises(deadlines.DeadlineExceeded):
+                await breaker.call(out_of_time)
+        finally:
+            deadlines._deadline.reset(token)
+
+    asyncio.run(main())
+    assert breaker.state == "half_open"
+    assert breaker.stats.failures == 1
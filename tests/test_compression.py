@@ -0,0 +1,101 @@
+import gzip
+import zlib
+
+from litestar import Litestar, get
+from litestar.config.compression import CompressionConfig
+from litestar.middleware import DefineMiddleware
+from litestar.response import ServerSentEvent, Stream
+from litestar.testing import TestClient
+
+from src.compression import (
+    NegotiatingCompressionMiddleware,
+    NegotiationOptions,
+    choose_encoding,
+)
+
+PAYLOAD = "x" * 5000
+
+
+@get("/big", media_type="text/plain")
+async def big() -> str:
+    return PAYLOAD
+
+
+@get("/small", media_type="text/plain")
+async def small() -> str:
+    return "tiny"
+
+
+@get("/stream")
+async def stream() -> Stream:
+    async def chunks():
+        for _ in range(3):
+            yield PAYLOAD
+
+    return Stream(chunks(), media_type="text/plain")
+
+
+@get("/events")
+async def events() -> ServerSentEvent:
+    async def chunks():
+        yield PAYLOAD
+
+    return ServerSentEvent(chunks())
+
+
+def make_client() -> TestClient:
+    app = Litestar(
+        route_handlers=[big, small, stream, events],
+        middleware=[
+            DefineMiddleware(
+                NegotiatingCompressionMiddleware,
+                config=CompressionConfig(
+                    backend="gzip",
+                    minimum_size=1024,
+                    backend_config=NegotiationOptions(),
+                ),
+            )
+        ],
+    )
+    return TestClient(app)
+
+
+def test_choose_encoding_honours_q_values_and_availability():
+    options = NegotiationOptions()
+    options.enabled_encodings = frozenset({"br", "gzip"})
+
+    assert choose_encoding("gzip, br", options) == "br"
+    assert choose_encoding("br;q=0.5, gzip", options) == "gzip"
+    assert choose_encoding("zstd", options) is None
+    assert choose_encoding("*", options) == "br"
+    assert choose_encoding("gzip;q=0, identity", options) is None
+
+
+def test_compresses_large_responses_only():
+    with make_client() as client:
+        response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.text == PAYLOAD
+
+        response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+        response = client.get("/big", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+
+
+def test_streams_are_compressed_per_chunk_and_sse_is_skipped():
+    with make_client() as client:
+        with client.stream(
+            "GET", "/stream", headers={"Accept-Encoding": "gzip"}
+        ) as response:
+            assert response.headers["content-encoding"] == "gzip"
+            assert "content-length" not in response.headers
+            raw = b"".join(response.iter_raw())
+        assert gzip.decompress(raw).decode() == PAYLOAD * 3
+        # Every chunk ends in a sync flush, so a partial body is decodable.
+        assert zlib.decompressobj(31).decompress(raw[: len(raw) // 2])
+
+        response = client.get("/events", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
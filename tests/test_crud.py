@@ -0,0 +1,139 @@
+import asyncio
+
+import msgspec
+from litestar import Litestar
+from litestar.testing import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from src.crud import KeysetPage, crud_controller
+from src.profiles.models import Profile
+from src.profiles.schemas import ProfileStruct, ProfileWriteStruct
+from src.profiles.services import ProfileService
+
+
+class StubService:
+    def __init__(self):
+        self.calls = []
+
+    async def get_many(self, ids, fields):
+        self.calls.append(("get_many", ids, fields))
+        return [{"id": i, "full_name": f"P{i}"} for i in ids if i != 2]
+
+    async def keyset_page(self, after, limit, fields):
+        self.calls.append(("keyset_page", after, limit, fields))
+        return KeysetPage(
+            items=[ProfileStruct(id=4, full_name="D", email="d@example.com")], next=4
+        )
+
+
+def _client(service):
+    async def provide_service() -> StubService:
+        return service
+
+    controller = crud_controller(
+        Profile,
+        ProfileStruct,
+        ProfileWriteStruct,
+        path="/profiles",
+        service_type=StubService,
+        provide_service=provide_service,
+        max_batch=3,
+    )
+    return TestClient(Litestar([controller]))
+
+
+def test_generated_handlers_are_named_after_the_resource():
+    controller = crud_controller(Profile, ProfileStruct, ProfileWriteStruct, path="/p")
+    for name in (
+        "list_profiles",
+        "list_profiles_keyset",
+        "get_profiles_batch",
+        "get_profile",
+        "create_profile",
+        "create_profiles_bulk",
+        "update_profile",
+        "delete_profile",
+        "delete_profiles_bulk",
+    ):
+        assert hasattr(controller, name)
+
+
+def test_batch_get_with_projection():
+    service = StubService()
+    with _client(service) as client:
+        response = client.get("/profiles/batch?ids=1&ids=2&ids=3&fields=id,full_name")
+
+    assert response.status_code == 200
+    assert response.json() == [{"id": 1, "full_name": "P1"}, {"id": 3, "full_name": "P3"}]
+    assert service.calls == [("get_many", [1, 2, 3], ["id", "full_name"])]
+
+
+def test_unknown_fields_and_oversized_batches_are_rejected():
+    service = StubService()
+    with _client(service) as client:
+        assert client.get("/profiles/batch?ids=1&fields=password").status_code == 400
+        assert client.get("/profiles/batch?ids=1&ids=2&ids=3&ids=4").status_code == 400
+    assert service.calls == []
+
+
+def test_keyset_page_is_encoded_as_msgpack():
+    service = StubService()
+    with _client(service) as client:
+        response = client.get(
+            "/profiles/keyset?after=3&limit=1",
+            headers={"Accept": "application/msgpack"},
+        )
+
+    assert response.headers["content-type"].startswith("application/msgpack")
+    assert msgspec.msgpack.decode(response.content) == {
+        "items": [{"full_name": "D", "email": "d@example.com", "id": 4}],
+        "next": 4,
+    }
+    assert service.calls == [("keyset_page", 3, 1, None)]
+
+
+class _SyncSession:
+    """Runs the service's statements on a sync session, for sqlite."""
+
+    def __init__(self, session):
+        self.sync = session
+        self.bind = session.bind
+
+    async def execute(self, statement, *args, **kwargs):
+        return self.sync.execute(statement, *args, **kwargs)
+
+
+def test_reads_build_structs_without_loading_orm_instances():
+    engine = create_engine("sqlite://")
+    Profile.__table__.create(engine)
+    with Session(engine) as session:
+        session.execute(
+            insert(Profile.__table__),
+            [{"id": i, "full_name": f"P{i}", "email": f"p{i}@example.com"} for i in (1, 2, 3)],
+        )
+        service = ProfileService(session=_SyncSession(session))
+
+        async def main():
+            return (
+                await service.select_items(limit=2, offset=1),
+                await service.keyset_page(after=1, limit=1),
+                await service.get_many([3, 9, 1]),
+                await service.get_encoded(2),
+            )
+
+        items, page, many, encoded = asyncio.run(main())
+        assert len(session.identity_map) == 0
+
+    assert service.reads_core
+    assert items == [
+        ProfileStruct(id=2, full_name="P2", email="p2@example.com"),
+        ProfileStruct(id=3, full_name="P3", email="p3@example.com"),
+    ]
+    assert page.items == [items[0]] and page.next == 2
+    assert [p.id for p in many] == [3, 1]
+    assert msgspec.json.decode(encoded) == {
+        "full_name": "P2",
+        "email": "p2@example.com",
+        "id": 2,
+    }
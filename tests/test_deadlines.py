@@ -0,0 +1,91 @@
+import asyncio
+
+from litestar import Litestar, get
+from litestar.response import Stream
+from litestar.testing import TestClient
+
+from src import deadlines
+from src.deadlines import DeadlineMiddleware
+
+
+@get("/slow", opt={"timeout": 0.05})
+async def slow() -> str:
+    await asyncio.sleep(1)
+    return "done"
+
+
+@get("/budget")
+async def budget() -> float:
+    return deadlines.remaining()
+
+
+@get("/short", opt={"timeout": 0.2})
+async def short() -> float:
+    return deadlines.remaining()
+
+
+@get("/stream", opt={"timeout": 0.05})
+async def stream() -> Stream:
+    async def chunks():
+        for _ in range(3):
+            await asyncio.sleep(0.03)
+            yield b"x"
+
+    return Stream(chunks())
+
+
+@get("/unbounded", opt={"timeout": None})
+async def unbounded() -> bool:
+    return deadlines.remaining() is None
+
+
+def make_client() -> TestClient:
+    app = Litestar(
+        route_handlers=[slow, budget, short, stream, unbounded],
+        middleware=[DeadlineMiddleware],
+    )
+    return TestClient(app)
+
+
+def test_requests_past_their_deadline_get_504():
+    with make_client() as client:
+        response = client.get("/slow")
+    assert response.status_code == 504
+
+
+def test_header_shortens_but_cannot_extend_the_budget():
+    with make_client() as client:
+        short = client.get("/budget", headers={"X-Request-Timeout": "0.5"}).json()
+        capped = client.get("/budget", headers={"X-Request-Timeout": "1e6"}).json()
+        assert client.get("/unbounded").json() is True
+    assert 0 < short <= 0.5
+    assert capped <= deadlines.settings.request_timeout_max_s
+
+
+def test_header_cannot_raise_the_route_budget():
+    with make_client() as client:
+        raised = client.get("/short", headers={"X-Request-Timeout": "30"}).json()
+        slow = client.get("/slow", headers={"X-Request-Timeout": "30"})
+        ignored = [
+            client.get("/short", headers={"X-Request-Timeout": value}).json()
+            for value in ("nan", "inf", "-1", "0", "soon")
+        ]
+    assert 0 < raised <= 0.2
+    assert slow.status_code == 504
+    assert all(0.1 < left <= 0.2 for left in ignored)
+
+
+def test_deadline_is_lifted_once_streaming_starts():
+    with make_client() as client:
+        response = client.get("/stream")
+    assert response.status_code == 200
+    assert response.content == b"xxx"
+
+
+def test_timeout_clamps_to_remaining_budget():
+    assert deadlines.timeout(10) == 10
+    token = deadlines._deadline.set(deadlines.time.monotonic() + 1)
+    try:
+        assert deadlines.timeout(10) <= 1
+    finally:
+        deadlines._deadline.reset(token)
@@ -0,0 +1,151 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from litestar import Litestar, post
+from litestar.middleware import DefineMiddleware
+from litestar.testing import AsyncTestClient, TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.idempotency.middleware import (
+    IdempotencyMiddleware,
+    IdempotencyStore,
+    StoredResponse,
+)
+from src.idempotency.models import IdempotencyRecord
+from src.schemas import CurrentUser
+
+
+class _AsyncSession:
+    """Just enough of AsyncSession over a sync sqlite Session."""
+
+    def __init__(self, session):
+        self._session = session
+
+    async def execute(self, statement):
+        return self._session.execute(statement)
+
+    @asynccontextmanager
+    async def begin(self):
+        with self._session.begin():
+            yield
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        with self._session.begin_nested():
+            yield
+
+
+def sqlite_store(ttl=60.0, lease=30.0):
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    IdempotencyRecord.__table__.create(engine)
+
+    @asynccontextmanager
+    async def session_factory():
+        with Session(engine) as session:
+            yield _AsyncSession(session)
+
+    return IdempotencyStore(session_factory, ttl=ttl, lease=lease), engine
+
+
+def test_store_claims_completes_and_purges():
+    store, engine = sqlite_store()
+    response = StoredResponse(201, [("content-type", "application/json")], b"{}", "f")
+
+    async def main():
+        assert (await store.claim("alice", "k1")).state == "new"
+        assert (await store.claim("alice", "k1")).state == "running"
+        assert (await store.claim("bob", "k1")).state == "new"
+        await store.complete("alice", "k1", response)
+        done = await store.claim("alice", "k1")
+        assert done.state == "done" and done.response == response
+
+        await store.release("bob", "k1")
+        assert await store.get("bob", "k1") is None
+
+        # An abandoned claim is taken over once its lease has run out.
+        assert (await store.claim("carol", "k1")).state == "new"
+        with engine.begin() as connection:
+            connection.execute(
+                update(IdempotencyRecord.__table__)
+                .where(IdempotencyRecord.__table__.c.sub == "carol")
+                .values(expires_at=IdempotencyRecord.__table__.c.created_at)
+            )
+        assert await store.purge() == 1
+        assert (await store.claim("carol", "k1")).state == "new"
+
+    asyncio.run(main())
+
+
+def _app(store, calls):
+    async def guard(connection, _):
+        connection.state.current_user = CurrentUser(sub=connection.headers["x-sub"])
+
+    @post("/items", guards=[guard])
+    async def create_item(data: dict) -> dict:
+        calls.append(data)
+        await asyncio.sleep(0.05)
+        if data.get("fail"):
+            raise RuntimeError("boom")
+        return {"n": len(calls), **data}
+
+    return Litestar(
+        [create_item],
+        middleware=[DefineMiddleware(IdempotencyMiddleware, store=store)],
+    )
+
+
+def test_replays_the_stored_response():
+    store, _ = sqlite_store()
+    calls = []
+    with TestClient(_app(store, calls)) as client:
+        headers = {"x-sub": "alice", "idempotency-key": "k1"}
+        first = client.post("/items", json={"a": 1}, headers=headers)
+        again = client.post("/items", json={"a": 1}, headers=headers)
+        other_user = client.post(
+            "/items", json={"a": 1}, headers={**headers, "x-sub": "bob"}
+        )
+        different = client.post("/items", json={"a": 2}, headers=headers)
+        unkeyed = client.post("/items", json={"a": 1}, headers={"x-sub": "alice"})
+
+    assert first.status_code == again.status_code == 201
+    assert again.json() == first.json() == {"n": 1, "a": 1}
+    assert again.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert other_user.json() == {"n": 2, "a": 1}
+    assert different.status_code == 422
+    assert unkeyed.json() == {"n": 3, "a": 1}
+    assert len(calls) == 3
+
+
+def test_concurrent_duplicates_wait_for_the_original():
+    store, _ = sqlite_store()
+    calls = []
+
+    async def main():
+        async with AsyncTestClient(_app(store, calls)) as client:
+            headers = {"x-sub": "alice", "idempotency-key": "k1"}
+            return await asyncio.gather(
+                *(client.post("/items", json={"a": 1}, headers=headers) for _ in range(5))
+            )
+
+    responses = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert [r.json() for r in responses] == [{"n": 1, "a": 1}] * 5
+    assert sum("idempotent-replayed" in r.headers for r in responses) == 4
+
+
+def test_server_errors_are_not_stored():
+    store, _ = sqlite_store()
+    calls = []
+    with TestClient(_app(store, calls)) as client:
+        headers = {"x-sub": "alice", "idempotency-key": "k1"}
+        failed = client.post("/items", json={"fail": True}, headers=headers)
+        retried = client.post("/items", json={"fail": True}, headers=headers)
+
+    assert failed.status_code == retried.status_code == 500
+    assert len(calls) == 2
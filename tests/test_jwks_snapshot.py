@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import httpx
+import jwt
+import msgspec
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from config.zitadel import zitadel_settings
+from src import guards
+from src.circuit import CircuitBreaker
+from src.guards import JWKSCache, JWKSSnapshot
+
+
+@pytest.fixture
+def jwk():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    data = jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key(), as_dict=True)
+    return {**data, "kid": "k1", "kty": "RSA"}
+
+
+@pytest.fixture(autouse=True)
+def reset_cache():
+    yield
+    JWKSCache._keys = None
+    JWKSCache._public_keys = {}
+    JWKSCache._last_fetch = 0
+    JWKSCache._last_attempt = 0.0
+
+
+def test_snapshot_round_trip(tmp_path, jwk):
+    path = str(tmp_path / "state" / "jwks.json")
+    JWKSCache._write_snapshot(path, JWKSSnapshot(fetched_at=time.time(), keys=[jwk]))
+
+    assert JWKSCache.load_snapshot(path)
+    assert JWKSCache.is_usable()
+    assert "k1" in JWKSCache._public_keys
+    assert list((tmp_path / "state").iterdir()) == [tmp_path / "state" / "jwks.json"]
+
+
+def test_stale_or_corrupt_snapshot_is_ignored(tmp_path, jwk):
+    path = tmp_path / "jwks.json"
+    fetched_at = time.time() - zitadel_settings.jwks_max_staleness - 1
+    path.write_bytes(
+        msgspec.json.encode(JWKSSnapshot(fetched_at=fetched_at, keys=[jwk]))
+    )
+    assert not JWKSCache.load_snapshot(str(path))
+
+    path.write_bytes(b'{"keys": [')
+    assert not JWKSCache.load_snapshot(str(path))
+    assert not JWKSCache.load_snapshot(str(tmp_path / "missing.json"))
+    assert JWKSCache._keys is None
+
+
+@pytest.mark.parametrize(
+    "body", [b"<html>oops</html>", b'{"kids": []}', b'{"keys": 1}']
+)
+def test_malformed_jwks_falls_back_to_cached_keys(monkeypatch, jwk, body):
+    breaker = CircuitBreaker("zitadel.jwks", failure_threshold=1)
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+    client = httpx.AsyncClient
+    monkeypatch.setattr(guards, "jwks_breaker", breaker)
+    monkeypatch.setattr(guards, "get_auth_cache", lambda: None)
+    monkeypatch.setattr(httpx, "AsyncClient", lambda: client(transport=transport))
+    JWKSCache._set([jwk], time.time() - JWKSCache._ttl - 1)
+
+    assert asyncio.run(JWKSCache.get_keys()) == [jwk]
+    assert breaker.state == "open"
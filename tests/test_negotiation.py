@@ -0,0 +1,54 @@
+import msgspec
+from litestar import Controller, Litestar, post
+from litestar.testing import TestClient
+
+from src.negotiation import NegotiatedResponse
+from src.profiles.schemas import (
+    ProfileDTO,
+    ProfileStruct,
+    ProfileWriteDTO,
+    ProfileWriteStruct,
+)
+
+
+class EchoController(Controller):
+    dto = ProfileWriteDTO
+    return_dto = ProfileDTO
+    response_class = NegotiatedResponse
+
+    @post("/profiles")
+    async def create(self, data: ProfileWriteStruct) -> ProfileStruct:
+        return ProfileStruct(id=1, full_name=data.full_name, email=data.email)
+
+
+BODY = {"full_name": "Ada", "email": "ada@example.com"}
+
+
+def test_msgpack_request_and_response():
+    with TestClient(Litestar([EchoController])) as client:
+        response = client.post(
+            "/profiles",
+            content=msgspec.msgpack.encode(BODY),
+            headers={
+                "Content-Type": "application/msgpack",
+                "Accept": "application/msgpack",
+            },
+        )
+
+    assert response.status_code == 201
+    assert response.headers["content-type"].startswith("application/msgpack")
+    assert msgspec.msgpack.decode(response.content) == {**BODY, "id": 1}
+
+
+def test_json_remains_the_default():
+    with TestClient(Litestar([EchoController])) as client:
+        response = client.post("/profiles", json=BODY)
+        invalid = client.post(
+            "/profiles",
+            content=msgspec.msgpack.encode({"full_name": "Ada"}),
+            headers={"Content-Type": "application/msgpack"},
+        )
+
+    assert response.headers["content-type"].startswith("application/json")
+    assert response.json() == {**BODY, "id": 1}
+    assert invalid.status_code == 400
@@ -0,0 +1,97 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import msgspec
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.outbox.dispatcher import OutboxDispatcher
+from src.outbox.sinks import FileSink, InMemorySink, OutboxMessage
+
+
+def _row(event_id):
+    return {
+        "id": event_id,
+        "aggregate_type": "profile",
+        "aggregate_id": 7,
+        "event_type": "profile.updated",
+        "payload": {"id": 7, "full_name": "Ada", "email": "ada@example.com"},
+        "created_at": datetime(2025, 11, 2, tzinfo=timezone.utc),
+    }
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.committed = False
+
+    @asynccontextmanager
+    async def begin(self):
+        yield
+        self.committed = True
+
+    async def execute(self, statement):
+        self.statements.append(
+            str(statement.compile(dialect=postgresql.dialect()))
+        )
+        return FakeResult(self.rows if len(self.statements) == 1 else [])
+
+
+def _factory(session):
+    @asynccontextmanager
+    async def session_factory():
+        yield session
+
+    return session_factory
+
+
+def test_dispatch_claims_with_skip_locked_and_deletes_in_bulk():
+    session = FakeSession([_row(1), _row(2)])
+    sink = InMemorySink()
+
+    sent = asyncio.run(OutboxDispatcher(_factory(session), sink).dispatch_once())
+
+    assert sent == 2
+    assert [m.id for m in sink.messages] == [1, 2]
+    claim, delete = session.statements
+    assert "FOR UPDATE SKIP LOCKED" in claim
+    assert delete.startswith("DELETE FROM outbox WHERE outbox.id IN")
+    assert session.committed
+
+
+def test_sink_failure_leaves_rows_in_outbox():
+    class FailingSink:
+        async def send(self, messages):
+            raise ConnectionError("downstream unavailable")
+
+    session = FakeSession([_row(1)])
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(OutboxDispatcher(_factory(session), FailingSink()).dispatch_once())
+
+    assert len(session.statements) == 1
+    assert not session.committed
+
+
+def test_file_sink_appends_ndjson(tmp_path):
+    path = tmp_path / "outbox" / "events.ndjson"
+    sink = FileSink(path)
+
+    asyncio.run(sink.send([OutboxMessage(**_row(1))]))
+    asyncio.run(sink.send([OutboxMessage(**_row(2))]))
+
+    lines = path.read_bytes().splitlines()
+    assert [msgspec.json.decode(line)["id"] for line in lines] == [1, 2]
@@ -0,0 +1,32 @@
+import pytest
+
+from migrations.partitioning import (
+    PartitionScheme,
+    create_statements,
+    parse_scheme,
+    sync_trigger_statements,
+)
+
+
+def test_parse_scheme():
+    assert parse_scheme("hash") == PartitionScheme("hash")
+    assert parse_scheme("HASH:32") == PartitionScheme("hash", partitions=32)
+    assert parse_scheme("range:6") == PartitionScheme("range", months_ahead=6)
+    with pytest.raises(ValueError):
+        parse_scheme("list")
+    with pytest.raises(ValueError):
+        parse_scheme("hash:1")
+
+
+def test_primary_key_includes_partition_key():
+    hash_ddl = create_statements(PartitionScheme("hash", partitions=4))
+    assert "PRIMARY KEY (id)" in hash_ddl[1]
+    assert "PARTITION BY HASH (id)" in hash_ddl[1]
+    assert sum("PARTITION OF" in s for s in hash_ddl) == 4
+
+    range_ddl = create_statements(PartitionScheme("range"))
+    assert "PRIMARY KEY (id, created_at)" in range_ddl[1]
+    assert any("DEFAULT" in s and "PARTITION OF" in s for s in range_ddl)
+    assert "ON CONFLICT (id, created_at)" in sync_trigger_statements(
+        PartitionScheme("range")
+    )[0]
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from advanced_alchemy.exceptions import NotFoundError
+
+from src.profiles.batching import ProfileWriteCoalescer
+
+
+def _row(item_id, fields):
+    return {"id": item_id, **fields}
+
+
+def test_updates_within_window_are_merged_into_one_flush():
+    flushed = []
+
+    async def flush(changes):
+        flushed.append({k: dict(v) for k, v in changes.items()})
+        return [_row(item_id, fields) for item_id, fields in changes.items()]
+
+    async def main():
+        coalescer = ProfileWriteCoalescer(flush, window=0.01)
+        return await asyncio.gather(
+            coalescer.submit(1, {"full_name": "A", "email": "a@example.com"}),
+            coalescer.submit(1, {"full_name": "B", "email": "b@example.com"}),
+            coalescer.submit(2, {"full_name": "C", "email": "c@example.com"}),
+        )
+
+    first, second, other = asyncio.run(main())
+
+    assert flushed == [
+        {
+            1: {"full_name": "B", "email": "b@example.com"},
+            2: {"full_name": "C", "email": "c@example.com"},
+        }
+    ]
+    # Every writer to the same id observes the merged, committed row.
+    assert first == second
+    assert first.full_name == "B"
+    assert other.id == 2
+
+
+def test_missing_rows_raise_not_found():
+    async def flush(changes):
+        return []
+
+    async def main():
+        coalescer = ProfileWriteCoalescer(flush, window=0)
+        await coalescer.submit(99, {"full_name": "A", "email": "a@example.com"})
+
+    with pytest.raises(NotFoundError):
+        asyncio.run(main())
+
+
+def test_flush_failure_is_reported_to_every_waiter():
+    async def flush(changes):
+        raise RuntimeError("database unavailable")
+
+    async def main():
+        coalescer = ProfileWriteCoalescer(flush, window=0)
+        return await asyncio.gather(
+            coalescer.submit(1, {"full_name": "A", "email": "a@example.com"}),
+            coalescer.submit(2, {"full_name": "B", "email": "b@example.com"}),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_max_batch_flushes_without_waiting_for_window():
+    batches = []
+
+    async def flush(changes):
+        batches.append(sorted(changes))
+        return [_row(item_id, fields) for item_id, fields in changes.items()]
+
+    async def main():
+        coalescer = ProfileWriteCoalescer(flush, window=60, max_batch=2)
+        await asyncio.wait_for(
+            asyncio.gather(
+                coalescer.submit(1, {"full_name": "A", "email": "a@example.com"}),
+                coalescer.submit(2, {"full_name": "B", "email": "b@example.com"}),
+            ),
+            timeout=1,
+        )
+
+    asyncio.run(main())
+
+    assert batches == [[1, 2]]
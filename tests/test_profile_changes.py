@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from src.profiles.changes import (
+    ProfileChange,
+    ProfileChangeHub,
+    decode_resume_token,
+    encode_resume_token,
+)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.listeners = {}
+        self.closed = False
+
+    def add_termination_listener(self, callback):
+        self.on_terminated = callback
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+    def notify(self, payload):
+        self.listeners["profile_changes"](self, 1, "profile_changes", payload)
+
+
+def _hub(queue_size=4):
+    connections = []
+
+    async def connect():
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    return ProfileChangeHub(connect, queue_size=queue_size), connections
+
+
+def test_resume_token_round_trip():
+    updated_at = datetime(2025, 11, 2, 15, 0, 8, 973054, tzinfo=timezone.utc)
+
+    token = encode_resume_token(updated_at, 42)
+
+    assert decode_resume_token(token) == (updated_at, 42)
+
+
+@pytest.mark.parametrize(
+    "token", ["9" * 400 + "-1", "1-" + "9" * 30, "1--1", "abc-1", "1", "-1-2"]
+)
+def test_malformed_resume_tokens_are_value_errors(token):
+    with pytest.raises(ValueError):
+        decode_resume_token(token)
+
+
+def test_notifications_fan_out_over_one_connection():
+    async def main():
+        hub, connections = _hub()
+        first = await hub.subscribe()
+        second = await hub.subscribe()
+        connections[0].notify(
+            '{"op":"update","id":7,"updated_at":"2025-11-02T15:00:08+00:00",'
+            '"full_name":"Ada","email":"ada@example.com"}'
+        )
+        return connections, await first.queue.get(), await second.queue.get()
+
+    connections, first, second = asyncio.run(main())
+
+    assert len(connections) == 1
+    assert first == second
+    assert isinstance(first, ProfileChange)
+    assert (first.op, first.id, first.full_name) == ("update", 7, "Ada")
+
+
+def test_slow_subscriber_is_dropped_without_affecting_others():
+    payload = '{"op":"delete","id":1,"updated_at":"2025-11-02T15:00:08+00:00"}'
+
+    async def main():
+        hub, connections = _hub(queue_size=2)
+        slow = await hub.subscribe()
+        fast = await hub.subscribe()
+        for _ in range(3):
+            connections[0].notify(payload)
+            await fast.queue.get()
+        return hub, slow, fast
+
+    hub, slow, fast = asyncio.run(main())
+
+    assert slow.dropped
+    assert slow.queue.get_nowait() is None
+    assert not fast.dropped
+    assert hub.subscriber_count == 1
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import ProgrammingError
+
+from src.profiles.repositories import EmailUpsertUnavailable, ProfileRepository
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self._rows
+
+
+class _Session:
+    bind = type("Bind", (), {"dialect": postgresql.dialect()})()
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return _Result([{"id": 1, "full_name": "B", "email": "A@x.io", "inserted": True}])
+
+
+def test_upsert_by_email_is_one_statement_on_lower_email():
+    session = _Session()
+    repository = ProfileRepository(session=session)
+    rows = asyncio.run(
+        repository.upsert_by_email(
+            [
+                {"full_name": "A", "email": "a@x.io"},
+                {"full_name": "B", "email": "A@x.io"},
+                {"full_name": "C", "email": "c@x.io"},
+            ]
+        )
+    )
+
+    assert rows == [{"id": 1, "full_name": "B", "email": "A@x.io", "inserted": True}]
+    [statement] = session.statements
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (lower(email)) DO UPDATE" in sql
+    assert "RETURNING profiles.id, profiles.full_name, profiles.email, xmax = 0" in sql
+    # Emails that differ only in case are collapsed, last one winning.
+    params = statement.compile(dialect=postgresql.dialect()).params
+    assert sorted(v for k, v in params.items() if k.startswith("full_name")) == ["B", "C"]
+
+
+def test_upsert_by_email_without_the_index_is_not_implemented():
+    class _Error(Exception):
+        sqlstate = "42P10"
+
+    class _Unindexed(_Session):
+        async def execute(self, statement):
+            raise ProgrammingError("INSERT ...", {}, _Error())
+
+    repository = ProfileRepository(session=_Unindexed())
+    with pytest.raises(EmailUpsertUnavailable) as info:
+        asyncio.run(repository.upsert_by_email([{"full_name": "A", "email": "a@x.io"}]))
+    assert info.value.status_code == 501
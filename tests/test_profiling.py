@@ -0,0 +1,54 @@
+from litestar import Litestar, get
+from litestar.middleware import DefineMiddleware
+from litestar.testing import TestClient
+
+from src.profiling import ProfilingMiddleware, RequestProfiler
+
+
+def busy_function():
+    return [str(i) for i in range(2000)]
+
+
+@get("/work")
+async def work() -> int:
+    return len(busy_function())
+
+
+def make_client(profiler: RequestProfiler) -> TestClient:
+    app = Litestar(
+        route_handlers=[work],
+        middleware=[DefineMiddleware(ProfilingMiddleware, profiler=profiler)],
+    )
+    return TestClient(app)
+
+
+def test_requests_are_profiled_only_when_switched_on_and_triggered():
+    profiler = RequestProfiler(enabled=False, buffer_size=2)
+    with make_client(profiler) as client:
+        client.get("/work", headers={"X-Profile": "1"})
+        assert not profiler.reports
+
+        profiler.enabled = True
+        client.get("/work")
+        assert not profiler.reports
+
+        for _ in range(3):
+            client.get("/work", headers={"X-Profile": "1"})
+
+    assert [r.id for r in profiler.reports] == [2, 3]
+    report = profiler.reports[-1]
+    assert report.path == "/work"
+    assert report.status == 200
+    assert report.trigger == "header"
+    assert "busy_function" in report.stats
+    assert report.allocations
+
+
+def test_sampling():
+    profiler = RequestProfiler(enabled=True, sample_rate=1.0, trace_allocations=False)
+    with make_client(profiler) as client:
+        client.get("/work")
+
+    (report,) = profiler.reports
+    assert report.trigger == "sample"
+    assert report.allocations == []
@@ -0,0 +1,113 @@
+import asyncio
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from src import result_cache
+from src.result_cache import ResultCache, register_result_cache
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Widget(Base):
+    __tablename__ = "result_cache_widgets"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+
+
+def counting_loader(value: bytes = b"page"):
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return value
+
+    return load, calls
+
+
+def test_hits_until_invalidated():
+    cache = ResultCache(max_bytes=1024)
+    load, calls = counting_loader()
+
+    async def main():
+        await cache.get_or_load(("limit", 10), load)
+        await cache.get_or_load(("limit", 10), load)
+        cache.invalidate()
+        await cache.get_or_load(("limit", 10), load)
+
+    asyncio.run(main())
+
+    assert len(calls) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert len(cache) == 1
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = ResultCache(max_bytes=10)
+    cache.put("a", 0, b"aaaa")
+    cache.put("b", 0, b"bbbb")
+    cache.get("a")
+    cache.put("c", 0, b"cccc")
+    cache.put("huge", 0, b"x" * 11)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    assert cache.get("huge") is None
+    assert cache.size == 8
+
+
+def test_result_loaded_across_a_write_is_not_cached():
+    cache = ResultCache(max_bytes=1024)
+
+    async def load():
+        cache.invalidate()  # a write commits while the query runs
+        return b"stale"
+
+    assert asyncio.run(cache.get_or_load("page", load)) == b"stale"
+    assert cache.get("page") is None
+
+
+def test_bypassed_while_incoherent():
+    coherent = False
+    cache = ResultCache(max_bytes=1024, is_coherent=lambda: coherent)
+    load, calls = counting_loader()
+
+    async def main():
+        await cache.get_or_load("page", load)
+        await cache.get_or_load("page", load)
+
+    asyncio.run(main())
+
+    assert len(calls) == 2
+    assert len(cache) == 0
+
+
+def test_session_commits_bump_the_generation():
+    cache = register_result_cache(Widget.__tablename__, ResultCache(max_bytes=1024))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    try:
+        with Session(engine) as session:
+            session.add(Widget(id=1, name="one"))
+            session.flush()
+            assert cache.generation == 0
+            session.commit()
+            assert cache.generation == 1
+
+            session.execute(update(Widget).values(name="uno"))
+            session.rollback()
+            assert cache.generation == 1
+
+            session.execute(update(Widget).values(name="uno"))
+            session.commit()
+            assert cache.generation == 2
+
+            session.get(Widget, 1)
+            session.commit()
+            assert cache.generation == 2
+    finally:
+        result_cache._caches.pop(Widget.__tablename__)
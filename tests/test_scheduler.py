@@ -0,0 +1,98 @@
+import asyncio
+
+from src.scheduler import Scheduler
+
+
+def test_job_runs_periodically_and_records_stats():
+    async def main():
+        scheduler = Scheduler()
+        calls = []
+
+        async def job():
+            calls.append(1)
+
+        scheduler.add_job("tick", job, interval=0.01, jitter=0)
+        scheduler.start()
+        await asyncio.sleep(0.055)
+        await scheduler.stop()
+        return scheduler.snapshot()["tick"], len(calls)
+
+    stats, calls = asyncio.run(main())
+
+    assert calls >= 3
+    assert stats.runs == calls
+    assert stats.failures == 0
+    assert stats.last_duration_s is not None
+
+
+def test_failures_are_captured_and_job_keeps_running():
+    async def main():
+        scheduler = Scheduler()
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise RuntimeError("idp unavailable")
+
+        scheduler.add_job("flaky", flaky, interval=0.01, jitter=0)
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return scheduler.snapshot()["flaky"]
+
+    stats = asyncio.run(main())
+
+    assert stats.failures == 1
+    assert stats.consecutive_failures == 0
+    assert stats.runs > 1
+    assert "idp unavailable" in stats.last_error
+
+
+def test_runs_never_overlap():
+    async def main():
+        scheduler = Scheduler()
+        active = 0
+        peak = 0
+
+        async def slow():
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+
+        scheduler.add_job("slow", slow, interval=0.001, jitter=0)
+        scheduler.start()
+        await asyncio.sleep(0.005)
+        skipped = not await scheduler.run_job("slow")
+        await asyncio.sleep(0.03)
+        await scheduler.stop()
+        return peak, skipped
+
+    peak, skipped = asyncio.run(main())
+
+    assert peak == 1
+    assert skipped
+
+
+def test_stop_cancels_runs_that_outlive_the_grace_period():
+    async def main():
+        scheduler = Scheduler()
+        cancelled = asyncio.Event()
+
+        async def hang():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        scheduler.add_job("hang", hang, interval=60)
+        scheduler.start()
+        await asyncio.sleep(0)
+        await asyncio.wait_for(scheduler.stop(grace=0.01), timeout=1)
+        return cancelled.is_set()
+
+    assert asyncio.run(main())
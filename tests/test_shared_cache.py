@@ -0,0 +1,76 @@
+import os
+import time
+
+from src.shared_cache import SharedCache, _digest
+
+
+def test_set_get_and_expiry(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache"), slots=16, slot_size=128)
+    now = time.time()
+
+    assert cache.set(b"a", b"alpha", now + 60)
+    assert cache.set(b"b", b"beta", now - 1)
+    assert not cache.set(b"big", b"x" * 200, now + 60)
+
+    assert cache.get(b"a") == b"alpha"
+    assert cache.get(b"b") is None
+    assert cache.get(b"missing") is None
+
+    assert cache.set(b"a", b"alpha-2", now + 60)
+    assert cache.get(b"a") == b"alpha-2"
+    cache.close()
+
+
+def test_full_probe_window_evicts_soonest_expiring(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache"), slots=2, slot_size=64, probe=2)
+    now = time.time()
+    cache.set(b"1", b"one", now + 10)
+    cache.set(b"2", b"two", now + 20)
+    cache.set(b"3", b"three", now + 30)
+
+    assert cache.get(b"1") is None
+    assert cache.get(b"2") == b"two"
+    assert cache.get(b"3") == b"three"
+    cache.close()
+
+
+def test_entries_are_visible_across_processes(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = SharedCache(path, slots=16, slot_size=128)
+
+    pid = os.fork()
+    if pid == 0:
+        child = SharedCache(path, slots=16, slot_size=128)
+        child.set(b"token", b"from-child", time.time() + 60)
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert cache.get(b"token") == b"from-child"
+    # A different layout gets its own file and leaves this one alone.
+    other = SharedCache(path, slots=8, slot_size=128)
+    assert other.path != cache.path
+    assert other.get(b"token") is None
+    assert os.path.getsize(cache.path) == 64 + 16 * 128
+    assert cache.get(b"token") == b"from-child"
+    cache.close()
+    other.close()
+
+
+def test_set_updates_the_key_further_down_its_chain(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache"), slots=2, slot_size=64, probe=2)
+    # Three keys whose chains all start at the first slot.
+    x, y, z = [
+        key
+        for key in (b"%d" % i for i in range(100))
+        if next(cache._probe_offsets(_digest(key))) == 64
+    ][:3]
+    now = time.time()
+    cache.set(y, b"y", now + 60)
+    cache.set(x, b"old", now + 60)  # second in the chain, behind y
+    cache.set(y, b"y", now - 1)  # y's slot is free again
+    cache.set(x, b"new", now + 30)
+    cache.set(z, b"z", now + 60)
+
+    assert cache.get(x) == b"new"
+    assert cache.get(z) == b"z"
+    cache.close()
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"profile"
+
+    async def main():
+        flight: SingleFlight[bytes] = SingleFlight()
+        results = await asyncio.gather(*(flight.do(1, load) for _ in range(50)))
+        assert len(flight) == 0
+        return results
+
+    results = asyncio.run(main())
+
+    assert calls == 1
+    assert results == [b"profile"] * 50
+
+
+def test_distinct_keys_run_independently():
+    seen = []
+
+    async def main():
+        flight: SingleFlight[int] = SingleFlight()
+
+        async def load(key):
+            seen.append(key)
+            await asyncio.sleep(0)
+            return key
+
+        return await asyncio.gather(
+            flight.do(1, lambda: load(1)), flight.do(2, lambda: load(2))
+        )
+
+    assert asyncio.run(main()) == [1, 2]
+    assert sorted(seen) == [1, 2]
+
+
+def test_exception_is_shared_with_followers():
+    async def load():
+        await asyncio.sleep(0.01)
+        raise LookupError("missing")
+
+    async def main():
+        flight: SingleFlight[bytes] = SingleFlight()
+        return await asyncio.gather(
+            *(flight.do("k", load) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(r, LookupError) for r in results)
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    async def main():
+        flight: SingleFlight[int] = SingleFlight()
+        leader = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == 2
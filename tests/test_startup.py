@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Modules only some requests need; importing src.main must not load them.
+LAZY_MODULES = {"async_oauthlib", "oauthlib", "aiohttp", "authlib", "requests", "jose"}
+
+# Generous default so slow CI machines pass; tighten locally with the env var.
+IMPORT_BUDGET_MS = int(os.environ.get("NYX_IMPORT_BUDGET_MS", "3000"))
+
+
+def _import_times() -> dict[str, int]:
+    """Return cumulative import time in microseconds for each module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_src_main_import_stays_within_budget_and_skips_lazy_modules():
+    times = _import_times()
+
+    eagerly_imported = {name.split(".")[0] for name in times} & LAZY_MODULES
+    assert not eagerly_imported, f"imported at startup: {sorted(eagerly_imported)}"
+    assert times["src.main"] / 1000 < IMPORT_BUDGET_MS
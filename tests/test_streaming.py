@@ -0,0 +1,147 @@
+import asyncio
+
+import msgspec
+import pytest
+from litestar import Litestar, Request, post
+from litestar.exceptions import HTTPException, ValidationException
+from litestar.testing import TestClient
+
+from src.streaming import JsonArrayDecoder, decode_batches, is_ndjson_request
+
+
+class Item(msgspec.Struct):
+    name: str
+    tags: list[str] = []
+
+
+async def chunked(body: bytes, size: int):
+    for i in range(0, len(body), size):
+        yield body[i : i + size]
+
+
+def decode_all(body: bytes, *, ndjson=False, size=1, batch_size=2, max_items=100):
+    async def main():
+        return [
+            batch
+            async for batch in decode_batches(
+                chunked(body, size),
+                Item,
+                ndjson=ndjson,
+                batch_size=batch_size,
+                max_items=max_items,
+            )
+        ]
+
+    return asyncio.run(main())
+
+
+ARRAY = b' [ {"name": "a,]", "tags": ["x", "[y"]},\n{"name": "b\\"}"} , {"name": "c"} ] '
+NDJSON = b'{"name": "a,]", "tags": ["x", "[y"]}\n\n{"name": "b\\"}"}\r\n{"name": "c"}'
+EXPECTED = [[Item("a,]", ["x", "[y"]), Item('b"}')], [Item("c")]]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_decodes_json_arrays_across_chunk_boundaries(size):
+    assert decode_all(ARRAY, size=size) == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 5, 1000])
+def test_decodes_ndjson_across_chunk_boundaries(size):
+    assert decode_all(NDJSON, ndjson=True, size=size) == EXPECTED
+
+
+def test_empty_array_yields_nothing():
+    assert decode_all(b"[ ]") == []
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"",
+        b'{"name": "a"}',
+        b'[{"name": "a"},]',
+        b'[, {"name": "a"}]',
+        b'[{"name": "a"},, {"name": "b"}]',
+        b'[{"name": "a"}',
+        b'[{"name": "a"}] x',
+    ],
+)
+def test_rejects_malformed_arrays(body):
+    with pytest.raises(ValidationException):
+        decode_all(body)
+
+
+def test_rejects_invalid_items_with_their_position():
+    body = b'{"name": "a"}\n{"name": "b"}\n{"tags": []}\n'
+    with pytest.raises(ValidationException) as exc_info:
+        decode_all(body, ndjson=True, size=14)
+    assert "$[2]" in exc_info.value.detail
+
+
+def test_item_limit_fails_after_earlier_batches():
+    seen = []
+
+    async def main():
+        batches = decode_batches(
+            chunked(b"[" + b",".join([b'{"name": "a"}'] * 5) + b"]", 4),
+            Item,
+            ndjson=False,
+            batch_size=2,
+            max_items=4,
+        )
+        async for batch in batches:
+            seen.append(batch)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(main())
+    assert exc_info.value.status_code == 413
+    assert len(seen) == 2
+
+
+def test_array_decoder_keeps_only_the_unfinished_element():
+    decoder = JsonArrayDecoder(Item)
+    decoder.feed(b"[")
+    for _ in range(100):
+        assert decoder.feed(b'{"name": "a"},') == [Item("a")]
+    assert decoder.feed(b'{"name": ') == []
+    assert decoder._buffer == b'{"name": '
+
+
+def test_commas_inside_strings_do_not_hold_back_the_buffer():
+    name = "Doe, J., Jr., Esq., PhD, MD" + "," * 200
+    body = msgspec.json.encode([Item(name, ["a,b", "[c]"]) for _ in range(2000)])
+    decoder = JsonArrayDecoder(Item)
+    decoded, largest = 0, 0
+    for i in range(0, len(body), 4096):
+        decoded += len(decoder.feed(body[i : i + 4096]))
+        largest = max(largest, len(decoder._buffer))
+
+    assert decoded + len(decoder.close()) == 2000
+    assert largest < 4096 + 300
+
+
+def test_body_size_limit_is_checked_before_reading():
+    @post("/import", request_max_body_size=64)
+    async def import_items(request: Request) -> int:
+        count = 0
+        async for batch in decode_batches(
+            request.stream(),
+            Item,
+            ndjson=is_ndjson_request(request),
+            batch_size=10,
+            max_items=100,
+        ):
+            count += len(batch)
+        return count
+
+    with TestClient(Litestar([import_items])) as client:
+        ok = client.post(
+            "/import",
+            content=b'{"name": "a"}\n{"name": "b"}\n',
+            headers={"content-type": "application/x-ndjson"},
+        )
+        too_large = client.post("/import", content=b"[" + b" " * 100 + b"]")
+
+    assert ok.status_code == 201
+    assert ok.json() == 2
+    assert too_large.status_code == 413
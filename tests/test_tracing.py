@@ -0,0 +1,64 @@
+import pytest
+from litestar import Litestar, get
+from litestar.testing import TestClient
+
+pytest.importorskip("opentelemetry.sdk")
+
+from config.base import settings  # noqa: E402
+from src import tracing  # noqa: E402
+
+
+def test_span_is_a_no_op_when_disabled():
+    assert tracing.span("anything") is tracing.span("other")
+
+
+@pytest.fixture
+def memory_tracing(monkeypatch):
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+
+    monkeypatch.setattr(settings, "tracing_exporter", "memory")
+    monkeypatch.setattr(tracing, "enabled", True)
+    for name in ("_tracer", "_provider", "memory_exporter"):
+        monkeypatch.setattr(tracing, name, None)
+    tracing.configure_tracing(instrument_db=False)
+    yield tracing.memory_exporter
+    HTTPXClientInstrumentor().uninstrument()
+
+
+def test_handler_spans_nest_under_the_request_span(memory_tracing):
+    @get("/traced")
+    async def traced() -> str:
+        with tracing.span("ProfileService.get_encoded", {"profile.id": 1}):
+            with tracing.span("profile.encode"):
+                return "ok"
+
+    app = Litestar(route_handlers=[traced], middleware=tracing.tracing_middleware())
+    with TestClient(app) as client:
+        assert client.get("/traced").text == "ok"
+
+    spans = {s.name: s for s in memory_tracing.get_finished_spans()}
+    service = spans["ProfileService.get_encoded"]
+    assert spans["profile.encode"].parent.span_id == service.context.span_id
+    assert service.attributes["profile.id"] == 1
+    request = next(s for s in spans.values() if s.parent is None)
+    assert service.parent.span_id == request.context.span_id
+
+
+def test_shutdown_closes_the_file_and_allows_reconfiguring(
+    memory_tracing, monkeypatch, tmp_path
+):
+    tracing.shutdown_tracing()
+    assert tracing.span("after shutdown") is tracing.span("other")
+
+    monkeypatch.setattr(settings, "tracing_exporter", "file")
+    monkeypatch.setattr(settings, "tracing_file_path", str(tmp_path / "spans.jsonl"))
+    tracing.configure_tracing(instrument_db=False)
+    [processor] = tracing._provider._active_span_processor._span_processors
+    exporter = processor.span_exporter
+    with tracing.span("written"):
+        pass
+    tracing.shutdown_tracing()
+    tracing.shutdown_tracing()  # no-op the second time
+
+    assert exporter.out.closed
+    assert '"name": "written"' in (tmp_path / "spans.jsonl").read_text()
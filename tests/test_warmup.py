@@ -0,0 +1,69 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.profiles.models import Profile
+from src.profiles.services import ProfileService
+from src.warmup import WarmUp, _prime_profile_reads
+
+
+def test_ready_once_every_step_succeeds_after_retries():
+    async def main():
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise ConnectionError("db not up yet")
+
+        async def ok():
+            pass
+
+        warmup = WarmUp({"db": flaky, "jwks": ok}, max_backoff=0.01)
+        warmup.start()
+        assert not warmup.ready
+        for _ in range(100):
+            if warmup.ready:
+                break
+            await asyncio.sleep(0.01)
+        ready, status = warmup.ready, dict(warmup.status)
+        await warmup.stop()
+        return ready, status, attempts, warmup.ready
+
+    ready, status, attempts, ready_after_stop = asyncio.run(main())
+
+    assert ready
+    assert status == {"db": "ok", "jwks": "ok"}
+    assert attempts == 3
+    assert not ready_after_stop
+
+
+class _RecordingSession:
+    """Runs statements on a sync sqlite session and keeps them."""
+
+    def __init__(self, session):
+        self.sync = session
+        self.bind = session.bind
+        self.statements = []
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return self.sync.execute(statement, *args, **kwargs)
+
+
+def test_priming_runs_the_core_reads_the_endpoints_use():
+    engine = create_engine("sqlite://")
+    Profile.__table__.create(engine)
+    with Session(engine) as session:
+        recording = _RecordingSession(session)
+        asyncio.run(_prime_profile_reads(ProfileService(session=recording)))
+
+    list_page, count, get_one = (str(s).split() for s in recording.statements)
+    # Just the read struct's columns, as select_items selects them.
+    columns = ["profiles.full_name,", "profiles.email,", "profiles.id"]
+    for sql in (list_page, get_one):
+        assert sql[:4] == ["SELECT", *columns]
+    assert "LIMIT" in list_page and "WHERE" in get_one
+    assert "count(1)" in " ".join(count)